@@ -57,10 +57,11 @@ __all__ = [
     "LakePathError",
     "ARCHIVE_ROOT", "CACHE_ROOT",
     "DATA_ROOT", "DATA_LAKE_KBAR_DIR",
-    "LAYOUT", "DEFAULT_LAYOUT", "LAYOUTS", "layout_of",
-    "require_roots", "kbar_dir", "kbar_paths", "kbar_paths_for_days",
+    "LAYOUT", "DEFAULT_LAYOUT", "LAYOUTS", "LAYOUT_FALLBACK", "layout_of",
+    "require_roots", "kbar_dir", "kbar_write_target", "kbar_paths", "kbar_paths_for_days", "kbar_files_for_days",
     "list_kbar_files", "latest_kbar_file",
     "tick_dir", "tick_path", "list_tick_files",
+    "tick_pack_path", "list_tick_packs",
 ]
 
 
@@ -200,18 +201,52 @@ LAYOUT = {
 }
 DEFAULT_LAYOUT = "daily"
 
-#: 合法值域。新增佈局要同時更新 `kbar_dir` / `kbar_paths` 的分支與這裡。
+#: 合法值域。新增佈局要同時更新 `_kbar_dir` / `_layout_units` 的分支與這裡。
 LAYOUTS = ("daily", "monthly", "yearly")
 
+#: **佈局遷移期**的退路(2026-10):`{tf: 舊佈局}`。空表 = 沒有遷移在進行。
+#:
+#: 為什麼要它:`LAYOUT` 一翻,讀取端立刻只看新佈局的檔 —— 轉檔還沒跑完的區間
+#: 就安靜地變空圖(見 `tools/compact_kbars` 檔頭)。翻表與轉檔因此被綁成同一個時機。
+#: 有了這張表,遷移變成三步、每步都可以單獨發生:
+#:
+#:     ① LAYOUT[tf] = 新佈局,LAYOUT_FALLBACK[tf] = 舊佈局    (讀取端兩種都認)
+#:     ② 慢慢轉檔(compact_kbars),期間讀取端逐單位挑得到的那一種
+#:     ③ 轉完、驗完 → 從 LAYOUT_FALLBACK 拿掉 tf
+#:
+#: 解析規則:以**新佈局的單位**(月 / 年 / 日)為粒度 —— 新檔存在就用新檔,
+#:   否則退回舊佈局涵蓋該單位(且落在查詢區間內)的檔。**新檔優先**:兩邊都有時
+#:   舊檔視為已被取代(轉檔是「先寫新、後刪舊」,中間那段兩邊都在是常態)。
+#:   ⚠️ 舊佈局比新佈局**粗**時(年檔 → 月檔):一個舊檔橫跨好幾個新單位,
+#:   混用會讓同一段資料讀兩次 ⇒ 改以**舊單位**為粒度,新單位(在查詢區間內的)
+#:   全到齊才用新檔,否則整段用舊檔。
+#: 存在與否一律查**目錄清單**(`_listing`,一個目錄一次 `os.scandir`),
+#:   不是逐檔 stat —— 否則雙佈局會把 stat 次數翻倍。
+LAYOUT_FALLBACK = {}
 
-def layout_of(tf):
-    """回傳 'daily' / 'monthly' / 'yearly'。"""
-    v = LAYOUT.get(tf, DEFAULT_LAYOUT)
+_COARSENESS = {"daily": 0, "monthly": 1, "yearly": 2}
+
+
+def _check_layout(v, tf):
     if v not in LAYOUTS:
         raise LakePathError(f"未知的 kbar 佈局 {v!r}(tf={tf});合法值:{LAYOUTS}")
     return v
 
 
+def layout_of(tf):
+    """回傳 'daily' / 'monthly' / 'yearly'。"""
+    return _check_layout(LAYOUT.get(tf, DEFAULT_LAYOUT), tf)
+
+
+def _fallback_of(tf):
+    """遷移期的舊佈局;沒有在遷移(或新舊相同)→ None。"""
+    v = LAYOUT_FALLBACK.get(tf)
+    if v is None:
+        return None
+    v = _check_layout(v, tf)
+    return None if v == layout_of(tf) else v
+
+
 def _as_date(d):
     if isinstance(d, _dt.datetime):
         return d.date()
@@ -226,7 +261,11 @@ def kbar_dir(tf, symbol, year=None):
     daily 佈局多一層年份子目錄;monthly / yearly 是平的
     (一個 tf/symbol 底下最多 79 個月檔或 7 個年檔,不值得再分層)。
     """
-    if layout_of(tf) in ("yearly", "monthly"):
+    return _kbar_dir(layout_of(tf), tf, symbol, year)
+
+
+def _kbar_dir(lay, tf, symbol, year=None):
+    if lay in ("yearly", "monthly"):
         return os.path.join(CACHE_ROOT, tf, symbol)
     parts = [CACHE_ROOT, tf, symbol]
     if year is not None:
@@ -243,6 +282,141 @@ def _month_starts(s, e):
     return out
 
 
+def _layout_units(lay, tf, symbol, s, e):
+    """佈局 `lay` 下涵蓋 s..e 的檔:[(路徑, 單位起日, 單位迄日)],單位已裁進 s..e。"""
+    units = []
+    if lay == "yearly":
+        for year in range(s.year, e.year + 1):
+            units.append((os.path.join(_kbar_dir(lay, tf, symbol),
+                                       f"{symbol}_{tf}_{year:04d}.parquet"),
+                          max(s, _dt.date(year, 1, 1)), min(e, _dt.date(year, 12, 31))))
+    elif lay == "monthly":
+        for y, m in _month_starts(s, e):
+            nxt = _dt.date(y + 1, 1, 1) if m == 12 else _dt.date(y, m + 1, 1)
+            units.append((os.path.join(_kbar_dir(lay, tf, symbol),
+                                       f"{symbol}_{tf}_{y:04d}-{m:02d}.parquet"),
+                          max(s, _dt.date(y, m, 1)), min(e, nxt - _dt.timedelta(days=1))))
+    else:
+        d = s
+        step = _dt.timedelta(days=1)
+        while d <= e:
+            units.append((os.path.join(_kbar_dir(lay, tf, symbol, d.year),
+                                       f"{d.isoformat()}_{symbol}_{tf}.parquet"), d, d))
+            d += step
+    return units
+
+
+def _listing(d, manifest):
+    """目錄 `d` 的檔名集合 —— 一個目錄一次 `os.scandir`,同一份 `manifest` 內不重讀。
+
+    `manifest` 是呼叫端持有的 dict({目錄: frozenset(檔名)}),壽命 = 一次解析。
+    刻意不做成模組層級快取:目錄內容會變(ETL 每天寫),跨呼叫的快取會讀到舊世界。
+    """
+    names = manifest.get(d)
+    if names is None:
+        try:
+            with os.scandir(d) as it:
+                names = frozenset(x.name for x in it)
+        except OSError:                   # 目錄不存在 = 裡面什麼都沒有
+            names = frozenset()
+        manifest[d] = names
+    return names
+
+
+def _listed(path, manifest):
+    return os.path.basename(path) in _listing(os.path.dirname(path), manifest)
+
+
+#: 同一目錄要查的檔數 ≥ 這個值才改用 `os.scandir` 整個目錄讀一次;少於它逐檔 stat 較省
+#: (單日查詢不值得把 250 個檔名的年份目錄整個列出來)。
+_SCANDIR_MIN = 4
+
+
+def _existing(paths, manifest):
+    """`paths` 中存在的那些(保持原順序)。同目錄候選夠多 → 一次目錄清單;否則逐檔 stat。"""
+    per_dir = {}
+    for p in paths:
+        per_dir[os.path.dirname(p)] = per_dir.get(os.path.dirname(p), 0) + 1
+    for d, n in per_dir.items():
+        if n >= _SCANDIR_MIN:
+            _listing(d, manifest)
+    return [p for p in paths
+            if (_listed(p, manifest) if os.path.dirname(p) in manifest else os.path.exists(p))]
+
+
+def _resolve_units(tf, symbol, s, e, manifest):
+    """s..e 的 [(路徑, 起日, 迄日)]。遷移期(`LAYOUT_FALLBACK`)逐單位挑新檔或舊檔。
+
+    非遷移期:就是新佈局的單位,不碰檔案系統。
+    遷移期:新檔是否存在、舊檔是否存在,全部查 `manifest`。回傳的一律是**存在**的檔
+    (新單位缺檔且舊佈局也沒有 → 該單位不出現)—— 兩個佈局都不在的路徑沒有意義。
+    """
+    lay = layout_of(tf)
+    old = _fallback_of(tf)
+    if old is None:
+        return _layout_units(lay, tf, symbol, s, e)
+    out = []
+    if _COARSENESS[old] > _COARSENESS[lay]:          # 舊檔較粗:以舊單位為粒度(見 LAYOUT_FALLBACK)
+        for op, os_, oe in _layout_units(old, tf, symbol, s, e):
+            news = _layout_units(lay, tf, symbol, os_, oe)
+            have = [u for u in news if _listed(u[0], manifest)]
+            if len(have) == len(news) or not _listed(op, manifest):
+                out.extend(have)
+            else:
+                out.append((op, os_, oe))
+        return out
+    for p, us, ue in _layout_units(lay, tf, symbol, s, e):
+        if _listed(p, manifest):
+            out.append((p, us, ue))
+        else:
+            out.extend(u for u in _layout_units(old, tf, symbol, us, ue)
+                       if _listed(u[0], manifest))
+    return out
+
+
+def _unit_span(lay, d):
+    """佈局 `lay` 下包含 `d` 的那個單位的完整起訖日(不裁切)。"""
+    if lay == "yearly":
+        return _dt.date(d.year, 1, 1), _dt.date(d.year, 12, 31)
+    if lay == "monthly":
+        nxt = _dt.date(d.year + 1, 1, 1) if d.month == 12 else _dt.date(d.year, d.month + 1, 1)
+        return _dt.date(d.year, d.month, 1), nxt - _dt.timedelta(days=1)
+    return d, d
+
+
+def kbar_write_target(tf, symbol, date):
+    """寫入端的入口:`date` 這一天的 kbar 該寫進哪個檔。回傳 {"path", "layout"}。
+
+    `layout` 是**該檔實際的佈局**:"daily" → 呼叫端直接覆寫;"monthly" / "yearly" →
+    一檔多日,呼叫端必須「讀舊檔 → 換掉這天的列 → 寫回」。
+
+    非遷移期:就是新佈局的單位。
+    遷移期(2026-10):寫到**讀取端會讀的那個檔** —— 否則寫了也看不到
+    (`_resolve_units` 以單位為粒度挑新或舊,新檔一存在,同單位的舊檔就被整個蓋掉)。
+      ‧ 新單位已存在(已轉檔)         → 併進新檔
+      ‧ 新單位不在、但舊佈局有檔       → 寫舊佈局(留給 compact_kbars 之後一起轉)
+      ‧ 兩邊都沒有                     → 新佈局(從此就是新的)
+    ⚠️ 第二條不能省:月還沒轉完就替「今天」開一個只有一天的月檔,那個月其餘的日檔
+       會立刻從讀取端消失。
+    """
+    require_roots(CACHE_ROOT)
+    d = _as_date(date)
+    lay = layout_of(tf)
+    new_p = _layout_units(lay, tf, symbol, d, d)[0][0]
+    old = _fallback_of(tf)
+    if old is None:
+        return {"path": new_p, "layout": lay}
+    us, ue = _unit_span(lay, d)
+    units = _resolve_units(tf, symbol, us, ue, {})
+    if not units:
+        return {"path": new_p, "layout": lay}
+    for p, a, b in units:
+        if a <= d <= b:
+            return {"path": p, "layout": lay if p == new_p else old}
+    # 單位內有舊檔、唯獨這天沒有 → 這天也寫舊佈局
+    return {"path": _layout_units(old, tf, symbol, d, d)[0][0], "layout": old}
+
+
 def kbar_paths(tf, symbol, start, end, existing_only=True):
     """`start`..`end`(**含頭含尾的日曆日**)對應的 kbar 檔路徑,依時間排序。
 
@@ -251,32 +425,24 @@ def kbar_paths(tf, symbol, start, end, existing_only=True):
 
     existing_only=True(預設)只回傳實際存在的檔,語意與呼叫端原本的
     `if os.path.exists(path)` 完全相同。
+
+    遷移期(`LAYOUT_FALLBACK` 有這個 tf):逐單位新檔優先、否則舊檔;
+    此時回傳的一律是存在的檔,`existing_only` 不影響結果。
     """
     require_roots(CACHE_ROOT)
     s, e = _as_date(start), _as_date(end)
     if e < s:
         return []
 
-    paths = []
-    lay = layout_of(tf)
-    if lay == "yearly":
-        for year in range(s.year, e.year + 1):
-            paths.append(os.path.join(kbar_dir(tf, symbol),
-                                      f"{symbol}_{tf}_{year:04d}.parquet"))
-    elif lay == "monthly":
-        for y, m in _month_starts(s, e):
-            paths.append(os.path.join(kbar_dir(tf, symbol),
-                                      f"{symbol}_{tf}_{y:04d}-{m:02d}.parquet"))
-    else:
-        d = s
-        step = _dt.timedelta(days=1)
-        while d <= e:
-            paths.append(os.path.join(kbar_dir(tf, symbol, d.year),
-                                      f"{d.isoformat()}_{symbol}_{tf}.parquet"))
-            d += step
+    manifest = {}
+    seen, paths = set(), []
+    for p, _us, _ue in _resolve_units(tf, symbol, s, e, manifest):
+        if p not in seen:                 # 新單位比舊單位細時(年檔 → 月檔),多個單位會退到同一個舊檔
+            seen.add(p)
+            paths.append(p)
 
-    if existing_only:
-        paths = [p for p in paths if os.path.exists(p)]
+    if existing_only and _fallback_of(tf) is None:
+        paths = _existing(paths, manifest)
     return paths
 
 
@@ -288,16 +454,34 @@ def kbar_paths_for_days(tf, symbol, days, existing_only=True):
     而 per-month 佈局下「一天一檔」不再成立,**多個日子可能對到同一個檔** ——
     去重這件事必須由知道佈局的這一層做,不能留給呼叫端。
     """
+    files = kbar_files_for_days(tf, symbol, days)
+    return [f["path"] for f in files if f["exists"] or not existing_only]
+
+
+def kbar_files_for_days(tf, symbol, days):
+    """`kbar_paths_for_days` 的結構化版本:[{"path", "dates", "exists"}],依時間排序。
+
+        path    檔案路徑(已去重)
+        dates   該檔涵蓋的**請求日**(`datetime.date`,遞增)—— 補洞的呼叫端據此知道
+                讀完這個檔能填哪幾天,不必自己再從檔名推佈局
+        exists  檔案是否存在
+
+    一次解析完所有日子:候選集一次建好,存在與否以**一個目錄一次 `os.scandir`**
+    查完(2026-10;原本是逐日 `kbar_paths` + 逐檔 `os.path.exists`,一年份的
+    per-day 補洞就是數百次 stat)。
+    """
     require_roots(CACHE_ROOT)
-    seen, paths = set(), []
-    for d in sorted(_as_date(x) for x in days):
-        for p in kbar_paths(tf, symbol, d, d, existing_only=False):
-            if p not in seen:
-                seen.add(p)
-                paths.append(p)
-    if existing_only:
-        paths = [p for p in paths if os.path.exists(p)]
-    return paths
+    manifest = {}                         # 所有日子共用一份目錄清單
+    by_path = {}
+    for d in sorted({_as_date(x) for x in days}):
+        for p, _us, _ue in _resolve_units(tf, symbol, d, d, manifest):
+            by_path.setdefault(p, []).append(d)
+    paths = list(by_path)
+    if _fallback_of(tf) is None:
+        present = set(_existing(paths, manifest))
+    else:                                 # 遷移期:_resolve_units 只回傳存在的檔
+        present = set(paths)
+    return [{"path": p, "dates": by_path[p], "exists": p in present} for p in paths]
 
 
 # --------------------------------------------------------------------------
@@ -344,6 +528,31 @@ def list_tick_files(symbol):
     return [p for _fn, p in found]
 
 
+# --------------------------------------------------------------------------
+# 衍生側:月 tick 包(2026-10)
+# --------------------------------------------------------------------------
+# 一個 (商品, 月) 一檔、一天一個 row group 的**唯讀副本**,給全史重播用
+# (fix_kbars / migrate_kbars:~5k 次開檔讀 footer → 幾百次)。
+# 🔒 它**不是** archive:日檔仍是唯一真相,包可整個刪掉重建(`tools/pack_ticks`)。
+#    放在 ARCHIVE_ROOT 底下只是因為它跟著 raw 走(同機、同碟),不代表它要備份。
+#    檔名 `<SYM>_ticks_<YYYY-MM>.parquet`:字典序 = 時間序(同 kbar 的 monthly)。
+
+def tick_pack_path(symbol, year, month):
+    return os.path.join(ARCHIVE_ROOT, "tick_packs", symbol,
+                        f"{symbol}_ticks_{int(year):04d}-{int(month):02d}.parquet")
+
+
+def list_tick_packs(symbol):
+    """該商品所有現存的月 tick 包,依月份排序。"""
+    require_roots(ARCHIVE_ROOT)
+    root = os.path.join(ARCHIVE_ROOT, "tick_packs", symbol)
+    if not os.path.isdir(root):
+        return []
+    prefix = f"{symbol}_ticks_"
+    return sorted(os.path.join(root, fn) for fn in os.listdir(root)
+                  if fn.startswith(prefix) and fn.endswith(".parquet"))
+
+
 def list_kbar_files(tf, symbol):
     """該 tf/symbol **所有**現存的 kbar 檔,依時間排序(沒有則空 list)。
 
@@ -353,6 +562,10 @@ def list_kbar_files(tf, symbol):
     排序依據是**檔名**:兩種佈局的檔名都滿足「字典序 = 時間序」
     (daily 是 `YYYY-MM-DD_…`,yearly 是 `SYM_tf_YYYY`),所以同一套排序都適用。
     🔒 之後加 monthly(`SYM_tf_YYYY-MM`)也仍然成立 —— 新增佈局時要複驗這個前提。
+
+    遷移期(`LAYOUT_FALLBACK`):兩種佈局的檔同時在盤上,而 daily 檔名(`YYYY-…`)
+    與 monthly/yearly(`SYM_…`)互相比字典序不等於時間序 ⇒ 改依檔名解出的起日排序,
+    並丟掉**已被新佈局檔涵蓋**的舊檔(新檔優先,同 `kbar_paths`)。
     """
     require_roots(CACHE_ROOT)
     root = os.path.join(CACHE_ROOT, tf, symbol)
@@ -363,10 +576,51 @@ def list_kbar_files(tf, symbol):
         for fn in filenames:
             if fn.endswith(".parquet"):
                 found.append((fn, os.path.join(dirpath, fn)))
+    if _fallback_of(tf) is not None:
+        return _resolve_listed(tf, symbol, found)
     found.sort(key=lambda x: x[0])
     return [p for _fn, p in found]
 
 
+def _file_span(fn, tf, symbol):
+    """檔名 → (佈局, 起日, 迄日);認不得的檔名 → None。"""
+    stem = fn[:-len(".parquet")]
+    prefix = f"{symbol}_{tf}_"
+    try:
+        if stem.endswith(f"_{symbol}_{tf}"):
+            d = _dt.date.fromisoformat(stem[:10])
+            return "daily", d, d
+        if stem.startswith(prefix):
+            key = stem[len(prefix):]
+            if len(key) == 7:
+                y, m = int(key[:4]), int(key[5:])
+                nxt = _dt.date(y + 1, 1, 1) if m == 12 else _dt.date(y, m + 1, 1)
+                return "monthly", _dt.date(y, m, 1), nxt - _dt.timedelta(days=1)
+            if len(key) == 4:
+                y = int(key)
+                return "yearly", _dt.date(y, 1, 1), _dt.date(y, 12, 31)
+    except ValueError:
+        pass
+    return None
+
+
+def _resolve_listed(tf, symbol, found):
+    """遷移期的 `list_kbar_files`:新佈局全收;舊佈局只收起日不在任何新檔涵蓋範圍內的。
+
+    舊檔較粗(年檔 → 月檔)時反過來:與舊檔重疊的新檔不收,舊檔整個留著 ——
+    「全史」沒有查詢區間可言,只要不重複讀即可(同 `_resolve_units` 的粒度規則)。
+    """
+    lay, old = layout_of(tf), _fallback_of(tf)
+    spans = [(_file_span(fn, tf, symbol), p) for fn, p in found]
+    spans = [(sp, p) for sp, p in spans if sp is not None and sp[0] in (lay, old)]
+    winner = old if _COARSENESS[old] > _COARSENESS[lay] else lay
+    covered = [(a, b) for (lay_, a, b), _p in spans if lay_ == winner]
+    keep = [(a, p) for (lay_, a, _b), p in spans
+            if lay_ == winner or not any(ca <= a <= cb for ca, cb in covered)]
+    keep.sort()
+    return [p for _a, p in keep]
+
+
 def latest_kbar_file(tf, symbol):
     """該 tf/symbol **最新的** kbar 檔(沒有則 None)。
 
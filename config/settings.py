@@ -38,4 +38,12 @@ SETTLEMENT_CALENDAR_PATH = os.path.join(ADJUSTMENTS_DIR, "settlement_calendar.cs
 #   依據與 ADR P3「5s 是原子單位」同一個論證:粗 TF 的邊界是細 TF 邊界的子集,
 #   而 OHLC 可結合、volume 與 true_pv_sum 可加 ⇒ 分層聚合無損。
 #   歷史 4807 檔是**從既有 5m 回填**的(比重跑逐筆快得多,且由上述對照保證等價)。
-TIMEFRAMES = ['5s', '1m', '5m', '30m', '1h', '1d']
\ No newline at end of file
+TIMEFRAMES = ['5s', '1m', '5m', '30m', '1h', '1d']
+# K 棒是否多產四欄主動方成交量(buy / sell / unknown / tick_rule_volume;2026-10)。
+# 定義見 `core/resampler.resample_to_kbars(order_flow=True)`。
+# ⚠️ 開啟程序(順序不能反):
+#   ① 改成 True  ② **下一次 ETL 之前**跑 `python -m tools.migrate_kbars order_flow`
+#   沒跑遷移就讓 ETL 寫 → 1d 年檔「舊 14 欄 + 新 18 欄」concat 會 schema 不合而跳過更新(❌ 會浮上來)。
+# 開關本身算 schema 的一部分(`core/lineage.SCHEMA_VERSION` 跟著變)→ 翻動後血緣全數過期,
+# 遷移/重建過的檔才會重新記為「目前版本」。
+KBAR_ORDER_FLOW = False
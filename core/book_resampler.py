@@ -0,0 +1,218 @@
+# core/book_resampler.py
+#
+# 五檔簿(`*_bidask.parquet`)→ 每 TF 的**簿面 K 棒**(2026-10)。`resample_to_kbars` 的兄弟。
+#
+# 為什麼要它:raw_ticks 目錄裡躺著 178 檔 / 949 MB 的五檔簿(2025-12 起),這個 repo
+#   沒有任何東西讀它(`list_tick_files` 還特地把它排除)。`fetch_ticks` 只在每筆成交上
+#   留最佳一檔,價差 / 中價 / 深度 / 失衡這些東西於是在下游每次臨時重算,成本高得多。
+#
+# 產出(一列 = 一根棒,桶與 `resample_to_kbars` 完全相同,可直接以 (date, session, ts) 對齊 kbars):
+#   mid_open/high/low/close   中價 (bid1 + ask1) / 2 的 OHLC(簿更新序)
+#   spread_tw / _min / _max   價差:時間加權平均 / 最小 / 最大
+#   bid_depth_tw / ask_depth_tw  五檔量和的時間加權平均
+#   book_imb_tw               (bid_depth − ask_depth) / (bid_depth + ask_depth) 的時間加權平均
+#   buy_volume / sell_volume  成交以 as-of join 對上**成交前**最後一個簿面後分類的量
+#                             (≥ ask1 或 > 中價 → 買方主動;≤ bid1 或 < 中價 → 賣方;= 中價不分)
+#   trade_imb                 (buy − sell) / (buy + sell)
+#   n_updates / book_dur_s    桶內簿更新數 / 時間權重總長(秒;= 桶名目長,同 kbars 的 dur_s)
+#
+# 時間加權沿用 `core.resampler.pt_slice_columns` 的棒邊界切片:每個簿面持續到下一次更新
+#   或桶尾為止,桶頭那段由前一個簿面(LOCF)涵蓋 —— 與 true_pt_sum 同一把尺。
+#
+# 輸出:`BOOK_ROOT/<tf>/<sym>/<YYYY>/<date>_<sym>_<tf>.parquet`(衍生品,可整個刪掉重建,
+#   同 quality/ 放在 DATA_ROOT 底下;不進 `lake_paths` —— 其他 repo 還沒有讀者)。
+import os
+import re
+
+import polars as pl
+
+from config.lake_paths import tick_dir, tick_path
+from config.settings import DATA_ROOT
+from core.resampler import (DAY_SESSION_LIMIT_SEC, NIGHT_SESSION_LIMIT_SEC, pt_slice_columns,
+                            sessionize)
+
+BOOK_ROOT = os.path.join(DATA_ROOT, "book")
+
+#: 收盤後還算本盤段的簿更新(µs)。超過的是盤後 / 次盤段試撮前的掛單,不屬於任何一根棒。
+#: 成交端的 grace 由 `session_model.DAY_CLOSE_WITH_GRACE` 管(5 秒);簿面寬一點無妨,
+#: 反正會被 `pt_slice_columns` 釘在盤段上限、時間權重為 0,只影響 mid_close / spread_max。
+_BOOK_TAIL_GRACE_US = 60 * 1_000_000
+
+BOOK_COLS = ["symbol", "date", "ts", "session",
+             "mid_open", "mid_high", "mid_low", "mid_close",
+             "spread_tw", "spread_min", "spread_max",
+             "bid_depth_tw", "ask_depth_tw", "book_imb_tw",
+             "buy_volume", "sell_volume", "trade_imb",
+             "n_updates", "book_dur_s"]
+
+
+def bidask_path(symbol, d):
+    """五檔簿日檔(與逐筆同目錄;見 `lake_paths.list_tick_files` 的 ⚠️)。"""
+    d = str(d)[:10]
+    return os.path.join(tick_dir(symbol, d[:4], d[5:7]), f"{d}_{symbol}_bidask.parquet")
+
+
+def book_path(tf, symbol, d):
+    d = str(d)[:10]
+    return os.path.join(BOOK_ROOT, tf, symbol, d[:4], f"{d}_{symbol}_{tf}.parquet")
+
+
+def normalize_book(df: pl.DataFrame) -> pl.DataFrame:
+    """任一種五檔簿 schema → (ts, bid1, ask1, bid_depth, ask_depth)。
+
+    認兩種寫法:
+      ‧ list 欄   `bid_price` / `bid_volume` / `ask_price` / `ask_volume`(Shioaji BidAsk 原樣)
+      ‧ 攤平欄    `bid_price_1..5` / `bid_volume_1..5` / …(1 = 最佳一檔)
+    一檔價為 0 / null(無掛單)→ 該側 null;深度 = 有的檔位量和。
+    """
+    cols = df.columns
+    if "bid_price" in cols and isinstance(df.schema["bid_price"], (pl.List, pl.Array)):
+        df = df.with_columns([pl.col(c).arr.to_list() for c in
+                              ("bid_price", "bid_volume", "ask_price", "ask_volume")
+                              if isinstance(df.schema[c], pl.Array)])
+
+        def side(p):
+            return pl.col(f"{p}_price").list.first(), pl.col(f"{p}_volume").list.sum()
+    else:
+        def side(p):
+            lv = sorted((int(m.group(1)), c) for c in cols
+                        if (m := re.fullmatch(rf"{p}_volume_(\d+)", c)))
+            if f"{p}_price_1" not in cols or not lv:
+                raise ValueError(f"認不得的五檔簿 schema(缺 {p}_price_1 / {p}_volume_N):{cols}")
+            return pl.col(f"{p}_price_1"), pl.sum_horizontal([pl.col(c) for _, c in lv])
+    (bp, bd), (ap, ad) = side("bid"), side("ask")
+    out = df.select(
+        pl.col("ts"),
+        pl.when(bp > 0).then(bp).cast(pl.Float64).alias("bid1"),
+        pl.when(ap > 0).then(ap).cast(pl.Float64).alias("ask1"),
+        bd.cast(pl.Float64).alias("bid_depth"),
+        ad.cast(pl.Float64).alias("ask_depth"),
+    )
+    return out.sort("ts", maintain_order=True)
+
+
+def _in_session(q: pl.LazyFrame) -> pl.LazyFrame:
+    """丟掉盤段外(收盤 + grace 之後 ~ 下一盤段開盤前)的列。須在 `pt_slice_columns` 之後。"""
+    lim_us = (pl.when(pl.col("session") == "Day")
+              .then(pl.lit(DAY_SESSION_LIMIT_SEC * 1_000_000, dtype=pl.Int64))
+              .otherwise(pl.lit(NIGHT_SESSION_LIMIT_SEC * 1_000_000, dtype=pl.Int64)))
+    return q.filter(pl.col("_us_raw") < lim_us + _BOOK_TAIL_GRACE_US)
+
+
+def _bar_ts(dtype) -> pl.Expr:
+    """桶起點的牆鐘時間 = date + 開盤(Day 08:45 / Night 15:00)+ 桶偏移,型別同 kbars 的 `ts`。
+
+    分時棒與 kbars 的 ts 逐值相同;1d 為盤段開盤(kbars 的 1d ts 是首筆成交,以 (date, session) 對齊)。
+    """
+    open_ = (pl.when(pl.col("session") == "Day")
+             .then(pl.duration(hours=8, minutes=45))
+             .otherwise(pl.duration(hours=15)))
+    return (pl.col("date").cast(dtype) + open_
+            + pl.duration(microseconds=pl.col("_bkt"))).cast(dtype).alias("ts")
+
+
+def resample_book(book_df: pl.DataFrame, timeframe: str, trades_df: pl.DataFrame | None = None,
+                  symbol: str | None = None) -> pl.DataFrame:
+    """五檔簿(+ 可選的成交)→ 簿面 K 棒。`book_df` 可為原始 schema(會先 `normalize_book`)。
+
+    `trades_df` 為該日 raw ticks(`ts` / `close` / `volume`);None → buy/sell 欄為 null。
+    """
+    if "bid1" not in book_df.columns:
+        book_df = normalize_book(book_df)
+    grp = ["date", "session", "_bkt"]
+
+    # ── 簿面:時間權重(每個簿面持續到下一次更新或桶尾;桶頭由前一簿面 LOCF)──
+    b = book_df.lazy().with_columns(
+        ((pl.col("bid1") + pl.col("ask1")) / 2).alias("mid"),
+        (pl.col("ask1") - pl.col("bid1")).alias("spread"),
+        ((pl.col("bid_depth") - pl.col("ask_depth"))
+         / (pl.col("bid_depth") + pl.col("ask_depth"))).alias("imb"),
+        pl.lit(1, dtype=pl.Int64).alias("close"),        # pt_slice_columns 要 close;這裡只取時距
+    )
+    b = _in_session(pt_slice_columns(sessionize(b), timeframe))
+    feats = ["spread", "bid_depth", "ask_depth", "imb"]
+    # 前一簿面(同盤段;盤段首筆 → 自身),排序與 pt_slice_columns 的 _prev_px 相同
+    b = b.with_columns([pl.col(f).shift(1).over(["date", "session"]).fill_null(pl.col(f))
+                        .alias(f"_prev_{f}") for f in feats])
+    w_own, w_head = pl.col("_dur_own"), pl.col("_dur_head")
+
+    def tw(f):
+        # null(單邊無掛單)的時段不計入分母
+        num = (pl.col(f) * w_own).sum() + (pl.col(f"_prev_{f}") * w_head).sum()
+        den = ((w_own * pl.col(f).is_not_null()).sum()
+               + (w_head * pl.col(f"_prev_{f}").is_not_null()).sum())
+        return pl.when(den > 0).then(num / den).alias(f"{f}_tw")
+
+    bars = b.group_by(grp, maintain_order=True).agg([
+        pl.col("mid").drop_nulls().first().alias("mid_open"),
+        pl.col("mid").max().alias("mid_high"),
+        pl.col("mid").min().alias("mid_low"),
+        pl.col("mid").drop_nulls().last().alias("mid_close"),
+        tw("spread"),
+        pl.col("spread").min().alias("spread_min"),
+        pl.col("spread").max().alias("spread_max"),
+        tw("bid_depth"), tw("ask_depth"), tw("imb"),
+        pl.len().alias("n_updates"),
+        ((w_own + w_head).sum() / 1_000_000).alias("book_dur_s"),
+    ]).rename({"imb_tw": "book_imb_tw"})
+
+    # ── 成交:as-of join 到**成交前**最後一個簿面(同 ts 的簿更新多半是成交造成的,不算)──
+    if trades_df is not None and not trades_df.is_empty():
+        book_sorted = book_df.lazy().select(["ts", "bid1", "ask1"]).sort("ts")
+        t = (trades_df.lazy().select(["ts", "close", "volume"])
+             .with_columns(pl.col("ts").cast(book_df.schema["ts"]))
+             .sort("ts", maintain_order=True)
+             .join_asof(book_sorted, on="ts", strategy="backward", allow_exact_matches=False))
+        mid = (pl.col("bid1") + pl.col("ask1")) / 2
+        px = pl.col("close").cast(pl.Float64)
+        side = (pl.when((px >= pl.col("ask1")) | (px > mid)).then(1)
+                .when((px <= pl.col("bid1")) | (px < mid)).then(-1)
+                .otherwise(0))
+        t = _in_session(pt_slice_columns(sessionize(t.with_columns(side.alias("_side"))),
+                                          timeframe))
+        flow = t.group_by(grp).agg([
+            pl.col("volume").filter(pl.col("_side") == 1).sum().alias("buy_volume"),
+            pl.col("volume").filter(pl.col("_side") == -1).sum().alias("sell_volume"),
+        ])
+        bars = bars.join(flow, on=grp, how="left", maintain_order="left")
+    else:
+        bars = bars.with_columns(pl.lit(None, dtype=pl.Int64).alias("buy_volume"),
+                                 pl.lit(None, dtype=pl.Int64).alias("sell_volume"))
+    tot = pl.col("buy_volume") + pl.col("sell_volume")
+    bars = bars.with_columns(
+        pl.when(tot > 0).then((pl.col("buy_volume") - pl.col("sell_volume")) / tot)
+        .alias("trade_imb"),
+        # kbars 的 ts:分時棒經 snap(µs duration)為 µs;1d 取首筆成交,沿用輸入單位
+        _bar_ts(book_df.schema["ts"] if timeframe == "1d" else pl.Datetime("us")),
+        pl.lit(symbol).alias("symbol"),
+    )
+    # 交易日永不為週末(同 resample_to_kbars 5b)
+    bars = bars.filter(pl.col("date").dt.weekday() < 6)
+    return bars.select(BOOK_COLS).sort("ts").collect()
+
+
+def build_book_day(symbol: str, date_str: str, timeframes, trades_df: pl.DataFrame | None = None,
+                   write: bool = True) -> dict[str, pl.DataFrame]:
+    """一天的五檔簿 → 各 TF 簿面 K 棒(原子寫入 `book_path`)。沒有 bidask 檔 → 空 dict。
+
+    簿只正規化一次,各 TF 共用;`trades_df` 不給時讀該日 raw ticks(沒有就不分買賣)。
+    """
+    src = bidask_path(symbol, date_str)
+    if not os.path.exists(src):
+        return {}
+    book = normalize_book(pl.read_parquet(src))
+    if trades_df is None:
+        tp = tick_path(symbol, date_str)
+        trades_df = pl.read_parquet(tp, columns=["ts", "close", "volume"]) \
+            if os.path.exists(tp) else None
+    out = {}
+    for tf in timeframes:
+        bars = resample_book(book, tf, trades_df, symbol)
+        out[tf] = bars
+        if write and not bars.is_empty():
+            dest = book_path(tf, symbol, date_str)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = f"{dest}.tmp{os.getpid()}"
+            bars.write_parquet(tmp)
+            os.replace(tmp, dest)
+    return out
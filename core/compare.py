@@ -0,0 +1,66 @@
+# core/compare.py
+#
+# 兩份 kbar 的**逐欄比對**,全部在 polars 表達式裡做完(2026-10)。
+#
+# 為什麼要它:`tools/verify_rebuild._cmp` 與 `tools/backfill_pt_sum._col_match` 各自把
+#   整欄 `to_list()` 成 Python list 再逐元素比(後者還用 `math.isclose`),1d 嫁接更是
+#   `to_dicts()` 逐列。全史 24k 檔跑下來,大部分時間花在「把 Arrow 轉成 Python 物件」
+#   而不是比對本身。這裡把三者需要的東西收斂成兩個函式:
+#     ‧ `match_expr`     逐列的「相等/容忍內」布林表達式(給 join 後逐列判斷用)
+#     ‧ `compare_frames` 逐欄摘要:是否逐位元相同、最大相對誤差、第一個不符列、不符列數
+#   兩者語意相同,只差在聚合與否 —— 報告說「哪一欄、差多少、從哪一列開始」,
+#   仍然是 `_cmp` 的設計要求(不能只回 True/False)。
+#
+# 相等的定義(與舊的 Python 迴圈逐項對照):
+#   ‧ null 對 null 視為相同(舊碼 `x is None and y is None`)
+#   ‧ 容忍欄:|a − b| ≤ rel_tol × max(|a|, |b|, floor)
+#       floor=1.0 → `verify_rebuild._cmp` 的舊式(小值時退化為絕對容忍)
+#       floor=0.0 → `math.isclose(a, b, rel_tol=…)`(abs_tol=0)
+#     一邊 null、一邊有值 → 永遠不符
+import polars as pl
+
+
+def match_expr(a: str, b: str, rel_tol: float | None = None, floor: float = 1.0) -> pl.Expr:
+    """逐列布林:欄 `a` 與欄 `b` 相同(或在 `rel_tol` 內)。null 對 null 為 True。"""
+    same = pl.col(a).eq_missing(pl.col(b))
+    if rel_tol is None:
+        return same
+    x, y = pl.col(a).cast(pl.Float64), pl.col(b).cast(pl.Float64)
+    close = (x - y).abs() <= rel_tol * pl.max_horizontal(x.abs(), y.abs(), pl.lit(floor))
+    return same | close.fill_null(False)
+
+
+def compare_frames(a: pl.DataFrame, b: pl.DataFrame, cols: list[str],
+                   rel_tol: dict[str, float] | None = None, floor: float = 1.0) -> dict:
+    """逐欄比對兩個**等高、已對齊**的 DataFrame,一次 select 算完所有欄。
+
+    回傳 {col: {"exact", "ok", "n_bad", "first_bad", "max_rel"}}:
+      exact     逐位元(含 null 位置)相同
+      ok        exact,或每個差異都落在該欄的 `rel_tol` 內
+      n_bad     超出容忍的列數
+      first_bad 第一個超出容忍的列號(ok 時為 None)
+      max_rel   最大相對誤差(只對有 rel_tol 的欄;完全相同時為 0.0)
+    """
+    rel_tol = rel_tol or {}
+    both = pl.concat([a.select(cols).rename(lambda c: f"a\x00{c}"),
+                      b.select(cols).rename(lambda c: f"b\x00{c}")], how="horizontal")
+    aggs = []
+    for i, c in enumerate(cols):
+        ca, cb = f"a\x00{c}", f"b\x00{c}"
+        exact = match_expr(ca, cb)
+        ok = match_expr(ca, cb, rel_tol.get(c), floor)
+        aggs += [exact.all().alias(f"{i}:exact"),
+                 (~ok).sum().alias(f"{i}:n_bad"),
+                 (~ok).arg_true().first().alias(f"{i}:first_bad")]
+        if c in rel_tol:
+            x, y = pl.col(ca).cast(pl.Float64), pl.col(cb).cast(pl.Float64)
+            rel = (x - y).abs() / pl.max_horizontal(x.abs(), y.abs(), pl.lit(floor))
+            aggs.append(rel.filter(~exact).max().fill_null(0.0).alias(f"{i}:max_rel"))
+    r = both.select(aggs).row(0, named=True) if aggs else {}
+    out = {}
+    for i, c in enumerate(cols):
+        n_bad = r[f"{i}:n_bad"]
+        out[c] = {"exact": r[f"{i}:exact"], "ok": n_bad == 0, "n_bad": n_bad,
+                  "first_bad": r[f"{i}:first_bad"],
+                  "max_rel": r.get(f"{i}:max_rel")}
+    return out
@@ -0,0 +1,149 @@
+# core/lineage.py
+#
+# kbar 檔的**血緣**(2026-10):每個 kbar 檔是「哪一份 raw × 哪一版 recipe」做出來的。
+#
+# 為什麼要它:`tools/verify_rebuild` 證明了 kbars 是 archive 的純函數 ——
+#   kbar = resample_to_kbars(raw)。但**沒有任何地方記錄**某個 kbar 檔是用哪份 raw、
+#   哪一版 resampler 做的。結果是每個重建工具(fix_kbars / backfill_pt_sum / verify_rebuild)
+#   都只能「全部重做」或「靠欄位有沒有在猜」。有了血緣:
+#     ‧ 輸入與 recipe 都沒變 → 跳過(重跑零成本、可中斷續跑)
+#     ‧ recipe 改了 → **恰好**重建由舊 recipe 做出來的那些檔,不是整座湖
+#
+# 兩個落點(互為備援,讀者各取所需):
+#   ① parquet footer 的 key-value metadata(`txf.lineage.*`)—— 跟著檔走,複製/搬家不掉
+#   ② 血緣索引 `CACHE_ROOT/_meta/lineage.parquet` —— 一個 (tf, 商品, 日) 一列,
+#      查「哪些檔過期」不必開 24k 個 footer
+# 1d 年檔一檔裝一整年:footer 只記 recipe / schema 版本,逐日的 raw 雜湊在索引裡。
+#
+# 🔒 recipe 雜湊 = 明寫的 `RECIPE_VERSION` 的雜湊,不是程式檔內容的雜湊:改註解、重構、
+#    加預設關閉的欄都不該讓全湖 kbars 被判過期 —— 「會不會改變值」由改的人判斷。
+import hashlib
+import os
+from datetime import datetime
+
+import polars as pl
+
+from config.lake_paths import CACHE_ROOT
+from config.settings import KBAR_ORDER_FLOW
+
+#: kbar recipe 的版本。**改了任何會改變 kbar 值的程式碼就 +1**(只改註解、重構、
+#: 加預設關閉的欄 → 不動)。會改變值的程式碼 = core/resampler.py、config/calendar_rules.py、
+#: config/session_model.py(vendored 凍結檔,但它決定盤段邊界,一樣算)。
+#:   2026-10.1  初版
+RECIPE_VERSION = "2026-10.1"
+
+#: kbar 欄位 schema 的版本。**加/刪/改欄時 +1**(recipe 雜湊抓不到「寫端多寫一欄」這種事)。
+#:   1 = 10 欄(… volume, true_pv_sum)
+#:   2 = + true_pt_sum / dur_s(2026-08-16,wiki/MA-Semantics §6)
+#:   3 = + buy / sell / unknown / tick_rule_volume(2026-10;僅 `settings.KBAR_ORDER_FLOW` 開啟時)
+SCHEMA_VERSION = 3 if KBAR_ORDER_FLOW else 2
+
+META_PREFIX = "txf.lineage."
+INDEX_PATH = os.path.join(CACHE_ROOT, "_meta", "lineage.parquet")
+INDEX_SCHEMA = {
+    "tf": pl.Utf8, "symbol": pl.Utf8, "date": pl.Utf8, "out_path": pl.Utf8,
+    "raw_hash": pl.Utf8, "raw_size": pl.Int64, "raw_mtime_ns": pl.Int64,
+    "recipe": pl.Utf8, "schema_version": pl.Int64, "written": pl.Utf8,
+}
+_KEY = ["tf", "symbol", "date"]
+
+
+def file_hash(path: str) -> str:
+    """檔案內容雜湊(blake2b-128 hex)。讀原始位元組,不解碼 parquet。"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def recipe_hash() -> str:
+    return hashlib.blake2b(f"recipe:{RECIPE_VERSION}".encode(), digest_size=16).hexdigest()
+
+
+#: 本行程的 recipe 雜湊(新寫的索引列與 footer 的 `recipe` 欄就是它)。
+RESAMPLER_HASH = recipe_hash()
+
+
+def raw_fingerprint(raw_path: str, prev: dict | None = None) -> dict:
+    """raw 檔的 {raw_hash, raw_size, raw_mtime_ns}。stat 與 `prev`(索引列)相同就沿用雜湊。"""
+    st = os.stat(raw_path)
+    if prev and prev.get("raw_size") == st.st_size and prev.get("raw_mtime_ns") == st.st_mtime_ns:
+        h = prev["raw_hash"]
+    else:
+        h = file_hash(raw_path)
+    return {"raw_hash": h, "raw_size": st.st_size, "raw_mtime_ns": st.st_mtime_ns}
+
+
+def lineage_metadata(raw_hash: str | None = None, source: str | None = None) -> dict[str, str]:
+    """寫 kbar 時掛在 footer 的 key-value metadata(`write_parquet(metadata=...)`)。
+
+    `raw_hash=None` 用於 1d 年檔(多個來源;逐日雜湊見索引)。
+    """
+    md = {f"{META_PREFIX}recipe": RESAMPLER_HASH,
+          f"{META_PREFIX}schema_version": str(SCHEMA_VERSION),
+          f"{META_PREFIX}raw_hash": raw_hash or "(per-day; see _meta/lineage.parquet)"}
+    if source:
+        md[f"{META_PREFIX}source"] = source
+    return md
+
+
+def read_lineage(path: str) -> dict[str, str]:
+    """讀 footer 的 `txf.lineage.*`(去前綴)。沒有血緣的舊檔回空 dict。"""
+    import pyarrow.parquet as pq
+    md = pq.read_metadata(path).metadata or {}
+    return {k.decode()[len(META_PREFIX):]: v.decode()
+            for k, v in md.items() if k.decode().startswith(META_PREFIX)}
+
+
+def load_index() -> dict[tuple[str, str, str], dict]:
+    """{(tf, symbol, date): 索引列}。索引不存在或讀不動 → 空(= 全部視為過期,安全側)。"""
+    if not os.path.exists(INDEX_PATH):
+        return {}
+    try:
+        df = pl.read_parquet(INDEX_PATH)
+    except Exception as e:
+        print(f"⚠️  血緣索引讀取失敗({e}),本次視為全部過期")
+        return {}
+    return {(r["tf"], r["symbol"], r["date"]): r for r in df.iter_rows(named=True)}
+
+
+def is_current(index: dict, tf: str, symbol: str, date_str: str, raw_hash: str,
+               out_path: str | None = None) -> bool:
+    """這個 (tf, 商品, 日) 是否已由**同一份 raw × 目前 recipe × 目前 schema** 做出來。"""
+    r = index.get((tf, symbol, date_str))
+    return (r is not None and r["raw_hash"] == raw_hash
+            and r["recipe"] == RESAMPLER_HASH and r["schema_version"] == SCHEMA_VERSION
+            and (out_path is None or os.path.exists(out_path)))
+
+
+def lineage_row(tf: str, symbol: str, date_str: str, out_path: str, fp: dict) -> dict:
+    """索引的一列。`fp` = `raw_fingerprint()` 的結果。"""
+    return {"tf": tf, "symbol": symbol, "date": date_str,
+            "out_path": os.path.relpath(out_path, CACHE_ROOT), **fp,
+            "recipe": RESAMPLER_HASH, "schema_version": SCHEMA_VERSION,
+            "written": datetime.now().isoformat(timespec="seconds")}
+
+
+def record(rows: list[dict]) -> None:
+    """把血緣列 upsert 進索引(身分 = (tf, symbol, date),keep-last),原子換檔。"""
+    if not rows:
+        return
+    new = pl.DataFrame(rows, schema=INDEX_SCHEMA)
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    if os.path.exists(INDEX_PATH):
+        new = pl.concat([pl.read_parquet(INDEX_PATH), new], how="diagonal_relaxed")
+    new = new.unique(subset=_KEY, keep="last").sort(_KEY)
+    tmp = f"{INDEX_PATH}.tmp{os.getpid()}"
+    new.write_parquet(tmp)
+    os.replace(tmp, INDEX_PATH)
+
+
+def stale(index: dict | None = None) -> pl.DataFrame:
+    """索引中**不是由目前 recipe / schema** 做出來的列 —— recipe 改版後要重建的恰好就是這些。"""
+    index = load_index() if index is None else index
+    if not index:
+        return pl.DataFrame(schema=INDEX_SCHEMA)
+    return (pl.DataFrame(list(index.values()), schema=INDEX_SCHEMA)
+            .filter((pl.col("recipe") != RESAMPLER_HASH)
+                    | (pl.col("schema_version") != SCHEMA_VERSION)))
@@ -0,0 +1,86 @@
+# core/pool.py
+#
+# 全工作區 process pool 的唯一入口(2026-10)。
+#
+# 🔒 一律 spawn:主程序 import polars 時就起了它的執行緒池;fork 出的 worker 繼承的是
+#    「某條執行緒正握著鎖」那一瞬間的記憶體副本,鎖永遠不會被放開 ⇒ worker 卡死、不報錯。
+#    Linux 的預設是 fork(Windows 本來就是 spawn,所以這個只在 Linux 上咬人)。
+#    工具各自寫 `mp_context=multiprocessing.get_context("spawn")` 已經漏過一次,收在這裡。
+#
+# ⚠️ spawn 的代價:worker 重新 import 呼叫端模組 ⇒ 提交給 pool 的函式必須是**模組頂層**的,
+#    呼叫端的 `if __name__ == "__main__":` 不可省。
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def spawn_pool(workers):
+    """`ProcessPoolExecutor(max_workers=workers)`,固定用 spawn 起 worker。當 context manager 用。"""
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+# ── 逐日衍生品的批次建置(build_book_bars / build_spread_bars 共用)──────────────
+# 兩支工具原本各寫一份:掃候選日 → 「每個 TF 都有輸出」就跳過 → pool 平行 → 進度 / 摘要。
+# ⚠️ 「有輸出才算做過」漏了一種日子:某個 TF(或整天)算出來是**空的** —— build_*_day
+#    空棒不寫檔 ⇒ 下次又排進來,永遠重做。空結果記在 `empty_state`(json:{"<鍵> <日>": [tf…]}),
+#    跳過判準 = 檔在 **或** 記過空。`--force` 兩者都不看;重建後照實改寫該日的空記錄。
+
+def _load_empty(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {k: set(v) for k, v in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️  空結果記錄讀取失敗({e!r}),本次不據以跳過")
+        return {}
+
+
+def _save_empty(path, empty):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({k: sorted(v) for k, v in sorted(empty.items()) if v}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def build_days(jobs, worker, *, tfs, out_path, empty_state, workers, force=False,
+               icon="🧱", noun="棒"):
+    """逐 (鍵, 日) 平行跑 `worker` 的共用驅動。回傳失敗天數(exit code 用)。
+
+    - `jobs`:[(鍵, 日, worker 參數 tuple)];鍵 = 商品或價差對,只用於跳過判準與訊息
+    - `worker(*參數)` → `{tf: 根數}`(空 dict = 整天沒東西),例外 = 該日失敗(不記空)
+    - `out_path(鍵, 日, tf)` → 該 TF 的輸出檔
+    """
+    empty = {} if force else _load_empty(empty_state)
+    todo = [(key, day, args) for key, day, args in jobs
+            if force or not all(os.path.exists(out_path(key, day, tf))
+                                or tf in empty.get(f"{key} {day}", ()) for tf in tfs)]
+    print(f"{icon} {len(todo)} 天待建(跳過 {len(jobs) - len(todo)};TF {list(tfs)},workers={workers})")
+
+    empty = _load_empty(empty_state)
+    t0, errors, bars = time.time(), [], 0
+    with spawn_pool(workers) as ex:
+        futs = {ex.submit(worker, *args): (key, day) for key, day, args in todo}
+        for i, f in enumerate(as_completed(futs), 1):
+            key, day = futs[f]
+            try:
+                counts = f.result()
+            except Exception as e:
+                errors.append(f"{key} {day}: {type(e).__name__}: {e}")
+            else:
+                bars += sum(counts.values())
+                rec = empty.setdefault(f"{key} {day}", set()) - set(tfs)   # 只改寫本次建的 TF
+                empty[f"{key} {day}"] = rec | {tf for tf in tfs if not counts.get(tf)}
+            if i % 50 == 0:
+                print(f"   … {i}/{len(todo)}({time.time() - t0:.0f}s)")
+    if todo:
+        _save_empty(empty_state, empty)
+    for line in sorted(errors):
+        print(f"❌ {line}")
+    print(f"\n✅ {len(todo) - len(errors)} 天、{bars:,} 根{noun};失敗 {len(errors)}"
+          f"({time.time() - t0:.1f}s)")
+    return len(errors)
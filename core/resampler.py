@@ -22,11 +22,18 @@ from config.session_model import ARCHIVE_DATE_PIVOT
 # Session 的 aligned 時間上限 (平移後):
 #   日盤: 08:45 ~ 13:45 → aligned 後為 00:00 ~ 05:00:00，上限 = 5 * 3600 秒
 #   夜盤: 15:00 ~ 05:00 → aligned 後為 00:00 ~ 14:00:00，上限 = 14 * 3600 秒
-_DAY_SESSION_LIMIT_SEC   = 5  * 3600   # 5 小時 (秒)
-_NIGHT_SESSION_LIMIT_SEC = 14 * 3600   # 14 小時 (秒)
+# 兩個上限、`sessionize`、`pt_slice_columns` 與 `timeframe_to_seconds` 是公開的:
+# 簿面 / 價差 K 棒(core/book_resampler、core/spread)與跨檔連續性檢查(tools/check_continuity)
+# 用同一把尺。
+DAY_SESSION_LIMIT_SEC   = 5  * 3600   # 5 小時 (秒)
+NIGHT_SESSION_LIMIT_SEC = 14 * 3600   # 14 小時 (秒)
 
+# order_flow=True 時多產的四欄(2026-10)。恆排在**最後** —— 與遷移工具「舊檔 + 新欄」
+# 嫁接出來的欄序一致,ETL 新寫的檔與回填的檔才不會欄序不同。
+ORDER_FLOW_COLS = ["buy_volume", "sell_volume", "unknown_volume", "tick_rule_volume"]
 
-def _timeframe_to_seconds(timeframe: str) -> int:
+
+def timeframe_to_seconds(timeframe: str) -> int:
     """將 Polars duration 字串轉換為秒數，例如 '1h' -> 3600, '30m' -> 1800"""
     if timeframe.endswith('h'):
         return int(timeframe[:-1]) * 3600
@@ -52,11 +59,11 @@ def _snap_aligned_ts_to_session(q: pl.LazyFrame, timeframe: str) -> pl.LazyFrame
           1. 計算出最後一個合法 bucket 的秒偏移：last_bucket_sec = floor((session_limit_sec - 1) / tf_sec) * tf_sec
           2. 若超界，把 aligned_ts 替換為「當日日期 + last_bucket_sec 的 duration」
     """
-    tf_sec = _timeframe_to_seconds(timeframe)
+    tf_sec = timeframe_to_seconds(timeframe)
 
     # 計算最後合法 bucket 起點 (秒偏移)，使用 Python int 在 schema build 期計算，不依賴 Polars 大整數乘法
-    day_last_bucket_sec   = (((_DAY_SESSION_LIMIT_SEC   - 1) // tf_sec)) * tf_sec
-    night_last_bucket_sec = (((_NIGHT_SESSION_LIMIT_SEC - 1) // tf_sec)) * tf_sec
+    day_last_bucket_sec   = (((DAY_SESSION_LIMIT_SEC   - 1) // tf_sec)) * tf_sec
+    night_last_bucket_sec = (((NIGHT_SESSION_LIMIT_SEC - 1) // tf_sec)) * tf_sec
 
     # 判斷 aligned_ts 是否超過 session 上限
     # 注意：dt.hour() 回傳 Int8/Int16，乘以 3600 後最大 23*3600=82800，超過 Int16 上限，必須先 cast 到 Int32
@@ -72,13 +79,13 @@ def _snap_aligned_ts_to_session(q: pl.LazyFrame, timeframe: str) -> pl.LazyFrame
 
     snapped = (
         pl.when(
-            (pl.col("session") == "Day") & (aligned_sec >= _DAY_SESSION_LIMIT_SEC)
+            (pl.col("session") == "Day") & (aligned_sec >= DAY_SESSION_LIMIT_SEC)
         )
         .then(
             day_base_ts + pl.duration(seconds=day_last_bucket_sec + tf_sec) - pl.duration(microseconds=1)
         )
         .when(
-            (pl.col("session") == "Night") & (aligned_sec >= _NIGHT_SESSION_LIMIT_SEC)
+            (pl.col("session") == "Night") & (aligned_sec >= NIGHT_SESSION_LIMIT_SEC)
         )
         .then(
             night_base_ts + pl.duration(seconds=night_last_bucket_sec + tf_sec) - pl.duration(microseconds=1)
@@ -89,7 +96,24 @@ def _snap_aligned_ts_to_session(q: pl.LazyFrame, timeframe: str) -> pl.LazyFrame
 
     return q.with_columns(snapped)
 
-def _pt_slice_columns(q: pl.LazyFrame, timeframe: str) -> pl.LazyFrame:
+def sessionize(q: pl.LazyFrame) -> pl.LazyFrame:
+    """加上 `session` 與交易日 `date` 兩欄(`resample_to_kbars` 第 2 步;簿面 / 價差 K 棒共用)。
+
+    邏輯：如果是 00:00 ~ 05:00 之間的資料，日期要減 1 天 (歸到昨晚)
+    這樣如 12/06 03:00 的夜盤，就會被標記為 12/05 的 Night
+    """
+    return q.with_columns([
+        get_session_expression("ts"),
+
+        pl.when(pl.col("ts").dt.time() < ARCHIVE_DATE_PIVOT)   # 樞紐前 → 退一天
+          .then(pl.col("ts").dt.offset_by("-1d"))  # 日期退一天
+          .otherwise(pl.col("ts"))                 # 其他維持原樣
+          .dt.date()                               # 取出日期部分
+          .alias("date")
+    ])
+
+
+def pt_slice_columns(q: pl.LazyFrame, timeframe: str) -> pl.LazyFrame:
     """為每筆 tick 算出它對「自己那根 K」的時間積分貢獻(棒邊界切片)。
 
     產出四個暫存欄(µs 整數域;price 為整數時乘積在 2^53 內**精確**):
@@ -97,11 +121,11 @@ def _pt_slice_columns(q: pl.LazyFrame, timeframe: str) -> pl.LazyFrame:
       _pt_head / _dur_head:桶內首筆補頭段(進場價 ×(首筆 − 桶起));其餘筆為 0
     盤段內的沉默自動由前一筆的價涵蓋(LOCF);**桶外**(空桶/盤段間)不在此層 ——
     那是消費端 prefix 層的事(棒擁有其後沉默,close 計價)。"""
-    tf_sec = None if timeframe == "1d" else _timeframe_to_seconds(timeframe)
+    tf_sec = None if timeframe == "1d" else timeframe_to_seconds(timeframe)
     lim_us = (
         pl.when(pl.col("session") == "Day")
-        .then(pl.lit(_DAY_SESSION_LIMIT_SEC * 1_000_000, dtype=pl.Int64))
-        .otherwise(pl.lit(_NIGHT_SESSION_LIMIT_SEC * 1_000_000, dtype=pl.Int64))
+        .then(pl.lit(DAY_SESSION_LIMIT_SEC * 1_000_000, dtype=pl.Int64))
+        .otherwise(pl.lit(NIGHT_SESSION_LIMIT_SEC * 1_000_000, dtype=pl.Int64))
     )
     # aligned µs-of-day(用**平移後、未 snap** 的時間 —— snap 只管分桶歸屬)
     a = (
@@ -148,7 +172,38 @@ def _pt_slice_columns(q: pl.LazyFrame, timeframe: str) -> pl.LazyFrame:
           .otherwise(0.0).alias("_pt_head")])
 
 
-def resample_to_kbars(tick_df: pl.DataFrame, timeframe: str):
+def _order_flow_columns(q: pl.LazyFrame, has_tick_type: bool) -> pl.LazyFrame:
+    """逐 tick 的主動方 `_side`(1 買 / −1 賣 / null 不明)與是否靠 tick rule 判定 `_by_rule`。
+
+    先信交易所給的內外盤(`tick_type` 1 = 外盤 = 買方主動、2 = 內盤 = 賣方主動);
+    0 / 無此欄(TSE)退回 **tick rule**:價漲 → 買、價跌 → 賣、平盤沿用同盤段上一個非零方向。
+    盤段首筆之前沒有方向可沿用 → 不明。
+    須在 `pt_slice_columns` 之後(借用它已排好的「盤段內 µs 序、平手依輸入列序」)。
+    """
+    grp = ["date", "session"]
+    step = pl.col("close") - pl.col("close").shift(1).over(grp)
+    q = q.with_columns(
+        pl.when(step > 0).then(pl.lit(1, dtype=pl.Int8))
+        .when(step < 0).then(pl.lit(-1, dtype=pl.Int8))
+        .otherwise(None)
+        .forward_fill().over(grp)
+        .alias("_rule_side"))
+    tt = pl.col("tick_type") if has_tick_type else pl.lit(0, dtype=pl.Int8)
+    return q.with_columns([
+        pl.when(tt == 1).then(pl.lit(1, dtype=pl.Int8))
+        .when(tt == 2).then(pl.lit(-1, dtype=pl.Int8))
+        .otherwise(pl.col("_rule_side")).alias("_side"),
+        (~tt.is_in([1, 2]) & pl.col("_rule_side").is_not_null()).alias("_by_rule")])
+
+
+def resample_to_kbars(tick_df: pl.DataFrame, timeframe: str, order_flow: bool = False):
+    """逐筆 → K 棒。`order_flow=True` 多產四欄主動方成交量(2026-10,見 `_order_flow_columns`):
+
+      buy_volume / sell_volume  買方 / 賣方主動的量(內外盤;不明者以 tick rule 補)
+      unknown_volume            兩者都判不出的量(盤段開頭的平盤 tick)
+      tick_rule_volume          上面買賣量中**靠 tick rule 判定**的部分(資料品質指標)
+    四欄恆有 buy + sell + unknown = volume。預設關閉:開關見 `settings.KBAR_ORDER_FLOW`。
+    """
     
     # 1. 抓取 Symbol (修復 Bug)
     # 我們先在最前面抓出 symbol 的值，因為後面轉 Lazy 後比較難抓
@@ -157,18 +212,8 @@ def resample_to_kbars(tick_df: pl.DataFrame, timeframe: str):
         # 直接讀取第一列
         symbol_val = tick_df["symbol"][0]
 
-    # 2. 建立 "Trading Date" (交易日)
-    # 邏輯：如果是 00:00 ~ 05:00 之間的資料，日期要減 1 天 (歸到昨晚)
-    # 這樣如 12/06 03:00 的夜盤，就會被標記為 12/05 的 Night
-    q = tick_df.lazy().sort("ts", maintain_order=True).with_columns([
-        get_session_expression("ts"),
-        
-        pl.when(pl.col("ts").dt.time() < ARCHIVE_DATE_PIVOT)   # 樞紐前 → 退一天
-          .then(pl.col("ts").dt.offset_by("-1d"))  # 日期退一天
-          .otherwise(pl.col("ts"))                 # 其他維持原樣
-          .dt.date()                               # 取出日期部分
-          .alias("date")
-    ])
+    # 2. 建立 "Trading Date" (交易日) 與盤別(見 sessionize)
+    q = sessionize(tick_df.lazy().sort("ts", maintain_order=True))
 
     # 2b. 逐 tick「棒邊界切片」(2026-08-16,true_pt_sum;wiki/MA-Semantics §6)
     #     每根 K 的 pt 恰涵蓋自己的桶 [bkt, bkt_end):
@@ -178,7 +223,9 @@ def resample_to_kbars(tick_df: pl.DataFrame, timeframe: str):
     #     與 true_pv_sum 同屬 tick 層可加量:任何 TF 的視窗和必然一致(VWAP 同機制)。
     #     ⚠ 兩個座標刻意分開:**切片時距**用未 snap 的 aligned 時間 cap 在盤段上限
     #       (grace tick 時距=0,不與真末筆重複計時);**分桶**跟 snap 語意(歸尾桶)。
-    q = _pt_slice_columns(q, timeframe)
+    q = pt_slice_columns(q, timeframe)
+    if order_flow:
+        q = _order_flow_columns(q, "tick_type" in tick_df.columns)
 
     # 3. 定義基礎數據聚合 (不含 ts)
     aggs = [
@@ -193,6 +240,15 @@ def resample_to_kbars(tick_df: pl.DataFrame, timeframe: str):
         (pl.col("_dur_head") + pl.col("_dur_own")).sum().alias("_dur_us"),
     ]
     
+    if order_flow:
+        vol = pl.col("volume")
+        aggs += [
+            vol.filter(pl.col("_side") == 1).sum().alias(ORDER_FLOW_COLS[0]),
+            vol.filter(pl.col("_side") == -1).sum().alias(ORDER_FLOW_COLS[1]),
+            vol.filter(pl.col("_side").is_null()).sum().alias(ORDER_FLOW_COLS[2]),
+            vol.filter(pl.col("_by_rule")).sum().alias(ORDER_FLOW_COLS[3]),
+        ]
+
     # TXF 特殊欄位
     if "underlying_price" in tick_df.columns:
         aggs.append(pl.col("underlying_price").last().alias("underlying_close"))
@@ -272,7 +328,8 @@ def resample_to_kbars(tick_df: pl.DataFrame, timeframe: str):
     current_cols = q.collect_schema().names()
     
     head_cols = [c for c in desired_order if c in current_cols]
-    tail_cols = [c for c in current_cols if c not in head_cols]
+    tail_cols = [c for c in current_cols if c not in head_cols and c not in ORDER_FLOW_COLS]
+    tail_cols += [c for c in ORDER_FLOW_COLS if c in current_cols]
     
     q = q.select(head_cols + tail_cols)
     
@@ -0,0 +1,89 @@
+# core/spread.py
+#
+# 跨月價差 K 棒(2026-10):近月 TXF − 次月 TXFR2,盤中逐 TF。`resample_to_kbars` 的下游。
+#
+# 為什麼要它:`run_pipeline` 每天本來就同時抓 TXF 與 TXFR2 的逐筆,但湖裡只有
+#   `parse_taifex_daily` 從結算價算出來的**日**價差。盤中價差研究(txf-gale-engine)
+#   於是每次都要把兩條 kbars 各讀一次、在 Python 裡對齊 —— 而且對齊的是**棒收盤**,
+#   兩腳最後一筆成交可能差好幾秒。這裡在逐筆層對齊一次,之後只讀一個檔。
+#
+# 做法:合成「價差 tick」,再交給 `resample_to_kbars`(桶、盤段、snap、true_pt_sum 全部同一把尺):
+#   ① 兩腳任一腳有成交的每個時間點 = 一個事件(同 µs 的多筆併成一個,量相加)
+#   ② 每個事件以 as-of join(backward,含同時間)取兩腳**到此為止最後一筆**成交價
+#      —— 以 (date, session) 分組:🔒 不跨盤段沿用(夜盤開盤不拿日盤收盤價來算價差)
+#   ③ 兩腳都已經成交過的事件才算數(盤段開頭只有一腳的那段沒有價差)
+#   ④ close = 近月 − 次月;volume = 該事件兩腳的成交量和
+#   ⇒ 產出欄位與 kbars 相同(open/high/low/close = 價差;true_pt_sum / dur_s = 時間加權價差);
+#      `true_pv_sum` 照算但語意是「價差 × 兩腳量」,不是 VWAP 的分子。
+#
+# 輸出:`SPREAD_ROOT/<tf>/<近>-<次>/<YYYY>/<date>_<近>-<次>_<tf>.parquet`(衍生品,可整個刪掉重建,
+#   同 book/ 放在 DATA_ROOT 底下;1d 也是日檔 —— 年檔 append 的麻煩不值得為一個衍生品再來一次)。
+import os
+
+import polars as pl
+
+from config.settings import DATA_ROOT
+from core.resampler import resample_to_kbars, sessionize
+
+SPREAD_ROOT = os.path.join(DATA_ROOT, "spread")
+
+#: (近月, 次月)。TXFR2 在結算日換月 —— 換月那天的價差跳一階是真實的,不是錯誤。
+SPREAD_PAIRS = [("TXF", "TXFR2")]
+
+
+def spread_symbol(near: str, far: str) -> str:
+    return f"{near}-{far}"
+
+
+def spread_path(tf, near, far, d):
+    d = str(d)[:10]
+    sym = spread_symbol(near, far)
+    return os.path.join(SPREAD_ROOT, tf, sym, d[:4], f"{d}_{sym}_{tf}.parquet")
+
+
+def _leg(df: pl.DataFrame, name: str) -> pl.LazyFrame:
+    """一腳的 (date, session, ts, <name>, <name>_vol);同 µs 多筆 → 末筆價、量和(輸入列序 = 到達序)。"""
+    return (sessionize(df.lazy().select(["ts", "close", "volume"]).sort("ts", maintain_order=True))
+            .group_by(["date", "session", "ts"], maintain_order=True)
+            .agg([pl.col("close").last().alias(name), pl.col("volume").sum().alias(f"{name}_vol")]))
+
+
+def spread_ticks(near_df: pl.DataFrame, far_df: pl.DataFrame, symbol: str) -> pl.DataFrame:
+    """兩腳逐筆 → 合成價差 tick(ts, symbol, close, volume),可直接餵 `resample_to_kbars`。"""
+    near, far = _leg(near_df, "_near"), _leg(far_df, "_far")
+    keys = ["date", "session", "ts"]
+    events = (pl.concat([near.select(keys + [pl.col("_near_vol").alias("volume")]),
+                         far.select(keys + [pl.col("_far_vol").alias("volume")])])
+              .group_by(keys).agg(pl.col("volume").sum())
+              .sort("ts"))
+    # 三者都已依 ts 全域排序(⇒ 組內亦然);polars 有 by 時驗不了,只會警告 —— 關掉它
+    out = (events
+           .join_asof(near.select(keys + ["_near"]).sort("ts"), on="ts",
+                      by=["date", "session"], strategy="backward", check_sortedness=False)
+           .join_asof(far.select(keys + ["_far"]).sort("ts"), on="ts",
+                      by=["date", "session"], strategy="backward", check_sortedness=False)
+           .filter(pl.col("_near").is_not_null() & pl.col("_far").is_not_null())
+           .select([pl.col("ts"), pl.lit(symbol).alias("symbol"),
+                    (pl.col("_near") - pl.col("_far")).alias("close"), pl.col("volume")]))
+    return out.collect()
+
+
+def build_spread_day(near: str, far: str, date_str: str, near_df: pl.DataFrame,
+                     far_df: pl.DataFrame, timeframes, write: bool = True) -> dict[str, pl.DataFrame]:
+    """一天兩腳的逐筆 → 各 TF 價差 K 棒(原子寫入 `spread_path`)。任一腳空 → 空 dict。"""
+    if near_df is None or far_df is None or near_df.is_empty() or far_df.is_empty():
+        return {}
+    ticks = spread_ticks(near_df, far_df, spread_symbol(near, far))
+    if ticks.is_empty():
+        return {}
+    out = {}
+    for tf in timeframes:
+        bars = resample_to_kbars(ticks, tf)
+        out[tf] = bars
+        if write and not bars.is_empty():
+            dest = spread_path(tf, near, far, date_str)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = f"{dest}.tmp{os.getpid()}"
+            bars.write_parquet(tmp)
+            os.replace(tmp, dest)
+    return out
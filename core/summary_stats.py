@@ -0,0 +1,92 @@
+# core/summary_stats.py
+#
+# daily_summary 的滾動統計(2026-10):百分位、z 分數、體制分組,一次 polars 算完、存成同檔的欄。
+#
+# 為什麼要它:`txo_gex_daily.percentiles` 每次把整個 daily_summary 讀進來、tail 60、
+#   `to_list()` 成 Python list 逐個數;`_recent_table` / `_scale_panel` 又各自重讀一次,
+#   再用 NumPy 逐列算 IV 百分位。研究端要「某欄在當時的歷史位置」則只能自己再寫一次。
+#   這裡把它們收斂成一個純函式 `with_stats(summary)`:輸入摘要表、輸出多了統計欄的同一張表。
+#   `store_summary` 每次 upsert 後重算整張(幾百列,毫秒級)一起寫回,報告與研究都只讀現成的欄。
+#
+# 欄位(c = 摘要裡每一個數值欄):
+#   ‧ pct_<c>     近 STATS_WINDOW 列(含當列)中 ≤ 當值的比例 ×100 —— 與舊 `percentiles` 同定義
+#                 (null 不計入分母;非 null 少於 STATS_MIN 個 → null)
+#   ‧ z_<c>       (當值 − 視窗均值) / 視窗標準差(同一個視窗)
+#   ‧ pctall_<c>  **到當列為止**全部歷史中 < 當值的比例 ×100 —— `_scale_panel` 的 IV 百分位定義
+#                 (少於 STATS_MIN_ALL 個 → null)
+#   ‧ regime_flip / regime_gex / regime_iv  體制標籤(見 REGIME_*),給 group_by 用
+#   🔒 全部是 point-in-time:第 i 列只看得到第 i 列以前。舊碼的 IV 百分位拿「整個檔」當歷史,
+#      回補舊日子時會偷看未來;這裡不會。對「今天」(檔尾)兩者相同。
+import polars as pl
+
+STATS_WINDOW = 60        # 同 percentiles 的 lookback
+STATS_MIN = 5            # 視窗內至少這麼多個非 null 才給百分位 / z
+STATS_MIN_ALL = 30       # 全歷史百分位的最少樣本(同 _scale_panel 的門檻)
+STAT_PREFIXES = ("pct_", "z_", "pctall_", "regime_")
+
+#: IV 體制切點(全歷史百分位):與報告「今日波動水位」卡片同一組門檻
+REGIME_IV = ((90.0, "high"), (75.0, "elevated"))
+
+
+def base_columns(df: pl.DataFrame) -> list[str]:
+    """摘要本身的數值欄(排除已存在的統計欄)。"""
+    return [c for c, t in df.schema.items()
+            if t.is_numeric() and not c.startswith(STAT_PREFIXES)]
+
+
+def strip_stats(df: pl.DataFrame) -> pl.DataFrame:
+    return df.select([c for c in df.columns if not c.startswith(STAT_PREFIXES)])
+
+
+def _stat_exprs(c: str, n_all: int, window: int) -> list[pl.Expr]:
+    x = pl.col(c).cast(pl.Float64)
+    cnt = x.is_not_null().cast(pl.UInt32)
+    n_win = cnt.rolling_sum(window, min_samples=1)
+    n_all_ = cnt.cum_sum()
+    # rolling_rank(max) = 視窗內 ≤ 當值的個數;rolling_rank(min) − 1 = < 當值的個數(null 不參與排名)
+    le = x.rolling_rank(window, method="max", min_samples=1)
+    lt = x.rolling_rank(n_all, method="min", min_samples=1) - 1
+    mean = x.rolling_mean(window, min_samples=STATS_MIN)
+    std = x.rolling_std(window, min_samples=STATS_MIN)
+    return [
+        pl.when(x.is_not_null() & (n_win >= STATS_MIN))
+          .then(le.cast(pl.Float64) / n_win * 100).alias(f"pct_{c}"),
+        pl.when(std > 0).then((x - mean) / std).alias(f"z_{c}"),
+        pl.when(x.is_not_null() & (n_all_ >= STATS_MIN_ALL))
+          .then(lt.cast(pl.Float64) / n_all_ * 100).alias(f"pctall_{c}"),
+    ]
+
+
+def with_stats(summary: pl.DataFrame, window: int = STATS_WINDOW) -> pl.DataFrame:
+    """摘要表(任意順序)→ 依 date 排序、附上全部統計欄的新表。已有的統計欄會先丟掉重算。"""
+    df = strip_stats(summary).sort("date")
+    cols = base_columns(df)
+    n_all = max(df.height, 1)
+    df = df.with_columns([e for c in cols for e in _stat_exprs(c, n_all, window)])
+    regimes = []
+    if "px_vs_flip_pct" in df.columns:
+        regimes.append(pl.when(pl.col("px_vs_flip_pct") > 0).then(pl.lit("above"))
+                         .when(pl.col("px_vs_flip_pct").is_not_null()).then(pl.lit("below"))
+                         .alias("regime_flip"))
+    if "tot_us" in df.columns:
+        regimes.append(pl.when(pl.col("tot_us") >= 0).then(pl.lit("pos"))
+                         .when(pl.col("tot_us").is_not_null()).then(pl.lit("neg"))
+                         .alias("regime_gex"))
+    if "pctall_front_iv" in df.columns:
+        iv = pl.col("pctall_front_iv")
+        e = pl.when(iv.is_null()).then(pl.lit(None, dtype=pl.Utf8))
+        for cut, lab in REGIME_IV:
+            e = e.when(iv >= cut).then(pl.lit(lab))
+        regimes.append(e.otherwise(pl.lit("normal")).alias("regime_iv"))
+    return df.with_columns(regimes) if regimes else df
+
+
+def regime_table(stats: pl.DataFrame, by: str | list[str], cols: list[str]) -> pl.DataFrame:
+    """依體制欄分組:每組天數 + 各欄的平均 / 中位。研究用(例:by="regime_iv", cols=["day_move_pts"])。"""
+    by = [by] if isinstance(by, str) else by
+    return (stats.filter(pl.all_horizontal([pl.col(b).is_not_null() for b in by]))
+            .group_by(by)
+            .agg([pl.len().alias("n")]
+                 + [pl.col(c).mean().alias(f"{c}_mean") for c in cols]
+                 + [pl.col(c).median().alias(f"{c}_median") for c in cols])
+            .sort(by))
@@ -0,0 +1,133 @@
+# core/tick_pack.py
+#
+# 月 tick 包(2026-10):一個 (商品, 月) 一檔、**一天一個 row group** 的 raw_ticks 唯讀副本。
+#
+# 為什麼要它:raw_ticks 是一天一檔(`lake_paths.tick_path`),刻意寫一次就不再動。
+#   但全史重播的工具(fix_kbars / migrate_kbars)每跑一次就要開 ~5k 個檔、各讀一次 footer,
+#   這個固定成本比解碼本身還貴。月包把它降到「一個月開一次」,而「一天 = 一個 row group」
+#   讓讀單日仍只解碼那一天。
+#
+# 🔒 日檔仍是**唯一真相**:
+#   ‧ 包是衍生品,可整個刪掉重建(`tools/pack_ticks`);讀取端缺包 / 包過期一律退回日檔。
+#   ‧ 包的 footer 記每一天來源日檔的 (size, mtime_ns)。讀單日前先 stat 日檔比對 ——
+#     raw 事後被重抓(2026-08-15 B 類就是這樣來的)時,舊包**不會**蓋過新日檔。
+#   ‧ 包與日檔**值相同**(不是逐位元副本:`write_table` 會重新編碼、壓縮也不同):
+#     schema 與當月第一個日檔不同的日子、空檔,一律不進包
+#     (記在 footer 的 skipped,讀取端照樣退回日檔)—— 不做任何 schema 統一。
+#
+# 佈局見 `lake_paths.tick_pack_path`(ARCHIVE_ROOT/tick_packs/<sym>/<SYM>_ticks_<YYYY-MM>.parquet)。
+import functools
+import json
+import os
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from config.lake_paths import list_tick_files, tick_pack_path, tick_path
+
+META_KEY = b"txf.tick_pack.days"
+
+
+def _raw_stat(path: str) -> list:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def month_sources(symbol: str) -> dict[tuple[int, int], list[str]]:
+    """{(年, 月): [該月日檔…]}(依日期排序)—— 全部來自 `list_tick_files`。"""
+    out: dict = {}
+    for p in list_tick_files(symbol):
+        day = os.path.basename(p)[:10]
+        out.setdefault((int(day[:4]), int(day[5:7])), []).append(p)
+    return out
+
+
+def read_manifest(pack_path: str) -> dict | None:
+    """包 footer 的清單:{"days": {日: [row group, size, mtime_ns]}, "skipped": {日: [size, mtime_ns]}}。
+
+    包不存在或不是本模組寫的 → None。
+    """
+    if not os.path.exists(pack_path):
+        return None
+    md = pq.read_metadata(pack_path).metadata or {}
+    if META_KEY not in md:
+        return None
+    return json.loads(md[META_KEY])
+
+
+def is_current(pack_path: str, raw_files: list[str]) -> bool:
+    """包是否恰好對應目前這批日檔(日子集合相同、每個日檔的 size/mtime 都沒變)。"""
+    man = read_manifest(pack_path)
+    if man is None:
+        return False
+    stored = {d: v[-2:] for d, v in man["days"].items()}
+    stored.update(man["skipped"])
+    return stored == {os.path.basename(p)[:10]: _raw_stat(p) for p in raw_files}
+
+
+def build_pack(symbol: str, year: int, month: int, raw_files: list[str]) -> dict:
+    """把一個月的日檔寫成月包(原子換檔)。回傳 {"path", "packed", "skipped"}。
+
+    一天一個 row group:`write_table(row_group_size=該日列數)`,row group 序 = 日期序。
+    """
+    dest = tick_pack_path(symbol, year, month)
+    ref, days, skipped = None, {}, {}
+    plan = []
+    for p in raw_files:
+        day = os.path.basename(p)[:10]
+        st = _raw_stat(p)
+        md = pq.read_metadata(p)
+        schema = md.schema.to_arrow_schema().remove_metadata()
+        if ref is None and md.num_rows:
+            ref = schema
+        if not md.num_rows or not schema.equals(ref):
+            skipped[day] = st                   # 空檔 / schema 飄移:不進包,讀取端退回日檔
+            continue
+        days[day] = [len(plan)] + st
+        plan.append(p)
+
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.tmp{os.getpid()}"
+    meta = {META_KEY: json.dumps({"days": days, "skipped": skipped}).encode()}
+    if ref is None:                             # 整月都是空檔:寫一個只有清單的包,免得每次重建
+        ref = pq.read_metadata(raw_files[0]).schema.to_arrow_schema().remove_metadata()
+    with pq.ParquetWriter(tmp, ref.with_metadata(meta), compression="zstd") as w:
+        for p in plan:
+            t = pq.read_table(p).replace_schema_metadata(None)
+            w.write_table(t, row_group_size=t.num_rows)
+    os.replace(tmp, dest)
+    return {"path": dest, "packed": len(days), "skipped": len(skipped)}
+
+
+@functools.lru_cache(maxsize=64)
+def _pack_manifest(pack_path: str, size: int, mtime_ns: int) -> dict:
+    """包的清單;以 (路徑, size, mtime) 為鍵 —— 包被重建就自然失效。
+
+    ⚠️ 只快取清單、不快取開著的 `ParquetFile`:Windows 上開著的檔案 handle 會讓
+       `pack_ticks` 重建時的 `os.replace` 失敗(同一行程先讀後重建就會撞上)。
+    """
+    return json.loads(pq.read_metadata(pack_path).metadata[META_KEY])
+
+
+def read_day(symbol: str, day: str, columns: list[str] | None = None) -> pl.DataFrame:
+    """讀一天的 ticks:包裡有、且來源日檔沒變 → 只讀那個 row group;否則讀日檔。
+
+    與 `pl.read_parquet(tick_path(symbol, day))` 逐值相同(包與日檔值相同)。
+    日檔不存在 → FileNotFoundError(同直接讀日檔)。
+    """
+    raw = tick_path(symbol, day)
+    pack = tick_pack_path(symbol, day[:4], day[5:7])
+    try:
+        pst = os.stat(pack)
+    except FileNotFoundError:
+        pst = None
+    if pst is not None:
+        try:
+            man = _pack_manifest(pack, pst.st_size, pst.st_mtime_ns)
+        except (OSError, KeyError, TypeError, ValueError):
+            man = None                          # 不是本模組寫的 / 壞檔 → 退回日檔
+        entry = man["days"].get(day) if man is not None else None
+        if entry is not None and entry[1:] == _raw_stat(raw):
+            with pq.ParquetFile(pack) as pf:   # 每次開、讀完就關(見 _pack_manifest)
+                return pl.from_arrow(pf.read_row_group(entry[0], columns=columns))
+    return pl.read_parquet(raw, columns=columns)
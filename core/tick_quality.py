@@ -0,0 +1,134 @@
+# core/tick_quality.py
+#
+# 逐筆 tick 的品質體檢(2026-10;`validate_lake` 的**上游**那一層)。
+#
+# 為什麼要它:`validate_lake` 只驗**寫出來的 kbar**。壞 tick(時戳倒退、價格 ≤0、
+#   同一筆成交重複灌入、價格跳出合理帶)變成 K 棒之後就被 OHLC 吞掉了 —— 只會在
+#   幾個月後的全史對帳(`tools/verify_rebuild`)或某張圖長得怪時**間接**被發現。
+#   在 tick 還沒變成 K 棒之前就量一次,成本是一個 lazy select(毫秒級),
+#   換到的是「壞日當天就吵」。
+#
+# 兩個入口:
+#   ① `main_etl._process_symbol` 的 Phase 1.7(幻影守衛之後、寫 raw 之前)—— 熱路徑
+#   ② `tools/scan_ticks.py` —— 對整個 raw_ticks 平行補跑(一次性建歷史基線)
+# 兩者產出同一張表:`quality/ticks/<SYM>_tickq_<YYYY>.parquet`,一個 (symbol, 日) 一列。
+#
+# 🔒 本層**只量、不改、不擋**:raw 是補不回來的 archive,不可以因為「看起來怪」就不存。
+#    判定壞日只負責**大聲報**(❌ 會浮到 daily_sync 的 SUMMARY),處置由人決定 ——
+#    與 `tools/backfill_pt_sum` 對「既有 raw↔kbars 不一致」的立場相同。
+import os
+
+import polars as pl
+
+from config.settings import DATA_ROOT
+from core.resampler import sessionize
+
+QUALITY_DIR = os.path.join(DATA_ROOT, "quality", "ticks")
+
+#: 每個商品的最小跳動點(價格 → 「幾個 tick」的換算用)。
+#: TXF/TXFR2 是 1 點;TSE 是指數,官方公布到小數兩位。
+TICK_SIZE = {"TXF": 1.0, "TXFR2": 1.0, "TSE": 0.01}
+
+#: 合理價格帶:相對當日中位數 ±10%(= 台指期單日漲跌幅上限)。超出即不可能是真成交。
+PRICE_BAND = 0.10
+#: 相鄰兩筆的跳動超過這個**比例**就列為可疑(以比例而非 tick 數判斷:TSE 一跳 0.01、
+#: TXF 一跳 1 點,同一個 tick 數在兩者代表的幅度差四個數量級)。
+JUMP_WARN_PCT = 0.01
+#: 盤中沉默超過這麼久(秒)列為可疑 —— 近月台指盤中不會安靜 30 分鐘;
+#: 次月(TXFR2)與夜盤深夜的確會稀疏,所以只報不擋。
+GAP_WARN_S = 1800
+
+QUALITY_COLS = [
+    "symbol", "date", "n_ticks", "n_day", "n_night", "first_ts", "last_ts",
+    "n_nonpos_price", "n_nonpos_volume", "n_out_of_band", "n_out_of_order",
+    "n_dup", "max_gap_s", "max_jump_ticks", "max_jump_pct", "monotonic", "median_px",
+]
+
+
+def tick_quality(tick_df: pl.DataFrame, symbol: str, date_str: str) -> dict:
+    """一天的 tick → 一列品質指標(dict)。**單一 lazy select**,不逐列跑 Python。
+
+    - `n_out_of_order`:ts 比前一筆**小**的筆數(相等不算 —— 同 µs 多筆是正常撮合)
+    - `n_dup`:(ts, close, volume) 完全相同的**多餘**筆數(同一筆被灌兩次的特徵)
+    - `max_gap_s` / `max_jump_*`:只在**同一個 (date, session)** 內比,
+      夜盤 05:00 → 日盤 08:45 那段休市不算缺口、也不算跳空
+    """
+    tick = TICK_SIZE.get(symbol, 1.0)
+    grp = ["date", "session"]
+    # 盤段 / 交易日與 resampler 同一套標記(sessionize),只用於分段,不落地
+    q = sessionize(tick_df.lazy().select(["ts", "close", "volume"])).with_columns(
+        (pl.col("ts").diff() < pl.duration(microseconds=0)).alias("_back"))
+    q = q.with_columns([
+        pl.col("ts").diff().over(grp).dt.total_microseconds().alias("_gap_us"),
+        pl.col("close").diff().abs().over(grp).alias("_jump"),
+        # 分母也要在同一組內取前一筆:亂序輸入時全域 shift(1) 會是別組的價
+        (pl.col("close").diff().abs() / pl.col("close").shift(1)).over(grp).alias("_jump_pct"),
+    ])
+    row = q.select([
+        pl.len().alias("n_ticks"),
+        (pl.col("session") == "Day").sum().alias("n_day"),
+        (pl.col("session") == "Night").sum().alias("n_night"),
+        pl.col("ts").min().alias("first_ts"),
+        pl.col("ts").max().alias("last_ts"),
+        (pl.col("close") <= 0).sum().alias("n_nonpos_price"),
+        (pl.col("volume") <= 0).sum().alias("n_nonpos_volume"),
+        ((pl.col("close") / pl.col("close").median() - 1).abs() > PRICE_BAND)
+        .sum().alias("n_out_of_band"),
+        pl.col("_back").sum().alias("n_out_of_order"),
+        (pl.len() - pl.struct(["ts", "close", "volume"]).n_unique()).alias("n_dup"),
+        (pl.col("_gap_us").max() / 1_000_000).alias("max_gap_s"),
+        (pl.col("_jump").max() / tick).alias("max_jump_ticks"),
+        pl.col("_jump_pct").max().alias("max_jump_pct"),
+        pl.col("close").median().alias("median_px"),
+    ]).collect().to_dicts()[0]
+    row["monotonic"] = row["n_out_of_order"] == 0
+    return {"symbol": symbol, "date": date_str, **row}
+
+
+def quality_issues(row: dict) -> list[str]:
+    """品質列 → 問題訊息清單(空 = 乾淨)。只判定,不動資料。"""
+    issues = []
+    if row["n_nonpos_price"]:
+        issues.append(f"價格 ≤0 {row['n_nonpos_price']} 筆")
+    if row["n_out_of_band"]:
+        issues.append(f"價格超出當日中位 ±{PRICE_BAND:.0%} {row['n_out_of_band']} 筆")
+    if row["n_out_of_order"]:
+        issues.append(f"ts 倒退 {row['n_out_of_order']} 筆")
+    if row["n_dup"]:
+        issues.append(f"(ts, close, volume) 重複 {row['n_dup']} 筆")
+    if row["n_nonpos_volume"]:
+        issues.append(f"volume ≤0 {row['n_nonpos_volume']} 筆")
+    if (row["max_jump_pct"] or 0) > JUMP_WARN_PCT:
+        issues.append(f"相鄰跳動 {row['max_jump_ticks']:,.0f} ticks"
+                      f"({row['max_jump_pct']:.2%})")
+    if (row["max_gap_s"] or 0) > GAP_WARN_S and row["symbol"] == "TXF":
+        issues.append(f"盤中沉默 {row['max_gap_s'] / 60:.0f} 分鐘")
+    return issues
+
+
+def quality_path(symbol: str, year) -> str:
+    return os.path.join(QUALITY_DIR, f"{symbol}_tickq_{int(year):04d}.parquet")
+
+
+def store_quality(rows: list[dict]) -> list[str]:
+    """把品質列 upsert 進各自的年檔(身分 = (symbol, date),keep-last)。回傳寫過的路徑。
+
+    一年一檔而不是一天一檔:每列只有十幾個數字,一天一檔會替湖多生 5k 個小檔 ——
+    那正是 `compact_kbars` 在消滅的東西。年檔的讀-改-寫在熱路徑上是 ~250 列,可忽略。
+    """
+    if not rows:
+        return []
+    df = pl.DataFrame(rows).select(QUALITY_COLS)
+    written = []
+    for (sym, year), part in df.group_by(
+            [pl.col("symbol"), pl.col("date").str.slice(0, 4)], maintain_order=True):
+        path = quality_path(sym, year)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            part = pl.concat([pl.read_parquet(path), part], how="diagonal_relaxed")
+        part = part.unique(subset=["symbol", "date"], keep="last").sort("date")
+        tmp = f"{path}.tmp{os.getpid()}"
+        part.write_parquet(tmp)
+        os.replace(tmp, path)                 # 原子換檔(同 main_etl._atomic_write_parquet)
+        written.append(path)
+    return written
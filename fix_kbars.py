@@ -1,11 +1,18 @@
 import os
 import glob
-import polars as pl
-from config.settings import CACHE_ROOT, DATA_ROOT, TIMEFRAMES
+import argparse
+from config.settings import CACHE_ROOT, DATA_ROOT, KBAR_ORDER_FLOW, TIMEFRAMES
 from core.resampler import resample_to_kbars
+from core import lineage
+from core import tick_pack
 
-def run_fix():
+def run_fix(force=False):
     print(f"🔄 Preparing to fix existing K-bars in: {DATA_ROOT}")
+    # 血緣(core/lineage.py):raw 雜湊 × recipe × schema 都沒變的 (tf, 商品, 日) 直接跳過。
+    # resampler 改版後重跑,恰好只重建舊 recipe 做的檔;--force 無視血緣全部重做。
+    index = {} if force else lineage.load_index()
+    print(f"🧬 Recipe {lineage.RESAMPLER_HASH[:12]} / schema v{lineage.SCHEMA_VERSION}"
+          f"{'(--force:忽略血緣)' if force else f',索引 {len(index)} 筆'}")
     
     # 決定要重算的週期 (排除 1d，因為 1d 不受動態群組平移影響)
     # 如果想連 1d 一起重算，可以把這行改成 targets = TIMEFRAMES
@@ -13,9 +20,11 @@ def run_fix():
     print(f"🎯 Target timeframes for fix: {targets}")
     
     search_pattern = os.path.join(DATA_ROOT, "raw_ticks", "**", "*_ticks.parquet")
-    raw_files = glob.glob(search_pattern, recursive=True)
+    # 依路徑排序 = 逐商品、逐月 ⇒ 月 tick 包(core/tick_pack.py)一個月只開一次
+    raw_files = sorted(glob.glob(search_pattern, recursive=True))
     
     print(f"📦 Found {len(raw_files)} raw tick files. Starting process...\n")
+    skipped = 0
     
     for count, raw_path in enumerate(raw_files, 1):
         filename = os.path.basename(raw_path)
@@ -26,28 +35,46 @@ def run_fix():
         symbol = parts[1]
         year = date_str[:4]
         
-        print(f"[{count}/{len(raw_files)}] ⚙️ Processing {symbol} on {date_str}...")
+        def out_path(tf):
+            # 分時線路徑邏輯 (同 main_etl.py)
+            return os.path.join(CACHE_ROOT, tf, symbol, year, f"{date_str}_{symbol}_{tf}.parquet")
+
+        prev = next((index[k] for k in ((tf, symbol, date_str) for tf in targets) if k in index), None)
+        fp = lineage.raw_fingerprint(raw_path, prev)
+        todo = [tf for tf in targets
+                if not lineage.is_current(index, tf, symbol, date_str, fp["raw_hash"], out_path(tf))]
+        if not todo:
+            skipped += 1
+            continue
+
+        print(f"[{count}/{len(raw_files)}] ⚙️ Processing {symbol} on {date_str}... {todo}")
         
         try:
-            tick_df = pl.read_parquet(raw_path)
+            # 有最新的月 tick 包就只讀那一天的 row group;沒有 / 過期則讀日檔本身
+            tick_df = tick_pack.read_day(symbol, date_str)
         except Exception as e:
             print(f"   ⚠️ Failed to read {raw_path}: {e}")
             continue
             
-        for tf in targets:
-            kbar_df = resample_to_kbars(tick_df, tf)
+        rows = []
+        for tf in todo:
+            kbar_df = resample_to_kbars(tick_df, tf, order_flow=KBAR_ORDER_FLOW)
             if kbar_df.is_empty():
                 continue
                 
-            # 分時線路徑邏輯 (同 main_etl.py)
-            kbar_dir = os.path.join(CACHE_ROOT, tf, symbol, year)
-            os.makedirs(kbar_dir, exist_ok=True)
-            save_path = os.path.join(kbar_dir, f"{date_str}_{symbol}_{tf}.parquet")
+            save_path = out_path(tf)
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
             
-            # 直接覆蓋舊有的檔案
-            kbar_df.write_parquet(save_path)
+            # 直接覆蓋舊有的檔案(footer 掛血緣)
+            kbar_df.write_parquet(save_path, metadata=lineage.lineage_metadata(
+                fp["raw_hash"], source="fix_kbars"))
+            rows.append(lineage.lineage_row(tf, symbol, date_str, save_path, fp))
+        lineage.record(rows)
             
-    print("\n✅ All historical K-bars have been successfully fixed and overwritten.")
+    print(f"\n✅ All historical K-bars have been successfully fixed and overwritten."
+          f"(血緣未變而跳過 {skipped} 天)")
 
 if __name__ == "__main__":
-    run_fix()
+    ap = argparse.ArgumentParser(description="從 raw ticks 重建分時 K 棒")
+    ap.add_argument("--force", action="store_true", help="忽略血緣索引,全部重建")
+    run_fix(force=ap.parse_args().force)
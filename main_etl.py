@@ -8,9 +8,14 @@ from datetime import datetime
 import polars as pl
 
 # 引入我們寫好的模組
-from config.settings import CACHE_ROOT, DATA_ROOT, TIMEFRAMES
+from config.settings import DATA_ROOT, KBAR_ORDER_FLOW, TIMEFRAMES
+from config.lake_paths import kbar_write_target
 from adapters.shioaji_source import ShioajiSource
 from core.resampler import resample_to_kbars
+from core.tick_quality import quality_issues, store_quality, tick_quality
+from core.book_resampler import bidask_path, build_book_day
+from core.spread import SPREAD_PAIRS, build_spread_day
+from core import lineage
 
 # 定義目標商品清單
 TARGET_SYMBOLS = ['TXF', 'TSE', 'TXFR2']
@@ -20,17 +25,19 @@ SYMBOL_TRIES = 3
 SYMBOL_RETRY_WAIT = 20               # 秒;線性退避 20s、40s
 
 
-def _atomic_write_parquet(df, path):
+def _atomic_write_parquet(df, path, metadata=None):
     """原子寫入:先寫同目錄的暫存檔,再 `os.replace` 換上去。
 
     為什麼(2026-07-21 加):`df.write_parquet(path)` 直接寫目標檔,行程若在寫到
     一半被中斷(斷電、被砍、磁碟滿),留下的是**毀損的半成品**。對 1d 年檔尤其致命 ——
     下次執行讀不動它,就會落進「用單日資料覆寫整年」的回退路徑(見 run_pipeline)。
     同一檔案系統上的 rename 是原子的:要嘛看到舊檔、要嘛看到完整新檔,沒有中間狀態。
+
+    `metadata`:footer 的 key-value metadata(kbar 檔掛血緣,見 core/lineage.py)。
     """
     tmp = f"{path}.tmp{os.getpid()}"
     try:
-        df.write_parquet(tmp)
+        df.write_parquet(tmp, metadata=metadata)
         os.replace(tmp, path)          # 原子換檔(Windows/Linux 皆是)
     except Exception:
         if os.path.exists(tmp):
@@ -81,6 +88,7 @@ def run_pipeline(date_str, shared_source=None):
     month = date_str[5:7]
 
     failed_symbols = []                  # 本次跑完仍失敗的商品(摘要與 exit code 用)
+    day_ticks = {}                       # 商品 → 當天逐筆(Phase 4/5 衍生品用)
 
     try:
         # 確保連線 (ShioajiSource 內部有 check，重複呼叫 connect 沒成本)
@@ -95,7 +103,7 @@ def run_pipeline(date_str, shared_source=None):
             #   per-symbol 缺口掃描在後續每天自動重試(自癒),不在這裡無限等。
             for attempt in range(1, SYMBOL_TRIES + 1):
                 try:
-                    _process_symbol(symbol, date_str, year, month, source)
+                    day_ticks[symbol] = _process_symbol(symbol, date_str, year, month, source)
                     break
                 except Exception as e:
                     if attempt < SYMBOL_TRIES:
@@ -106,6 +114,30 @@ def run_pipeline(date_str, shared_source=None):
                         print(f'[FAIL] {symbol} 失敗(重試 {SYMBOL_TRIES} 次):{e!r}')
                         failed_symbols.append(symbol)
 
+        # --- Phase 4: 簿面 K 棒(K 棒寫完且當天 archive 有五檔簿才做;見 core/book_resampler.py)---
+        # 衍生品、只加不擋:放在所有商品的 K 棒之後 —— 幾個 as-of join / TF 不該排在主產品前面。
+        for symbol, ticks in day_ticks.items():
+            if ticks is None or not os.path.exists(bidask_path(symbol, date_str)):
+                continue
+            try:
+                n = build_book_day(symbol, date_str, TIMEFRAMES, trades_df=ticks)
+                print(f"   📚 簿面 K 棒 {symbol}:{', '.join(f'{tf}={df.height}' for tf, df in n.items())}")
+            except Exception as e:
+                print(f"⚠️  [book] {symbol} {date_str} 簿面 K 棒失敗(不影響 K 棒):{e!r}")
+
+        # --- Phase 5: 跨月價差 K 棒(兩腳當天都有逐筆才做;見 core/spread.py)---
+        # 衍生品、只加不擋:失敗只報,不影響 K 棒與 exit code。
+        for near, far in SPREAD_PAIRS:
+            if day_ticks.get(near) is None or day_ticks.get(far) is None:
+                continue
+            try:
+                n = build_spread_day(near, far, date_str, day_ticks[near], day_ticks[far],
+                                     TIMEFRAMES)
+                print(f"   📐 價差 K 棒 {near}-{far}:"
+                      f"{', '.join(f'{tf}={df.height}' for tf, df in n.items())}")
+            except Exception as e:
+                print(f"⚠️  [spread] {near}-{far} {date_str} 價差 K 棒失敗(不影響 K 棒):{e!r}")
+
     except Exception as e:
         print(f'[FAIL] ETL Failed: {e}')
         failed_symbols.append('(pipeline)')
@@ -126,7 +158,10 @@ def run_pipeline(date_str, shared_source=None):
 
 
 def _process_symbol(symbol, date_str, year, month, source):
-    """單一商品的 E-T-L(原 for 迴圈本體;抽出來才能逐商品 try/重試)。"""
+    """單一商品的 E-T-L(原 for 迴圈本體;抽出來才能逐商品 try/重試)。
+
+    回傳當天的逐筆(Phase 4/5 簿面 / 價差用,免得再讀一次 raw);跳過 / 沒寫完 K 棒 → None。
+    """
     if True:
         if True:
 
@@ -179,6 +214,21 @@ def _process_symbol(symbol, date_str, year, month, source):
                 print(f"⚠️  {symbol} {date_str}: 抓到的資料日期為 {data_date}(≠請求日)= 非交易日幻影,跳過不存。")
                 return          # 原為 for 迴圈內的 continue(本體已抽成函式)
 
+            # --- Phase 1.7: tick 品質體檢(只量、不擋;見 core/tick_quality.py)---
+            # 壞 tick 一旦變成 K 棒就被 OHLC 吞掉,只能在全史對帳時間接發現;
+            # 在這裡量一次是一個 lazy select 的成本。體檢本身出錯也**不得**拖垮 ETL。
+            try:
+                qrow = tick_quality(tick_df, symbol, date_str)
+                store_quality([qrow])
+                issues = quality_issues(qrow)
+                if issues:
+                    print(f"❌ [tick-quality] {symbol} {date_str}: " + "; ".join(issues))
+                else:
+                    print(f"   🩺 tick 品質 OK({qrow['n_ticks']:,} 筆,"
+                          f"最大跳動 {qrow['max_jump_ticks'] or 0:,.0f} ticks)")
+            except Exception as e:
+                print(f"⚠️  [tick-quality] {symbol} {date_str} 體檢失敗(不影響存檔):{e!r}")
+
             # --- Phase 2: Load Raw (存檔;只存下載來且已濾乾淨的) ---
             if downloaded:
                 os.makedirs(raw_dir, exist_ok=True)
@@ -186,31 +236,42 @@ def _process_symbol(symbol, date_str, year, month, source):
                 print(f"✅ Raw Ticks downloaded & saved: {raw_path}")
 
             # --- Phase 3: Transform & Load K-Bars ---
-            for tf in TIMEFRAMES:
-                kbar_df = resample_to_kbars(tick_df, tf)
+            # 血緣(core/lineage.py):每個 kbar 檔記下「哪份 raw × 哪版 recipe」。
+            # 雜湊的是剛落地的 raw 檔本身 —— 之後 fix_kbars/verify_rebuild 比的就是它。
+            try:
+                raw_fp = lineage.raw_fingerprint(raw_path)
+            except OSError:
+                raw_fp = None                 # 理論上不會(raw 已在磁碟);缺血緣不擋 ETL
+            kv = lineage.lineage_metadata(raw_fp and raw_fp["raw_hash"], source="main_etl")
+            rows = []
+            try:
+                for tf in TIMEFRAMES:
+                    kbar_df = resample_to_kbars(tick_df, tf, order_flow=KBAR_ORDER_FLOW)
                 
-                if kbar_df.is_empty():
-                    return          # 原為 for 迴圈內的 continue(本體已抽成函式)
-
-                # [分流儲存策略] 根據週期決定儲存策略
-                # Case A: 日線 (1d) -> 存成「年檔」，使用 Append 模式
-                if tf == '1d':
-                    kbar_dir = os.path.join(CACHE_ROOT, tf, symbol)
-                    os.makedirs(kbar_dir, exist_ok=True)
-                    
-                    # 檔名: TXF_1d_2025.parquet
-                    save_path = os.path.join(kbar_dir, f"{symbol}_{tf}_{year}.parquet")
-                    
-                    if os.path.exists(save_path):
-                        # 讀取舊檔 -> 合併 -> 去重 -> 寫回
+                    if kbar_df.is_empty():
+                        return          # 原為 for 迴圈內的 continue(本體已抽成函式)
+
+                    # [分流儲存策略] 寫到哪個檔由佈局決定(lake_paths.kbar_write_target),不看 TF 名字。
+                    # ⚠️ 原本是 `if tf == '1d'` 年檔 / 其餘日檔的寫死路徑:佈局一翻(或遷移期),
+                    #    讀取端看的是新佈局的檔,這裡卻還寫舊路徑 ⇒ ETL 寫了、看盤看不到。
+                    target = kbar_write_target(tf, symbol, date_str)
+                    save_path = target["path"]
+                    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+
+                    # Case A: 一檔多日(年檔 / 月檔)-> 讀舊檔、換掉本次的列、寫回
+                    if target["layout"] != "daily" and os.path.exists(save_path):
                         try:
                             existing_df = pl.read_parquet(save_path)
-                            # 合併去重:一根 1d bar 的身分是 (date, session),不是 ts。
+                            # 合併去重:一根 bar 所屬的日子由 (date, session) 決定,不是 ts。
                             # ts=該盤第一筆 tick 時間,不同次抓會差幾毫秒 → 用 ts 當鍵會把同一根夜盤
-                            # 認成兩根而重複累積(尤其每週五夜盤來自「週六請求」、被重跑多次)。改用 (date,session)。
+                            # 認成兩根而重複累積(尤其每週五夜盤來自「週六請求」、被重跑多次)。
+                            # 本次有的 (date, session) 整段換掉(1d 一盤一根,等同原本的 unique keep=last)。
                             final_df = (
-                                pl.concat([existing_df, kbar_df])
-                                .unique(subset=["date", "session"], keep="last")
+                                pl.concat([
+                                    existing_df.join(kbar_df.select(["date", "session"]).unique(),
+                                                     on=["date", "session"], how="anti"),
+                                    kbar_df,
+                                ])
                                 .sort("ts")
                             )
                         except Exception as e:
@@ -220,30 +281,39 @@ def _process_symbol(symbol, date_str, year, month, source):
                             #    一行 ⚠️ 不中斷。搭配當時的非原子寫入,故障鏈是:
                             #      ① 寫到一半被中斷 → 年檔毀損
                             #      ② 下次 read_parquet 失敗 → 用單日覆寫整年
-                            #    現在改為:**保住既有檔案、跳過本次 1d 更新、用 ❌ 大聲報**
+                            #    現在改為:**保住既有檔案、跳過本次更新、用 ❌ 大聲報**
                             #    (❌ 是 daily_sync Tee 的錯誤標記,會浮到 [SUMMARY])。
                             #    不 raise 的原因:第 57 行的 try 包住整個 for symbol 迴圈,
                             #    raise 會讓後續商品(TSE / TXFR2)整個不處理,爆炸半徑過大。
-                            print(f"❌ 1d 年檔讀取失敗,已跳過本次更新以保住既有資料")
+                            print(f"❌ {tf} {target['layout']} 檔讀取失敗,已跳過本次更新以保住既有資料")
                             print(f"   檔案:{save_path}")
                             print(f"   原因:{type(e).__name__}: {e}")
-                            print(f"   影響:本商品的 1d 不更新(其他 TF 與其他商品不受影響);")
+                            print(f"   影響:本商品的 {tf} 不更新(其他 TF 與其他商品不受影響);")
                             print(f"        修好該檔前每天都會重複此錯誤 —— 這是刻意的,別忽略。")
                             return          # 原為 for 迴圈內的 continue(本體已抽成函式)
-                    else:
-                        final_df = kbar_df
-
-                    _atomic_write_parquet(final_df, save_path)
-                    print(f"   -> {tf} Updated: {save_path} (Total days: {len(final_df)//2})")
+                        # 一檔多日:檔尾 footer 的 raw_hash 只代表最後寫入的那一天,不掛
+                        _atomic_write_parquet(final_df, save_path,
+                                              lineage.lineage_metadata(source="main_etl"))
+                        print(f"   -> {tf} Updated: {save_path} ({final_df['date'].n_unique()} days)")
 
-                # Case B: 分時/分秒 (1m, 5s...) -> 存成「日檔」，直接覆蓋
-                else:
-                    kbar_dir = os.path.join(CACHE_ROOT, tf, symbol, year)
-                    os.makedirs(kbar_dir, exist_ok=True)
-                    
-                    save_path = os.path.join(kbar_dir, f"{date_str}_{symbol}_{tf}.parquet")
-                    _atomic_write_parquet(kbar_df, save_path)
-                    print(f"   -> {tf} Saved: {save_path} ({len(kbar_df)} bars)")
+                    # Case B: 一檔一天(或多日檔還不存在)-> 直接覆蓋
+                    else:
+                        meta = kv if target["layout"] == "daily" else lineage.lineage_metadata(source="main_etl")
+                        _atomic_write_parquet(kbar_df, save_path, meta)
+                        print(f"   -> {tf} Saved: {save_path} ({len(kbar_df)} bars)")
+
+                    if raw_fp:
+                        rows.append(lineage.lineage_row(tf, symbol, date_str, save_path, raw_fp))
+            finally:
+                # 一個商品寫一次索引(每次 record 都重寫整份索引,逐 TF 記就是 6+ 次);
+                # 放 finally:迴圈內有提早 return,已寫的檔仍要有血緣
+                if rows:
+                    try:
+                        lineage.record(rows)
+                    except Exception as e:
+                        print(f"⚠️  血緣索引更新失敗(kbars 已寫入,不影響資料):{e!r}")
+
+            return tick_df
 
 
 if __name__ == "__main__":
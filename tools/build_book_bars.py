@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""五檔簿(`*_bidask.parquet`)→ 簿面 K 棒的全史建置(`core/book_resampler` 的離線入口)。
+
+## 為什麼要它
+
+`main_etl` 只會在**當天**有 bidask 檔時順手做(Phase 4)。2025-12 起已經歸檔的
+178 天從來沒被讀過 —— 這支把它們一次補齊,之後只在 book_resampler 改版時重跑。
+
+## 平行
+
+一天一檔、彼此無關 ⇒ `core.pool.build_days` 逐 (商品, 日) 平行;每個 worker 讀一次簿、
+一次成交,寫該日所有 TF。某 TF 算出來是空的(不寫檔)記在 `book/_meta/empty_days.json`,
+下次不再重排。
+
+## 🔒 唯讀 archive
+
+只讀 `raw_ticks`(bidask + ticks),只寫 `book/`(衍生品,可整個刪掉重跑)。
+
+## 用法
+
+    python -m tools.build_book_bars                      # 全史、全 TF(已有輸出的日子跳過)
+    python -m tools.build_book_bars --symbols TXF --tfs 1m 5m --force
+"""
+import argparse
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.lake_paths import tick_dir  # noqa: E402
+from config.settings import TIMEFRAMES  # noqa: E402
+from core.book_resampler import BOOK_ROOT, book_path, build_book_day  # noqa: E402
+from core.pool import build_days  # noqa: E402
+
+# 本 repo 的慣例(同 validate_lake.py):在碼裡強制 utf-8,不靠 shell 繼承。
+for _s in (sys.stdout, sys.stderr):
+    if hasattr(_s, "reconfigure"):
+        _s.reconfigure(encoding="utf-8", errors="replace")
+
+SYMBOLS = ["TXF", "TXFR2"]          # 只有期貨有五檔簿
+
+
+def _build_one(symbol, day, tfs):
+    """worker:一天 → {tf: 根數}(沒有 bidask 檔 → 空 dict)。"""
+    return {tf: df.height for tf, df in build_book_day(symbol, day, tfs).items()}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--symbols", nargs="+", default=SYMBOLS)
+    ap.add_argument("--tfs", nargs="+", default=list(TIMEFRAMES))
+    ap.add_argument("--force", action="store_true", help="已有輸出(或記過空結果)也重建")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    a = ap.parse_args()
+
+    jobs = [(sym, os.path.basename(p)[:10], (sym, os.path.basename(p)[:10], a.tfs))
+            for sym in a.symbols
+            for p in sorted(glob.glob(os.path.join(tick_dir(sym), "*", "*",
+                                                   f"*_{sym}_bidask.parquet")))]
+    failed = build_days(jobs, _build_one, tfs=a.tfs, workers=a.workers, force=a.force,
+                        out_path=lambda sym, day, tf: book_path(tf, sym, day),
+                        empty_state=os.path.join(BOOK_ROOT, "_meta", "empty_days.json"),
+                        icon="📚", noun="簿面棒")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
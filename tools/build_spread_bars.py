@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""兩腳逐筆 → 跨月價差 K 棒的全史建置(`core/spread` 的離線入口)。
+
+## 為什麼要它
+
+`main_etl` 只會在**當天**兩腳都抓到時順手做(Phase 5)。已經歸檔的歷史從來沒有價差棒 ——
+這支把它們一次補齊,之後只在 core/spread 或 resampler 改版時重跑(`--force`)。
+
+## 平行
+
+一天一組、彼此無關 ⇒ `core.pool.build_days` 逐 (價差對, 日) 平行;每個 worker 讀兩腳各一次
+(`tick_pack.read_day`:月包有就只讀那個 row group),寫該日所有 TF。空結果記在
+`spread/_meta/empty_days.json`,下次不再重排。
+
+## 🔒 唯讀 archive
+
+只讀 `raw_ticks` / `tick_packs`,只寫 `spread/`(衍生品,可整個刪掉重跑)。
+
+## 用法
+
+    python -m tools.build_spread_bars                    # 全史、全 TF(已有輸出的日子跳過)
+    python -m tools.build_spread_bars --tfs 1m 5m --force
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.lake_paths import list_tick_files  # noqa: E402
+from config.settings import TIMEFRAMES  # noqa: E402
+from core import tick_pack  # noqa: E402
+from core.pool import build_days  # noqa: E402
+from core.spread import SPREAD_PAIRS, SPREAD_ROOT, build_spread_day, spread_path  # noqa: E402
+
+# 本 repo 的慣例(同 validate_lake.py):在碼裡強制 utf-8,不靠 shell 繼承。
+for _s in (sys.stdout, sys.stderr):
+    if hasattr(_s, "reconfigure"):
+        _s.reconfigure(encoding="utf-8", errors="replace")
+
+
+def _build_one(near, far, day, tfs):
+    """worker:一天 → {tf: 根數}(任一腳空 → 空 dict)。"""
+    out = build_spread_day(near, far, day, tick_pack.read_day(near, day),
+                           tick_pack.read_day(far, day), tfs)
+    return {tf: df.height for tf, df in out.items()}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--tfs", nargs="+", default=list(TIMEFRAMES))
+    ap.add_argument("--force", action="store_true", help="已有輸出(或記過空結果)也重建")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    a = ap.parse_args()
+
+    jobs = []
+    for near, far in SPREAD_PAIRS:
+        far_days = {os.path.basename(p)[:10] for p in list_tick_files(far)}
+        for p in list_tick_files(near):
+            day = os.path.basename(p)[:10]
+            if day in far_days:
+                jobs.append((f"{near}-{far}", day, (near, far, day, a.tfs)))
+    failed = build_days(jobs, _build_one, tfs=a.tfs, workers=a.workers, force=a.force,
+                        out_path=lambda pair, day, tf: spread_path(tf, *pair.split("-"), day),
+                        empty_state=os.path.join(SPREAD_ROOT, "_meta", "empty_days.json"),
+                        icon="📐", noun="價差棒")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
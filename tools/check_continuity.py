@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""kbars 的**跨檔連續性**檢查 —— 缺棒、重疊、`dur_s` 不變量,一個 lazy scan 算完。
+
+## 為什麼要它
+
+`validate_lake` 一次只看一個檔(外加相鄰日檔的 ts 區間)。下面這些它看不到:
+
+  ① **缺棒**:5m 日盤應有 60 根、夜盤 168 根。少了幾根不會讓任何一個檔「格式錯」,
+     但回測會在那裡跳空 —— 而且是**安靜地**跳空。
+  ② **整段缺**:1d 年檔有某 (date, session),分時 TF 卻整段沒有(寫入中斷、自癒漏補)。
+  ③ **重疊**:同一個盤段落在兩個日檔裡、或檔與檔之間 ts 不嚴格遞增。
+  ④ **`dur_s` 不變量**(見 `core/resampler.resample_to_kbars` 2b):每根棒的 dur 恰為
+     其桶的名目長度(盤段尾桶截到收盤;1d = 整個盤段)。不符 = 切片邏輯或資料被動過。
+  ⑤ **對齊**:分時棒的 ts 必須落在「盤段起點 + k × TF」上。
+
+以前要查這些只能臨時寫迴圈逐檔讀。這裡把指定範圍的檔一次交給 `pl.scan_parquet`,
+逐棒與逐盤段的不變量都在同一個 plan 裡算完,只輸出**異常表**(正常盤段不列)。
+
+## 缺棒的判讀
+
+湖裡**不存空桶**(`resample_to_kbars` 濾 `volume > 0`)。所以「缺棒」同時涵蓋兩件事:
+資料真的掉了,以及那個桶真的沒成交。後者在 5s/1m、次月(TXFR2)、夜盤深夜都很常見,
+所以缺棒只對 `--hole-tfs`(預設 5m 以上)報,且以 `--min-missing` 設門檻。
+其餘四項是**硬性不變量**,任何 TF 都不該出現。
+
+## 🔒 唯讀
+
+只讀 `CACHE_ROOT`,只寫 `--out` 指定的異常表(.parquet 或 .csv)。
+
+## 用法
+
+    python -m tools.check_continuity --tf 5m                      # 三商品全史
+    python -m tools.check_continuity --tf 1m 5m --symbols TXF --from 2024-01-01
+    python -m tools.check_continuity --tf 5m --out anomalies.parquet
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import polars as pl  # noqa: E402
+
+from config.lake_paths import CACHE_ROOT, kbar_paths, list_kbar_files  # noqa: E402
+from config.settings import TIMEFRAMES  # noqa: E402
+from core.resampler import (DAY_SESSION_LIMIT_SEC, NIGHT_SESSION_LIMIT_SEC,  # noqa: E402
+                            timeframe_to_seconds)
+
+# 本 repo 的慣例(同 validate_lake.py):在碼裡強制 utf-8,不靠 shell 繼承。
+for _s in (sys.stdout, sys.stderr):
+    if hasattr(_s, "reconfigure"):
+        _s.reconfigure(encoding="utf-8", errors="replace")
+
+SYMBOLS = ["TXF", "TSE", "TXFR2"]
+#: 預設只對這些 TF 報缺棒(更細的 TF 空桶是常態,見模組說明)。
+HOLE_TFS = ("5m", "30m", "1h")
+#: dur_s 比對容忍(秒)。dur_s 是 µs 整數除一次 1e6,理論上精確;留 1µs 防 float 表示。
+DUR_TOL_S = 1e-6
+
+ANOMALY_SCHEMA = {"symbol": pl.Utf8, "tf": pl.Utf8, "date": pl.Date, "session": pl.Utf8,
+                  "kind": pl.Utf8, "n": pl.Int64, "detail": pl.Utf8}
+
+
+def _files(tf, symbol, d_from, d_to):
+    if d_from is None and d_to is None:
+        return list_kbar_files(tf, symbol)
+    return kbar_paths(tf, symbol, d_from or "1990-01-01", d_to or "2100-12-31")
+
+
+def _date_filter(lf, d_from, d_to):
+    # 年檔/月檔的範圍比檔案粒度細,要在列上再切一次
+    if d_from:
+        lf = lf.filter(pl.col("date") >= pl.lit(d_from).str.to_date())
+    if d_to:
+        lf = lf.filter(pl.col("date") <= pl.lit(d_to).str.to_date())
+    return lf
+
+
+def session_stats(tf, symbol, d_from=None, d_to=None) -> pl.DataFrame:
+    """一個 (tf, 商品) 的逐盤段統計:一個 lazy scan、一次 group_by。
+
+    回傳每個 (date, session) 一列:n_bars / expected / n_files / n_dur_bad /
+    n_misaligned / n_nonincreasing / dur_sum / first_ts / last_ts。
+    """
+    files = _files(tf, symbol, d_from, d_to)
+    if not files:
+        return pl.DataFrame()
+    is_1d = tf == "1d"
+    tf_s = None if is_1d else timeframe_to_seconds(tf)
+    lim_s = (pl.when(pl.col("session") == "Day").then(DAY_SESSION_LIMIT_SEC)
+             .otherwise(NIGHT_SESSION_LIMIT_SEC))
+
+    lf = pl.scan_parquet(files, include_file_paths="_file", missing_columns="insert")
+    lf = lf.select(["_file", "date", "session", pl.col("ts").cast(pl.Datetime("us")), "dur_s"])
+    # 檔案串接順序 = 時間序(檔名字典序)⇒ 整串 ts 必須嚴格遞增;先算再切日期,
+    # 邊界那一列才比得到前一檔
+    lf = lf.with_columns((pl.col("ts").diff() <= pl.duration(microseconds=0))
+                         .fill_null(False).alias("_nonincr"))
+    lf = _date_filter(lf, d_from, d_to)
+
+    if is_1d:
+        exp_dur = lim_s
+        misaligned = pl.lit(False)
+        expected = pl.lit(1)
+    else:
+        # 盤段起點:Day = date 08:45;Night = date 15:00(date 是歸檔樞紐後的交易日)
+        open_ts = pl.col("date").cast(pl.Datetime("us")) + pl.when(
+            pl.col("session") == "Day").then(pl.duration(hours=8, minutes=45)
+        ).otherwise(pl.duration(hours=15))
+        off_s = (pl.col("ts") - open_ts).dt.total_seconds()
+        exp_dur = pl.min_horizontal(off_s + tf_s, lim_s) - off_s
+        misaligned = (off_s % tf_s != 0) | (off_s < 0) | (off_s >= lim_s)
+        expected = (lim_s + tf_s - 1) // tf_s
+    lf = lf.with_columns([
+        ((pl.col("dur_s") - exp_dur).abs() > DUR_TOL_S).fill_null(True).alias("_dur_bad"),
+        misaligned.alias("_misaligned"),
+        expected.alias("_expected"),
+    ])
+    return (lf.group_by(["date", "session"])
+            .agg([
+                pl.len().alias("n_bars"),
+                pl.col("_expected").first().alias("expected"),
+                pl.col("_file").n_unique().alias("n_files"),
+                pl.col("_dur_bad").sum().alias("n_dur_bad"),
+                pl.col("_misaligned").sum().alias("n_misaligned"),
+                pl.col("_nonincr").sum().alias("n_nonincreasing"),
+                pl.col("dur_s").sum().alias("dur_sum"),
+                pl.col("ts").min().alias("first_ts"),
+                pl.col("ts").max().alias("last_ts"),
+            ])
+            .sort(["date", "session"])
+            .collect())
+
+
+def anomalies(tf, symbol, d_from=None, d_to=None, hole_tfs=HOLE_TFS,
+              min_missing=1, ref=None) -> pl.DataFrame:
+    """(tf, 商品) → 異常表(`ANOMALY_SCHEMA`)。`ref` = 參照盤段集合(1d 的 session_stats)。"""
+    st = session_stats(tf, symbol, d_from, d_to)
+    parts = []
+    if not st.is_empty():
+        st = st.with_columns((pl.col("expected") - pl.col("n_bars")).alias("n_missing"))
+        rules = [
+            ("重疊", pl.col("n_nonincreasing"),
+             pl.format("ts 未嚴格遞增 {} 處(跨檔或檔內)", pl.col("n_nonincreasing"))),
+            ("跨檔", pl.col("n_files") - 1,
+             pl.format("同一盤段分散在 {} 個檔", pl.col("n_files"))),
+            ("dur", pl.col("n_dur_bad"),
+             pl.format("{} 根 dur_s ≠ 名目桶長(盤段合計 {}s)", pl.col("n_dur_bad"),
+                       pl.col("dur_sum"))),
+            ("對齊", pl.col("n_misaligned"),
+             pl.format("{} 根 ts 不在盤段起點 + k×{}", pl.col("n_misaligned"), pl.lit(tf))),
+            ("超額", -pl.col("n_missing"),
+             pl.format("{} 根 > 名目上限 {}", pl.col("n_bars"), pl.col("expected"))),
+        ]
+        if tf in hole_tfs:
+            rules.append(("缺棒", pl.when(pl.col("n_missing") >= min_missing)
+                          .then(pl.col("n_missing")).otherwise(0),
+                          pl.format("{}/{} 根({} ~ {})", pl.col("n_bars"), pl.col("expected"),
+                                    pl.col("first_ts").dt.strftime("%H:%M"),
+                                    pl.col("last_ts").dt.strftime("%H:%M"))))
+        for kind, n, detail in rules:
+            parts.append(st.filter(n > 0).select([
+                pl.col("date"), pl.col("session"), pl.lit(kind).alias("kind"),
+                n.cast(pl.Int64).alias("n"), detail.alias("detail")]))
+    if ref is not None and not ref.is_empty() and tf != "1d":
+        have = st.select(["date", "session"]) if not st.is_empty() else ref.clear().select(
+            ["date", "session"])
+        parts.append(ref.select(["date", "session"]).join(have, on=["date", "session"],
+                                                          how="anti")
+                     .select([pl.col("date"), pl.col("session"), pl.lit("整段缺").alias("kind"),
+                              pl.lit(1, dtype=pl.Int64).alias("n"),
+                              pl.lit("1d 有此盤段,本 TF 無任何棒").alias("detail")]))
+    if not parts:
+        return pl.DataFrame(schema=ANOMALY_SCHEMA)
+    return (pl.concat(parts)
+            .with_columns([pl.lit(symbol).alias("symbol"), pl.lit(tf).alias("tf")])
+            .select(list(ANOMALY_SCHEMA))
+            .sort(["date", "session", "kind"]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--tf", nargs="+", default=[t for t in TIMEFRAMES if t != "5s"])
+    ap.add_argument("--symbols", nargs="+", default=SYMBOLS)
+    ap.add_argument("--from", dest="d_from")
+    ap.add_argument("--to", dest="d_to")
+    ap.add_argument("--hole-tfs", nargs="*", default=list(HOLE_TFS),
+                    help="要報缺棒的 TF(預設 5m 以上;細 TF 空桶是常態)")
+    ap.add_argument("--min-missing", type=int, default=1, help="缺棒 ≥ 此數才列")
+    ap.add_argument("--out", help="異常表輸出(.parquet / .csv);不給只印摘要")
+    a = ap.parse_args()
+
+    t0 = time.time()
+    tables = []
+    for sym in a.symbols:
+        ref = session_stats("1d", sym, a.d_from, a.d_to)
+        for tf in a.tf:
+            an = anomalies(tf, sym, a.d_from, a.d_to, a.hole_tfs, a.min_missing,
+                           ref=ref if tf != "1d" else None)
+            tables.append(an)
+            summary = ", ".join(f"{k} {n}" for k, n in
+                                an.group_by("kind").len().sort("kind").iter_rows()) or "無異常"
+            print(f"{'❌' if an.height else '✅'} {sym:<6}{tf:>4}:{summary}")
+    out = pl.concat(tables) if tables else pl.DataFrame(schema=ANOMALY_SCHEMA)
+
+    if a.out:
+        out_abs = os.path.abspath(a.out)
+        if os.path.normcase(out_abs).startswith(os.path.normcase(os.path.abspath(CACHE_ROOT))):
+            sys.exit(f"❌ --out 不可以寫進 CACHE_ROOT:{out_abs}")
+        if a.out.endswith(".csv"):
+            out.write_csv(a.out)
+        else:
+            out.write_parquet(a.out)
+        print(f"💾 {out.height} 列異常 → {a.out}")
+    elif out.height:
+        with pl.Config(tbl_rows=40, fmt_str_lengths=80):
+            print(out.head(40))
+    print(f"\n{'=' * 60}\n異常 {out.height} 列({time.time() - t0:.1f}s)")
+    return 1 if out.height else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,13 +12,30 @@
 先翻表 → 讀取端找不到月檔 → 空圖(而且不報錯,因為「這天沒資料」是合法狀態)。
 所以正確流程是:**先轉檔(本工具)→ 驗 → 才翻表**。
 
+2026-10 起另有不必綁時機的做法:翻表時同時把舊佈局填進 `lake_paths.LAYOUT_FALLBACK`,
+讀取端逐單位「有新檔用新檔、否則舊檔」,本工具之後慢慢跑;轉完驗完再拿掉退路。
+
 ## 🔒 安全設計
 
 - **預設 `--dry-run`**:什麼都不寫,只印計畫。要真的寫必須明確加 `--write`。
 - `--out-root` 可把結果寫到別的地方(例如 scratch),**生產完全不動** —— 這是
   promote 之前先驗整條鏈的方法。
 - **不刪日檔。** 刪除是獨立的、需要人點頭的動作(`--prune` 只印指令,不執行)。
-- 寫完**立刻讀回來與來源逐值比對**;不符就刪掉那個月檔並報錯,不留半成品。
+- 寫完**立刻與來源比對**;不符就刪掉那個月檔並報錯,不留半成品。
+
+## 記憶體與平行(2026-10)
+
+原本一個月 = 把所有日檔 `read_parquet` 進來 concat、寫出、再整月讀回來兩邊各 sort 一次
+`equals` —— 5s 一個月的尖峰是「來源 + 讀回 + 兩份排序」四份;1d 年檔更是**每個月**全讀一次。
+現在:
+
+- 一個月 = 一條 lazy 管線(`scan_parquet` × N → concat → `sink_parquet`),串流寫出,
+  不在記憶體裡組整月。日檔依日期序串接本來就是 ts 遞增(日檔內已排序、錨定日不交錯),
+  所以**不排序**;1d 年檔依月過濾後量很小,照舊排序。
+- 年檔分月只 scan `date` 一欄。
+- 驗證改成**串流雜湊**:兩邊各算「列數 + 兩個種子的逐列雜湊和」(順序無關),
+  月檔另驗 ts 非遞減(補上順序)與 schema 相同。整月不必同時在記憶體。
+- 各 (tf, 商品) 彼此無關 ⇒ `--workers` 以 process pool 平行。
 
 ## 為什麼 1d 也轉成月檔(明明年檔更少)
 
@@ -32,13 +49,14 @@
     python -m tools.compact_kbars --out-root <scratch>/cache --write   # 先在別處驗
     python -m tools.compact_kbars --write                              # 真的轉生產
     python -m tools.compact_kbars --symbols TXF --tfs 30m --write
+    python -m tools.compact_kbars --write --workers 4
 """
 import argparse
 import collections
 import os
-import shutil
 import sys
 import time
+from concurrent.futures import as_completed
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -46,6 +64,7 @@ import polars as pl  # noqa: E402
 
 from config.lake_paths import CACHE_ROOT, list_kbar_files  # noqa: E402
 from config.settings import TIMEFRAMES  # noqa: E402
+from core.pool import spawn_pool  # noqa: E402
 
 for _s in (sys.stdout, sys.stderr):
     if hasattr(_s, "reconfigure"):
@@ -71,30 +90,59 @@ def plan(tf, symbol):
     groups = collections.OrderedDict()
     for p in list_kbar_files(tf, symbol):
         m = _month_of(p, tf, symbol)
-        if m is None:                             # 年檔:依 date 欄拆月
-            df = pl.read_parquet(p)
-            for mm in sorted(df["date"].cast(pl.Utf8).str.slice(0, 7).unique().to_list()):
+        if m is None:                             # 年檔:依 date 欄拆月(只讀 date 一欄)
+            months = (pl.scan_parquet(p)
+                      .select(pl.col("date").cast(pl.Utf8).str.slice(0, 7).unique())
+                      .collect().to_series().sort().to_list())
+            for mm in months:
                 groups.setdefault(mm, []).append((p, mm))
         else:
             groups.setdefault(m, []).append((p, None))
     return groups
 
 
-def _load(src_list):
-    """把一個月的來源讀成一張表。第二個元素非 None 表示要從年檔裡篩該月。"""
-    frames = []
+def _scan(src_list):
+    """一個月的來源 → 一條 LazyFrame(不 collect)。第二個元素非 None 表示要從年檔裡篩該月。
+
+    日檔依日期序串接即 ts 遞增,不排序(排序會把整月拉進記憶體);年檔篩月後量小,照舊排序。
+    """
+    frames, yearly = [], False
     for p, month_filter in src_list:
-        df = pl.read_parquet(p)
+        lf = pl.scan_parquet(p)
         if month_filter is not None:
-            df = df.filter(pl.col("date").cast(pl.Utf8).str.starts_with(month_filter))
-        frames.append(df)
-    if not frames:
-        return pl.DataFrame()
-    try:
-        out = pl.concat(frames)
-    except Exception:
-        out = pl.concat(frames, how="diagonal")   # 舊檔可能缺欄(10 欄時代)
-    return out.sort("ts")
+            lf = lf.filter(pl.col("date").cast(pl.Utf8).str.starts_with(month_filter))
+            yearly = True
+        frames.append(lf)
+    # 舊檔可能缺欄(10 欄時代)→ diagonal 補 null;但同名欄型別不同要**報錯**,
+    # 不用 diagonal_relaxed 悄悄升型(Int64 → Float64 之類)—— 那是湖裡的 schema 問題,不是轉檔該吞的
+    out = pl.concat(frames, how="diagonal")
+    return out.sort("ts") if yearly else out
+
+
+#: 驗證用的兩個雜湊種子:單一 64-bit 雜湊和撞上的機率已可忽略,兩個是為了讓「剛好抵銷」更不可能。
+_HASH_SEEDS = (0, 0x9E3779B9)
+
+
+def _digest(lf):
+    """LazyFrame 的串流摘要:(列數, 各種子「逐列雜湊截 32 bit」之和)。與列序無關。"""
+    row = pl.struct(pl.all())
+    aggs = [pl.len().alias("n")] + [
+        (row.hash(seed) % (1 << 32)).sum().alias(f"h{i}")   # 先截 32 bit,UInt64 累加不溢位
+        for i, seed in enumerate(_HASH_SEEDS)]
+    return tuple(lf.select(aggs).collect(engine="streaming").row(0))
+
+
+def _verify(src_lf, dest):
+    """月檔與來源管線一致:schema 相同、摘要相同、ts 非遞減。回傳 (問題字串 | None, 列數)。"""
+    dest_lf = pl.scan_parquet(dest)
+    if dest_lf.collect_schema() != src_lf.collect_schema():
+        return "schema 不同", 0
+    got = _digest(dest_lf)
+    if got != _digest(src_lf):
+        return "列數或內容雜湊不同", got[0]
+    unsorted = (dest_lf.select((pl.col("ts").diff() < pl.duration()).any())
+                .collect(engine="streaming").item())
+    return ("ts 非遞增" if unsorted else None), got[0]
 
 
 def compact(tf, symbol, out_root, write, report):
@@ -104,24 +152,32 @@ def compact(tf, symbol, out_root, write, report):
     # 逐月累加會把 7 個年檔數成 83 個 —— 報告裡的誤導數字比沒有數字更糟。
     report["src_files"] += len({p for src in groups.values() for p, _ in src})
     for month, src in groups.items():
-        df = _load(src)
+        lf = _scan(src)
         dest = os.path.join(dest_dir, f"{symbol}_{tf}_{month}.parquet")
         report["months"] += 1
-        report["rows"] += df.height
         if not write:
+            report["rows"] += lf.select(pl.len()).collect().item()
             continue
         os.makedirs(dest_dir, exist_ok=True)
         tmp = f"{dest}.tmp{os.getpid()}"
-        df.write_parquet(tmp)
+        lf.sink_parquet(tmp)
+        # 先驗 tmp 再換檔 —— 不留沒驗過的半成品,也不會蓋掉一個好的舊月檔
+        problem, n = _verify(lf, tmp)
+        if problem:
+            os.remove(tmp)
+            raise RuntimeError(f"寫回驗證失敗({problem}),未寫入:{dest}")
         os.replace(tmp, dest)                     # 原子換檔(同 _atomic_write_parquet)
-        # 立刻讀回來逐值比對 —— 不留沒驗過的半成品
-        back = pl.read_parquet(dest)
-        if not back.sort("ts").equals(df.sort("ts")):
-            os.remove(dest)
-            raise RuntimeError(f"寫回驗證失敗,已刪除:{dest}")
+        report["rows"] += n
         report["written"] += 1
 
 
+def _compact_job(tf, sym, out_root, write):
+    """worker:一個 (tf, 商品) → 它自己的報告 Counter。"""
+    report = collections.Counter()
+    compact(tf, sym, out_root, write, report)
+    return report
+
+
 def main():
     ap = argparse.ArgumentParser(description="kbar 日檔 → 月檔(預設 dry-run)")
     ap.add_argument("--symbols", default=",".join(SYMBOLS))
@@ -132,6 +188,8 @@ def main():
                     help="真的寫入。**不加就只是 dry-run**")
     ap.add_argument("--prune", action="store_true",
                     help="只印出刪除日檔的指令,不執行")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                    help="平行處理的 (tf, 商品) 數(1 = 單程序)")
     a = ap.parse_args()
 
     out_root = os.path.abspath(a.out_root) if a.out_root else CACHE_ROOT
@@ -142,13 +200,23 @@ def main():
 
     report = collections.Counter()
     t0 = time.time()
-    for tf in [t for t in a.tfs.split(",") if t]:
-        for sym in [s for s in a.symbols.split(",") if s]:
-            before = dict(report)
-            compact(tf, sym, out_root, a.write, report)
-            print(f"  {tf:5} {sym:6} {report['src_files']-before.get('src_files',0):>5} 個來源檔"
-                  f" → {report['months']-before.get('months',0):>4} 個月檔"
-                  f"  {report['rows']-before.get('rows',0):>9,} 列")
+    pairs = [(tf, sym) for tf in a.tfs.split(",") if tf
+             for sym in a.symbols.split(",") if sym]
+
+    def show(tf, sym, r):
+        report.update(r)
+        print(f"  {tf:5} {sym:6} {r['src_files']:>5} 個來源檔"
+              f" → {r['months']:>4} 個月檔  {r['rows']:>9,} 列", flush=True)
+
+    if a.workers <= 1 or len(pairs) < 2:
+        for tf, sym in pairs:
+            show(tf, sym, _compact_job(tf, sym, out_root, a.write))
+    else:
+        with spawn_pool(a.workers) as ex:
+            futs = {ex.submit(_compact_job, tf, sym, out_root, a.write): (tf, sym)
+                    for tf, sym in pairs}
+            for f in as_completed(futs):
+                show(*futs[f], f.result())
 
     el = time.time() - t0
     print(f"\n{'=' * 62}")
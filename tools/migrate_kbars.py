@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""kbars 的**欄位遷移引擎**(2026-10;`tools/backfill_pt_sum` 的一般化)。
+
+## 為什麼要它
+
+2026-08-16 的 true_pt_sum / dur_s 回填是一支 200 行的一次性腳本:寫死 OLD_COLS/NEW_COLS、
+先 `copytree` 整個 kbars/(501 MB)當備份、再單執行緒逐日重跑 `resample_to_kbars`。
+下一個衍生欄再來一次,就是再一支 200 行。
+
+這裡把那支腳本的**做法**抽出來,把**要做什麼**變成 `MIGRATIONS` 裡的一筆設定:
+
+    "pt_sum": {
+        "new_cols":   ["true_pt_sum", "dur_s"],        # 要嫁接的新欄
+        "check_cols": OLD_COLS,                         # 嫁接前必須與重算對齊的舊欄
+        "rel_tol":    {"true_pv_sum": 1e-9},            # 對齊判準(其餘逐位元)
+        "build":      resample_to_kbars,                # (ticks, tf) → 含新欄的重算結果
+    }
+
+加一個欄跨六年 = **加一筆設定 + 跑一次** `python -m tools.migrate_kbars <name>`。
+
+## 做法(與 backfill_pt_sum v2 相同的契約)
+
+  ‧ **舊欄一律原封保留**(連位元都不動)—— 寫回的檔 = 舊檔 + 新欄。
+  ‧ 嫁接條件 = 重算的 `check_cols` 與舊檔對齊(`core.compare`,向量化)。
+  ‧ 對不齊 → 該檔(1d 為該**列**)新欄填 **null**,全湖 schema 仍一致;寫進失敗清單,
+    修不修由人裁決,本工具不動值。
+  ‧ 1d 年檔:以「(date, session) 身分、日期序 keep-last」重演 ETL 的 append 語意後逐列嫁接。
+  ‧ 嫁接成功的檔 = 目前 recipe 的產物 ⇒ footer 與血緣索引一併記血緣(core/lineage.py)。
+
+## 與一次性腳本不同的地方
+
+  ‧ **平行**:(商品, 日) 為工作單位丟進 process pool;每個 worker 讀一次 raw、
+    處理該日所有缺欄的分時檔,順便把該日的 1d 重算列回傳給主程序(年檔在最後統一嫁接)。
+    分時檔是月檔時,同一個月檔涵蓋的日子併成**一個**工作單位(`_day_groups`):
+    月檔逐日切開與重算比對,且只由一個 worker 改寫。
+  ‧ **copy-on-write 備份**:只有**真的要改寫**的檔才複製到
+    `DATA_ROOT/migrate_backup/<name>/<相對 CACHE_ROOT 的路徑>`,已存在不覆蓋
+    (保留最初狀態,同 `repair_pt_exceptions._backup`)。不動的檔零成本。
+  ‧ **可中斷續跑**:每個檔原子換檔;已含全部新欄的檔直接跳過 —— 中斷後重跑同一個指令即可。
+
+## 用法
+
+    python -m tools.migrate_kbars --list
+    python -m tools.migrate_kbars pt_sum --dry-run              # 只驗不寫
+    python -m tools.migrate_kbars pt_sum --workers 6
+    python -m tools.migrate_kbars pt_sum --symbols TXF --tfs 5m 1d
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import as_completed
+
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.lake_paths import kbar_files_for_days, list_kbar_files, list_tick_files  # noqa: E402
+from config.settings import CACHE_ROOT, DATA_ROOT, TIMEFRAMES          # noqa: E402
+from core import lineage, tick_pack                         # noqa: E402
+from core.compare import compare_frames, match_expr         # noqa: E402
+from core.pool import spawn_pool                            # noqa: E402
+from core.resampler import ORDER_FLOW_COLS, resample_to_kbars  # noqa: E402
+
+# 本 repo 的慣例(同 validate_lake.py):在碼裡強制 utf-8,不靠 shell 繼承。
+for _s in (sys.stdout, sys.stderr):
+    if hasattr(_s, "reconfigure"):
+        _s.reconfigure(encoding="utf-8", errors="replace")
+
+SYMBOLS = ["TXF", "TXFR2", "TSE"]
+BACKUP_ROOT = os.path.join(DATA_ROOT, "migrate_backup")
+
+#: schema v1 的 10 欄(2026-08-16 之前)。
+BASE_COLS = ["symbol", "date", "ts", "session",
+             "open", "high", "low", "close", "volume", "true_pv_sum"]
+
+
+def _build_order_flow(ticks, tf):
+    return resample_to_kbars(ticks, tf, order_flow=True)
+
+
+#: 遷移註冊表。**新增一個衍生欄 = 在這裡加一筆**。
+#:   new_cols    要嫁接的欄(名 → dtype)
+#:   check_cols  嫁接前必須與重算對齊的舊欄
+#:   rel_tol     對齊時的相對容忍(floor=0,同 math.isclose);未列者逐位元
+#:   build       (ticks, tf) → 重算結果(須含 check_cols 與 new_cols)
+#:   tfs         適用的 TF(預設全部)
+MIGRATIONS = {
+    # 2026-08-16 wiki/MA-Semantics §6;原 tools/backfill_pt_sum。
+    # true_pv_sum 容忍 1e-9:7/31 的 30m 回填走「5m 求和」、tick 直算是一段求和,
+    # 浮點加法不可結合(TSE 30m 全史 1614 檔只差最後一個 ULP)。
+    "pt_sum": {
+        "new_cols": {"true_pt_sum": pl.Float64, "dur_s": pl.Float64},
+        "check_cols": BASE_COLS,
+        "rel_tol": {"true_pv_sum": 1e-9},
+        "build": resample_to_kbars,
+    },
+    # 2026-10 主動方成交量(`resample_to_kbars(order_flow=True)`)。
+    # 先把 settings.KBAR_ORDER_FLOW 改成 True 再跑 —— 血緣才會記成 schema v3。
+    "order_flow": {
+        "new_cols": {c: pl.Int64 for c in ORDER_FLOW_COLS},
+        "check_cols": BASE_COLS + ["true_pt_sum", "dur_s"],
+        "rel_tol": {"true_pv_sum": 1e-9, "true_pt_sum": 1e-9, "dur_s": 1e-9},
+        "build": _build_order_flow,
+    },
+}
+
+
+
+def _spec(name, tfs=None):
+    spec = dict(MIGRATIONS[name])
+    spec.setdefault("tfs", list(TIMEFRAMES))
+    spec.setdefault("rel_tol", {})
+    if tfs:
+        spec["tfs"] = [tf for tf in spec["tfs"] if tf in tfs]
+    return spec
+
+
+def _has_new_cols(path, spec) -> bool:
+    names = pl.scan_parquet(path).collect_schema().names()
+    return all(c in names for c in spec["new_cols"])
+
+
+def _backup(name, path):
+    """copy-on-write:改寫前複製一次(已存在不覆蓋 —— 保留最初狀態)。"""
+    dst = os.path.join(BACKUP_ROOT, name, os.path.relpath(path, CACHE_ROOT))
+    if not os.path.exists(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(path, dst)
+
+
+def _atomic_write(df: pl.DataFrame, path: str, metadata: dict | None = None) -> None:
+    tmp = f"{path}.tmp{os.getpid()}"
+    df.write_parquet(tmp, metadata=metadata)
+    os.replace(tmp, path)
+
+
+def verify_check_cols(new: pl.DataFrame, old: pl.DataFrame, spec, label: str,
+                      failures: list) -> bool:
+    """`check_cols` 與重算對齊(含列序;容忍見 spec["rel_tol"])。不齊 → 記失敗,回 False。"""
+    if new.height != old.height:
+        failures.append(f"{label}: 根數 {old.height}→{new.height}")
+        return False
+    cols = [c for c in spec["check_cols"] if c in old.columns]   # 舊檔缺欄(不該發生)→ 跳過
+    res = compare_frames(new, old, cols, spec["rel_tol"], floor=0.0)
+    for c in cols:
+        if not res[c]["ok"]:
+            failures.append(f"{label}: 欄 {c} 不符")
+            return False
+    return True
+
+
+def graft(old: pl.DataFrame, spec, values: dict | None) -> pl.DataFrame:
+    """舊檔 + 新欄(`values` 為 {欄: Series};None = 全 null),舊欄位元不動。"""
+    return old.with_columns([
+        pl.Series(c, values[c], dtype=dt) if values is not None
+        else pl.lit(None, dtype=dt).alias(c)
+        for c, dt in spec["new_cols"].items()])
+
+
+def _graft_file(name, spec, tf, sym, path, days, built, fps, out, dry_run):
+    """一個分時檔:逐**來源日**與重算比對、嫁接(月檔一檔多日,先切開再比)。
+
+    切法是 (date, session) 而不是 `date`:D 日的 raw 含前一晚夜盤,那段的 `date` 是前一個
+    交易日(見 resampler 的歸檔樞紐)—— 所以舊列歸給「重算結果裡有它那個 (date, session)
+    的來源日」。同一 (date, session) 出現在兩天的 raw 時取較晚那天(= ETL 的 keep-last)。
+    沒有任何來源日認領的舊列 → 新欄 null、記失敗。列序以原檔為準(`_i`),舊欄位元不動。
+    """
+    old = pl.read_parquet(path).with_row_index("_i")
+    news = {d: built[(tf, d)] for d in days if (tf, d) in built}
+    owner = (pl.concat([n.select(["date", "session"]).unique().with_columns(pl.lit(d).alias("_day"))
+                        for d, n in news.items()])
+             .unique(subset=["date", "session"], keep="last", maintain_order=True)
+             if news else pl.DataFrame(schema={"date": old.schema["date"],
+                                               "session": old.schema["session"], "_day": pl.Utf8}))
+    old = old.join(owner, on=["date", "session"], how="left", maintain_order="left")
+    parts, ok_days, bad = [], [], False
+    for (day,), od in old.partition_by("_day", maintain_order=True, as_dict=True).items():
+        od = od.drop("_day")
+        if day is None:
+            out["failures"].extend(f"{sym}/{tf}/{r['date']} {r['session']}: 無對應 raw → null"
+                                   for r in od.select(["date", "session"]).unique(
+                                       maintain_order=True).iter_rows(named=True))
+            ok = False
+        else:
+            new = news[day]
+            ok = verify_check_cols(new, od, spec, f"{sym}/{tf}/{day}", out["failures"])
+        parts.append(graft(od, spec, {c: new[c] for c in spec["new_cols"]} if ok else None))
+        if ok:
+            ok_days.append(day)
+        bad = bad or not ok
+    res = pl.concat(parts).sort("_i").drop("_i")
+    if bad:
+        md = None                          # 有 null 的檔不等於 recipe 的輸出 → 不掛血緣
+        out["nulled"] += 1
+    else:
+        # 一檔一天才在 footer 掛 raw 雜湊;多日檔(月檔)同 1d 年檔,逐日雜湊見索引
+        raw_hash = fps[ok_days[0]]["raw_hash"] if len(ok_days) == 1 else None
+        md = lineage.lineage_metadata(raw_hash, source=f"migrate_kbars:{name}")
+    out["lineage"].extend(lineage.lineage_row(tf, sym, d, path, fps[d]) for d in ok_days)
+    if not dry_run:
+        _backup(name, path)
+        _atomic_write(res, path, md)
+    out["written"] += 1
+
+
+def _migrate_group(name, tfs, sym, days, targets, need_1d, dry_run):
+    """worker:一組**共用 kbar 檔**的日子(日檔佈局 = 一天;月檔 = 整個月,見 `_day_groups`)。
+
+    `days`    = [(date_str, raw_path, prev)];`prev` = 該日任一 TF 的血緣索引列(沿用 raw 雜湊)
+    `targets` = {tf: [(path, [date_str, ...])]} —— 這組日子涵蓋的分時檔
+    每天的 raw 只讀一次;每個檔只在這一個 worker 裡讀改寫(多個 worker 同改一個月檔會互相覆蓋)。
+    回傳 {days, written, nulled, skipped, failures, lineage, oned};`oned` = 各日 1d 重算(need_1d 時)。
+    """
+    spec = _spec(name, tfs)
+    out = {"days": len(days), "written": 0, "nulled": 0, "skipped": False, "failures": [],
+           "lineage": [], "oned": []}
+    todo = {tf: [(p, ds) for p, ds in files if not _has_new_cols(p, spec)]
+            for tf, files in targets.items()}
+    todo = {tf: files for tf, files in todo.items() if files}
+    if not todo and not need_1d:
+        out["skipped"] = True
+        return out
+
+    built, fps = {}, {}
+    for day, raw_path, prev in days:
+        day_tfs = [tf for tf, files in todo.items() if any(day in ds for _p, ds in files)]
+        if not day_tfs and not need_1d:
+            continue
+        ticks = tick_pack.read_day(sym, day)     # 月包有就讀 row group,否則日檔
+        fps[day] = lineage.raw_fingerprint(raw_path, prev)
+        for tf in day_tfs:
+            built[(tf, day)] = spec["build"](ticks, tf)
+        if need_1d:
+            out["oned"].append(spec["build"](ticks, "1d").with_columns(pl.lit(day).alias("_day")))
+    for tf, files in todo.items():
+        for path, ds in files:
+            _graft_file(name, spec, tf, sym, path, ds, built, fps, out, dry_run)
+    return out
+
+
+def _day_groups(spec, sym, days):
+    """把日子依「共用哪些分時檔」併成工作群組:[(日子清單, {tf: [(path, 日子清單)]})]。
+
+    日檔佈局下一天一組(同舊行為);某個 TF 是月檔 → 同月的日子必須同一組,
+    否則兩個 worker 會各自拿整個月檔去比一天的重算、再互相覆蓋寫回。
+    """
+    files = {tf: [(f["path"], [d.isoformat() for d in f["dates"]])
+                  for f in kbar_files_for_days(tf, sym, days) if f["exists"]]
+             for tf in spec["tfs"] if tf != "1d"}
+    group = {d: (d,) for d in days}
+    for tf_files in files.values():
+        for _p, ds in tf_files:
+            merged = tuple(sorted({x for d in ds for x in group[d]}))
+            for d in merged:
+                group[d] = merged
+    by_group = {}
+    for tf, tf_files in files.items():
+        for p, ds in tf_files:
+            by_group.setdefault(group[ds[0]], {}).setdefault(tf, []).append((p, ds))
+    return [(list(g), by_group.get(g, {})) for g in sorted(set(group.values()))]
+
+
+def graft_yearly(name, tfs, sym, oned_frames, dry_run, failures) -> tuple[int, int]:
+    """1d 年檔:日期序 keep-last(= ETL append)後與舊檔 (date, session) left join,逐列嫁接。
+
+    worker 完成順序不定 ⇒ 先依 raw 檔日期穩定排序,才重演「處理序 keep-last」。
+    """
+    spec = _spec(name, tfs)
+    written = nulled = 0
+    newest = (pl.concat(oned_frames, how="diagonal_relaxed").sort("_day", maintain_order=True)
+              .unique(subset=["date", "session"], keep="last", maintain_order=True)
+              .with_columns(pl.lit(True).alias("_has_new")))
+    new_cols = list(spec["new_cols"])
+    for yf in list_kbar_files("1d", sym):
+        if _has_new_cols(yf, spec):
+            continue
+        old = pl.read_parquet(yf)
+        label = f"{sym}/1d/{os.path.basename(yf)}"
+        cmp_cols = [c for c in spec["check_cols"] if c in old.columns
+                    and c not in ("date", "session")]
+        j = old.join(newest.select(["date", "session", "_has_new"] + new_cols + cmp_cols)
+                     .rename({c: f"{c}_new" for c in cmp_cols + new_cols}),
+                     on=["date", "session"], how="left", maintain_order="left")
+        ok = pl.col("_has_new").fill_null(False)
+        for c in cmp_cols:
+            ok = ok & match_expr(f"{c}_new", c, spec["rel_tol"].get(c), floor=0.0)
+        j = j.with_columns(ok.alias("_ok"))
+        values = {c: j.select(pl.when(pl.col("_ok")).then(pl.col(f"{c}_new"))).to_series()
+                  for c in new_cols}
+        bad = j.filter(~pl.col("_ok")).select(["date", "session", "_has_new"])
+        for r in bad.iter_rows(named=True):
+            failures.append(f"{label}: 列 ({r['date']},{r['session']}) "
+                            f"{'無對應重算' if not r['_has_new'] else '值不齊'} → null")
+        nulled += bad.height
+        if not dry_run:
+            _backup(name, yf)
+            # 有 null 列的年檔不等於 recipe 的輸出 → 不掛血緣
+            md = (lineage.lineage_metadata(source=f"migrate_kbars:{name}")
+                  if bad.is_empty() else None)
+            _atomic_write(graft(old, spec, values), yf, md)
+        written += 1
+    return written, nulled
+
+
+def run(name, symbols, dry_run=False, workers=1, tfs=None) -> int:
+    if name not in MIGRATIONS:
+        print(f"❌ 未知的遷移 {name!r};已註冊:{sorted(MIGRATIONS)}")
+        return 2
+    spec = _spec(name, tfs)
+    print(f"🧬 遷移 {name}:新欄 {list(spec['new_cols'])},TF {spec['tfs']},"
+          f"{'[DRY-RUN] ' if dry_run else ''}workers={workers}")
+    if not dry_run:
+        print(f"[backup] copy-on-write → {os.path.join(BACKUP_ROOT, name)}")
+
+    failures: list = []
+    index = lineage.load_index()
+    intraday = [tf for tf in spec["tfs"] if tf != "1d"]
+    t0 = time.time()
+    n_written = n_nulled = n_days = n_skipped = 0
+    for sym in symbols:
+        raw_files = list_tick_files(sym)
+        # 1d 只要還有任何年檔缺新欄,就得對每一天重算(年檔身分靠全史累積)
+        need_1d = "1d" in spec["tfs"] and any(
+            not _has_new_cols(y, spec) for y in list_kbar_files("1d", sym))
+        print(f"[{sym}] raw 天數 {len(raw_files)},1d 待補={need_1d}", flush=True)
+        raw_of = {os.path.basename(rf)[:10]: rf for rf in raw_files}
+        jobs = []
+        for days, targets in _day_groups(spec, sym, list(raw_of)):
+            entries = [(day, raw_of[day],
+                        next((index[k] for k in ((tf, sym, day) for tf in intraday) if k in index),
+                             None))
+                       for day in days]
+            jobs.append((name, tfs, sym, entries, targets, need_1d, dry_run))
+        oned, rows = [], []
+
+        def take(r):
+            nonlocal n_written, n_nulled, n_days, n_skipped
+            if r["skipped"]:
+                n_skipped += r["days"]
+                return
+            n_written += r["written"]
+            n_nulled += r["nulled"]
+            failures.extend(r["failures"])
+            rows.extend(r["lineage"])
+            oned.extend(r["oned"])
+            if (n_days + r["days"]) // 200 > n_days // 200:
+                print(f"  [{sym}] {n_days + r['days']} 天 ({time.time() - t0:.0f}s)", flush=True)
+            n_days += r["days"]
+
+        try:
+            if workers <= 1:
+                for job in jobs:
+                    take(_migrate_group(*job))
+            else:
+                with spawn_pool(workers) as ex:
+                    for f in as_completed([ex.submit(_migrate_group, *job) for job in jobs]):
+                        take(f.result())
+        finally:
+            if not dry_run:
+                lineage.record(rows)          # 中斷也要把已寫檔的血緣留下
+
+        if oned:
+            w, n = graft_yearly(name, tfs, sym, oned, dry_run, failures)
+            n_written += w
+            n_nulled += n
+
+    print(f"\n{'[DRY-RUN] ' if dry_run else ''}完成:{n_days} 天、寫入 {n_written} 檔、"
+          f"跳過(已含新欄){n_skipped} 天、null 嫁接 {n_nulled} 檔/列、"
+          f"耗時 {time.time() - t0:.0f}s", flush=True)
+    if failures:
+        flog = os.path.join(DATA_ROOT, f"kbars_migrate_{name}_failures.txt")
+        with open(flog, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(sorted(failures)))
+        print(f"⚠ {len(failures)} 個對不齊(舊值保留、新欄=null;全清單 → {flog}):",
+              flush=True)
+        for f in sorted(failures)[:60]:
+            print("   ", f, flush=True)
+        return 1
+    print("✅ 全數對齊(新欄全填)", flush=True)
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="kbars 欄位遷移(宣告式;見 MIGRATIONS)")
+    ap.add_argument("name", nargs="?", help="遷移名稱(MIGRATIONS 的鍵)")
+    ap.add_argument("--list", action="store_true", help="列出已註冊的遷移")
+    ap.add_argument("--symbols", nargs="+", default=SYMBOLS, choices=SYMBOLS)
+    ap.add_argument("--tfs", nargs="+", help="只處理這些 TF(預設為該遷移的全部 TF)")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    ap.add_argument("--dry-run", action="store_true")
+    a = ap.parse_args()
+    if a.list or not a.name:
+        for k, v in MIGRATIONS.items():
+            print(f"  {k:<12} +{list(v['new_cols'])}")
+        return 0
+    return run(a.name, a.symbols, a.dry_run, a.workers, a.tfs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
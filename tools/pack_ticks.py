@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""raw_ticks 日檔 → 月 tick 包(`core/tick_pack` 的建置入口)。
+
+## 為什麼要它
+
+全史重播(fix_kbars / migrate_kbars)開 ~5k 個日檔、各讀一次 footer。月包一個 (商品, 月)
+一檔、一天一個 row group,全史只剩幾百個檔。細節與 🔒 規則見 `core/tick_pack.py` 檔頭。
+
+## 增量
+
+以 `list_tick_files` 為準分月;包 footer 記著每個來源日檔的 (size, mtime)。
+日子集合與 stat 都沒變的月份直接跳過 —— 每天 ETL 後跑一次,只會重建當月那一個包。
+
+## 平行
+
+(商品, 月) 彼此無關 ⇒ `ProcessPoolExecutor` 逐月平行;每個 worker 只寫自己的月包。
+
+## 🔒 唯讀 archive
+
+只讀 `raw_ticks`,只寫 `tick_packs/`(衍生品,可整個刪掉重跑)。
+
+## 用法
+
+    python -m tools.pack_ticks                       # 全史、三商品(增量)
+    python -m tools.pack_ticks --symbols TXF --dry-run
+    python -m tools.pack_ticks --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.lake_paths import tick_pack_path  # noqa: E402
+from core.pool import spawn_pool  # noqa: E402
+from core.tick_pack import build_pack, is_current, month_sources  # noqa: E402
+
+# 本 repo 的慣例(同 validate_lake.py):在碼裡強制 utf-8,不靠 shell 繼承。
+for _s in (sys.stdout, sys.stderr):
+    if hasattr(_s, "reconfigure"):
+        _s.reconfigure(encoding="utf-8", errors="replace")
+
+SYMBOLS = ["TXF", "TSE", "TXFR2"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--symbols", nargs="+", default=SYMBOLS)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    ap.add_argument("--dry-run", action="store_true", help="只列出要重建的月份,不寫")
+    a = ap.parse_args()
+
+    jobs, n_months = [], 0
+    for sym in a.symbols:
+        for (y, m), files in month_sources(sym).items():
+            n_months += 1
+            if not is_current(tick_pack_path(sym, y, m), files):
+                jobs.append((sym, y, m, files))
+    print(f"📦 {n_months} 個月,需重建 {len(jobs)} 個(workers={a.workers})")
+    if a.dry_run:
+        for sym, y, m, files in jobs:
+            print(f"   {sym} {y:04d}-{m:02d}  {len(files)} 天")
+        return 0
+
+    t0 = time.time()
+    packed = skipped = 0
+    with spawn_pool(a.workers) as ex:
+        futs = {ex.submit(build_pack, *job): job for job in jobs}
+        for i, f in enumerate(as_completed(futs), 1):
+            r = f.result()
+            packed += r["packed"]
+            skipped += r["skipped"]
+            if r["skipped"]:
+                print(f"   ⚠️  {os.path.basename(r['path'])}:{r['skipped']} 天未進包"
+                      f"(空檔或 schema 與當月不同,讀取時退回日檔)")
+            if i % 50 == 0:
+                print(f"   … {i}/{len(jobs)}({time.time() - t0:.0f}s)")
+    print(f"\n✅ 重建 {len(jobs)} 個月包:{packed} 天進包、{skipped} 天留在日檔"
+          f"({time.time() - t0:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
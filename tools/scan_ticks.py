@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""整個 raw_ticks archive 的 tick 品質掃描(`core/tick_quality` 的離線入口)。
+
+## 為什麼要它
+
+`main_etl` 的 Phase 1.7 只會量**今天之後**進來的 tick。歷史上已經歸檔的幾千天
+從來沒量過 —— 要讓「壞日」變成可查的表,而不是等全史對帳紅了才回頭挖,
+就得先把歷史補一次基線。之後 ETL 每天 upsert 一列,本工具只在規則改版時重跑。
+
+## 平行
+
+一天一檔、彼此無關 ⇒ 以 `ProcessPoolExecutor` 逐檔平行。worker 只**讀**與**量**,
+回傳 dict;寫入集中在主程序,一個 (商品, 年) 一次原子換檔 —— 年檔不會被多個
+worker 同時讀-改-寫。
+
+## 🔒 唯讀 archive
+
+只讀 `raw_ticks`,只寫 `quality/ticks/`(衍生表,可整個刪掉重跑)。
+
+## 用法
+
+    python -m tools.scan_ticks                               # 全史、三商品
+    python -m tools.scan_ticks --symbols TXF --from 2025-01-01
+    python -m tools.scan_ticks --workers 4 --dry-run         # 只印問題,不寫表
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import polars as pl  # noqa: E402
+
+from config.lake_paths import list_tick_files  # noqa: E402
+from core.pool import spawn_pool  # noqa: E402
+from core.tick_quality import quality_issues, store_quality, tick_quality  # noqa: E402
+
+# 本 repo 的慣例(同 validate_lake.py):在碼裡強制 utf-8,不靠 shell 繼承。
+for _s in (sys.stdout, sys.stderr):
+    if hasattr(_s, "reconfigure"):
+        _s.reconfigure(encoding="utf-8", errors="replace")
+
+SYMBOLS = ["TXF", "TSE", "TXFR2"]
+
+
+def _scan_one(path, symbol):
+    """worker:一檔 → (品質列 | None, 錯誤 | None)。只讀需要的三欄。"""
+    day = os.path.basename(path)[:10]
+    try:
+        df = pl.read_parquet(path, columns=["ts", "close", "volume"])
+        if df.is_empty():
+            return None, f"{symbol} {day}: 空檔"
+        return tick_quality(df, symbol, day), None
+    except Exception as e:
+        return None, f"{symbol} {day}: {e!r}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--symbols", nargs="+", default=SYMBOLS)
+    ap.add_argument("--from", dest="d_from")
+    ap.add_argument("--to", dest="d_to")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    ap.add_argument("--dry-run", action="store_true", help="只掃描與列印,不寫品質表")
+    a = ap.parse_args()
+
+    jobs = []
+    for sym in a.symbols:
+        for p in list_tick_files(sym):
+            day = os.path.basename(p)[:10]
+            if (a.d_from is None or day >= a.d_from) and (a.d_to is None or day <= a.d_to):
+                jobs.append((p, sym))
+    print(f"🩺 掃描 {len(jobs):,} 個 tick 檔(workers={a.workers})")
+
+    t0 = time.time()
+    rows, errors, bad = [], [], []
+    with spawn_pool(a.workers) as ex:
+        futs = [ex.submit(_scan_one, p, sym) for p, sym in jobs]
+        for i, f in enumerate(as_completed(futs), 1):
+            row, err = f.result()
+            if err:
+                errors.append(err)
+            else:
+                rows.append(row)
+                issues = quality_issues(row)
+                if issues:
+                    bad.append(f"{row['symbol']} {row['date']}: " + "; ".join(issues))
+            if i % 500 == 0:
+                print(f"   … {i:,}/{len(jobs):,}({time.time() - t0:.0f}s)")
+
+    for line in sorted(bad):
+        print(f"❌ {line}")
+    for line in sorted(errors):
+        print(f"⚠️  {line}")
+    if not a.dry_run:
+        written = store_quality(sorted(rows, key=lambda r: (r["symbol"], r["date"])))
+        print(f"💾 寫入 {len(written)} 個品質年檔")
+    print(f"\n{'=' * 60}\n掃描 {len(rows):,} 天 / 問題日 {len(bad):,} / 讀檔失敗 {len(errors):,}"
+          f"({time.time() - t0:.1f}s)")
+    return 1 if bad or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,6 +30,20 @@ Phase 3 `resample_to_kbars(同一份已清洗的 df)`。
     python -m tools.verify_rebuild --sample 40            # 先抽樣驗工具本身
     python -m tools.verify_rebuild --full --out r.json    # 全史
     python -m tools.verify_rebuild --from 2025-01-01 --to 2025-12-31
+    python -m tools.verify_rebuild --full --workers 6 --checkpoint D:/reports/vr.jsonl  # 夜跑
+
+## 平行與續跑(2026-10)
+
+以 (商品, 日) 為工作單位丟進 `ProcessPoolExecutor`(`--workers`);每個 worker 自己讀
+raw 與存檔,主程序只收結果。`--checkpoint` 是一份 **append-only JSONL**:每完成一組
+(商品, 日, TF) 就寫一行,記下當時 raw 與 kbar 檔的內容雜湊與 resampler recipe 雜湊
+(`core/lineage.py`)。重跑時,**兩邊雜湊與 recipe 都沒變、且上次結論是相同(或僅 float
+尾差)**的組合直接略過 ——
+全史對帳因此可以每晚跑:只有新進的日子與被改過的檔才真的重建。
+
+略過判斷先看 (size, mtime_ns);stat 變了才重算雜湊,雜湊沒變仍然略過
+(例:備份還原後 mtime 全變,但內容一位元都沒動)。不符、錯誤與 KNOWN_UNREBUILDABLE
+的組合**永遠重驗**,不會因為 checkpoint 而被藏起來。
 """
 import argparse
 import datetime as dt
@@ -38,6 +52,7 @@ import os
 import sys
 import time
 import traceback
+from concurrent.futures import as_completed
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -45,7 +60,10 @@ import polars as pl  # noqa: E402
 
 from config.lake_paths import (ARCHIVE_ROOT, CACHE_ROOT, kbar_paths,  # noqa: E402
                                list_tick_files, tick_path)
-from config.settings import TIMEFRAMES  # noqa: E402
+from config.settings import KBAR_ORDER_FLOW, TIMEFRAMES  # noqa: E402
+from core.compare import compare_frames  # noqa: E402
+from core.lineage import RESAMPLER_HASH, raw_fingerprint  # noqa: E402
+from core.pool import spawn_pool  # noqa: E402
 from core.resampler import resample_to_kbars  # noqa: E402
 
 # 本 repo 的慣例(同 validate_lake.py):在碼裡強制 utf-8,不靠 shell 繼承。
@@ -107,25 +125,19 @@ def _cmp(built, stored, rel_tol=DEFAULT_REL_TOL):
     cols = list(stored.columns)
     b = built.select(cols).sort("ts")
     s = stored.select(cols).sort("ts")
+    for c in cols:                      # dtype 不同的欄無法逐值比 → 先全檢
+        if b[c].dtype != s[c].dtype:
+            return f"欄 {c} dtype {b[c].dtype} vs {s[c].dtype}", False
+    # 逐欄比對在 polars 裡一次做完(core/compare.py);容忍只給 float 累加欄,同舊版
+    tol = {c: rel_tol for c in cols if c in ACCUM_COLS and s[c].dtype.is_float()}
+    res = compare_frames(b, s, cols, tol, floor=1.0)
     had_tolerated = False               # 有差、但落在累加欄的容忍內
     for c in cols:
-        bs, ss = b[c], s[c]
-        if bs.dtype != ss.dtype:
-            return f"欄 {c} dtype {bs.dtype} vs {ss.dtype}", False
-        try:
-            if bs.equals(ss):
-                continue
-        except Exception:
-            if bs.to_list() == ss.to_list():
-                continue
-        for i, (x, y) in enumerate(zip(bs.to_list(), ss.to_list())):
-            if x == y or (x is None and y is None):
-                continue
-            if (c in ACCUM_COLS and isinstance(x, float) and isinstance(y, float)
-                    and abs(x - y) <= rel_tol * max(abs(x), abs(y), 1.0)):
-                had_tolerated = True
-                continue
-            return f"欄 {c} 第 {i} 列 {x!r} vs {y!r}", False
+        r = res[c]
+        if not r["ok"]:
+            i = r["first_bad"]
+            return f"欄 {c} 第 {i} 列 {b[c][i]!r} vs {s[c][i]!r}", False
+        had_tolerated |= not r["exact"]
     return None, had_tolerated
 
 
@@ -142,7 +154,7 @@ def verify_day(symbol, day, tfs, rel_tol=DEFAULT_REL_TOL):
     for tf in tfs:
         stored_paths = kbar_paths(tf, symbol, day, day)
         try:
-            built = resample_to_kbars(ticks, tf)
+            built = resample_to_kbars(ticks, tf, order_flow=KBAR_ORDER_FLOW)
         except Exception as e:
             res[tf] = (f"重建拋例外:{type(e).__name__}: {e}", False)
             continue
@@ -155,6 +167,83 @@ def verify_day(symbol, day, tfs, rel_tol=DEFAULT_REL_TOL):
     return res, dt_read
 
 
+def _fingerprint(path, prev_stat=None, prev_hash=None):
+    """(stat, hash),stat = [size, mtime_ns](checkpoint 的格式)。檔不存在 → (None, None)。
+
+    雜湊與「stat 沒變就沿用上次雜湊」的規則就是 `lineage.raw_fingerprint` —— 這裡只轉格式。
+    """
+    if path is None or not os.path.exists(path):
+        return None, None
+    prev = ({"raw_size": prev_stat[0], "raw_mtime_ns": prev_stat[1], "raw_hash": prev_hash}
+            if prev_stat and prev_hash else None)
+    fp = raw_fingerprint(path, prev)
+    return [fp["raw_size"], fp["raw_mtime_ns"]], fp["raw_hash"]
+
+
+#: checkpoint 裡可以被略過的結論。不符/錯誤/已知不可重建永遠重驗。
+_SKIPPABLE = {"same", "tolerated"}
+
+
+def _load_checkpoint(path):
+    """{(symbol, date, tf): 最後一筆紀錄}。壞行(中斷時寫一半)略過。"""
+    out = {}
+    if not path or not os.path.exists(path):
+        return out
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                r = json.loads(line)
+                out[(r["symbol"], r["date"], r["tf"])] = r
+            except (ValueError, KeyError):
+                continue
+    return out
+
+
+def _can_skip(prev, raw_fp, kbar_fp):
+    # recipe 也要相同:resampler 改版後,上次的「相同」對新 recipe 不成立(core/lineage.py)
+    return (prev is not None and prev.get("status") in _SKIPPABLE
+            and prev.get("recipe") == RESAMPLER_HASH
+            and raw_fp[1] is not None and prev.get("raw_hash") == raw_fp[1]
+            and prev.get("kbar_hash") == kbar_fp[1])
+
+
+def _verify_job(symbol, day, tfs, rel_tol, prev):
+    """worker:一個 (商品, 日)。`prev` = 該日各 TF 的 checkpoint 紀錄(可缺)。
+
+    回傳 [{symbol, date, tf, status, why, raw_hash, kbar_hash, raw_stat, kbar_stat}];
+    status ∈ same / tolerated / mismatch;略過的組合沿用上次的 status 並帶 `skipped=True`。
+    """
+    raw = tick_path(symbol, day)
+    p0 = next(iter(prev.values()), {}) if prev else {}
+    raw_fp = _fingerprint(raw, p0.get("raw_stat"), p0.get("raw_hash"))
+    fps, todo = {}, []
+    for tf in tfs:
+        stored = kbar_paths(tf, symbol, day, day)
+        pr = prev.get(tf) or {}
+        fps[tf] = _fingerprint(stored[0] if stored else None,
+                               pr.get("kbar_stat"), pr.get("kbar_hash"))
+        if not _can_skip(prev.get(tf), raw_fp, fps[tf]):
+            todo.append(tf)
+
+    res = verify_day(symbol, day, todo, rel_tol)[0] if todo else {}
+    rows = []
+    for tf in tfs:
+        row = {"symbol": symbol, "date": day, "tf": tf, "recipe": RESAMPLER_HASH,
+               "raw_hash": raw_fp[1], "raw_stat": raw_fp[0],
+               "kbar_hash": fps[tf][1], "kbar_stat": fps[tf][0]}
+        if tf in res:
+            why, tol = res[tf]
+            row.update(status="mismatch" if why is not None else ("tolerated" if tol else "same"),
+                       why=why)
+        else:
+            pr = prev[tf]
+            # 內容沒變但 stat 變了(還原、touch)→ 記下新 stat,下次就不必再算雜湊
+            restat = pr.get("raw_stat") != raw_fp[0] or pr.get("kbar_stat") != fps[tf][0]
+            row.update(status=pr["status"], why=None, skipped=True, restat=restat)
+        rows.append(row)
+    return rows
+
+
 def self_test():
     """證明比較器**抓得到**不符 —— 沒有這一步,「全部通過」沒有意義。
 
@@ -216,13 +305,19 @@ def main():
                     help="累加型 float 欄的相對容忍(預設 1e-12)")
     ap.add_argument("--stop-after", type=int, default=0,
                     help="累積這麼多個不符就停(0=不停)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="平行 process 數(預設 1 = 與舊版相同的序列執行)")
+    ap.add_argument("--checkpoint", default=None,
+                    help="續跑用的 JSONL(append-only);雜湊未變且上次相同的組合略過")
     a = ap.parse_args()
 
     if a.self_test:
         return self_test()
 
-    if a.out:
-        outabs = os.path.abspath(a.out)
+    for out_path in (a.out, a.checkpoint):
+        if not out_path:
+            continue
+        outabs = os.path.abspath(out_path)
         for root in (ARCHIVE_ROOT, CACHE_ROOT):
             assert not outabs.lower().startswith(os.path.abspath(root).lower()), \
                 f"🔒 報告不可以寫進湖裡:{outabs}"
@@ -247,45 +342,93 @@ def main():
     total = sum(len(v) for v in plan.values())
     print(f"\n共 {total} 個 (商品,日) 組合 × {len(tfs)} 個 TF = {total * len(tfs)} 次比對\n")
 
+    ckpt = _load_checkpoint(a.checkpoint)
+    if a.checkpoint:
+        print(f"checkpoint:{a.checkpoint}(既有 {len(ckpt)} 筆紀錄)\n")
+    ckpt_fh = open(a.checkpoint, "a", encoding="utf-8") if a.checkpoint else None
+
     mismatches, errors, tolerated, known_hits = [], [], [], []
-    done = 0
+    done = skipped = 0
     t_start = time.time()
-    for sym, days in plan.items():
-        for day in days:
-            try:
-                res, _ = verify_day(sym, day, tfs, a.rel_tol)
-            except Exception as e:
-                errors.append({"symbol": sym, "date": day,
-                               "error": f"{type(e).__name__}: {e}",
-                               "trace": traceback.format_exc()[-500:]})
-                done += 1
+    jobs = [(sym, day) for sym, days in plan.items() for day in days]
+
+    def collect(sym, day, rows):
+        nonlocal skipped
+        known = (sym, day) in KNOWN_UNREBUILDABLE
+        for r in rows:
+            if r.pop("skipped", False):
+                skipped += 1
+                if ckpt_fh and r.pop("restat"):
+                    r["checked"] = dt.datetime.now().isoformat(timespec="seconds")
+                    ckpt_fh.write(json.dumps(r, ensure_ascii=False) + "\n")
                 continue
-            known = (sym, day) in KNOWN_UNREBUILDABLE
-            for tf, (why, tol) in res.items():
-                if why is not None:
-                    (known_hits if known else mismatches).append(
-                        {"symbol": sym, "date": day, "tf": tf, "why": why})
-                elif tol:
-                    tolerated.append({"symbol": sym, "date": day, "tf": tf})
-            done += 1
-            if done % 100 == 0 or done == total:
-                el = time.time() - t_start
-                rate = done / el if el else 0
-                eta = (total - done) / rate if rate else 0
-                print(f"  {done:>5}/{total}  不符 {len(mismatches):>4}  錯誤 {len(errors):>3}  "
-                      f"{el:6.0f}s  ETA {eta:5.0f}s", flush=True)
-            if a.stop_after and len(mismatches) >= a.stop_after:
-                print(f"\n⛔ 已累積 {len(mismatches)} 個不符,提前停止(--stop-after)")
-                break
+            if r["status"] == "mismatch":
+                (known_hits if known else mismatches).append(
+                    {"symbol": sym, "date": day, "tf": r["tf"], "why": r["why"]})
+                if known:
+                    r["status"] = "known"
+            elif r["status"] == "tolerated":
+                tolerated.append({"symbol": sym, "date": day, "tf": r["tf"]})
+            if ckpt_fh:
+                r["checked"] = dt.datetime.now().isoformat(timespec="seconds")
+                ckpt_fh.write(json.dumps(r, ensure_ascii=False) + "\n")
+        if ckpt_fh:
+            ckpt_fh.flush()
+
+    def progress():
+        if done % 100 == 0 or done == total:
+            el = time.time() - t_start
+            rate = done / el if el else 0
+            eta = (total - done) / rate if rate else 0
+            print(f"  {done:>5}/{total}  不符 {len(mismatches):>4}  錯誤 {len(errors):>3}  "
+                  f"略過 {skipped:>5}  {el:6.0f}s  ETA {eta:5.0f}s", flush=True)
+
+    def prev_of(sym, day):
+        return {tf: ckpt[(sym, day, tf)] for tf in tfs if (sym, day, tf) in ckpt}
+
+    def on_error(sym, day, e, trace):
+        errors.append({"symbol": sym, "date": day,
+                       "error": f"{type(e).__name__}: {e}", "trace": trace[-500:]})
+
+    try:
+        if a.workers <= 1:
+            for sym, day in jobs:
+                try:
+                    collect(sym, day, _verify_job(sym, day, tfs, a.rel_tol, prev_of(sym, day)))
+                except Exception as e:
+                    on_error(sym, day, e, traceback.format_exc())
+                done += 1
+                progress()
+                if a.stop_after and len(mismatches) >= a.stop_after:
+                    print(f"\n⛔ 已累積 {len(mismatches)} 個不符,提前停止(--stop-after)")
+                    break
         else:
-            continue
-        break
+            with spawn_pool(a.workers) as ex:
+                futs = {ex.submit(_verify_job, sym, day, tfs, a.rel_tol, prev_of(sym, day)):
+                        (sym, day) for sym, day in jobs}
+                for f in as_completed(futs):
+                    sym, day = futs[f]
+                    try:
+                        collect(sym, day, f.result())
+                    except Exception as e:
+                        on_error(sym, day, e, "".join(traceback.format_exception(e)))
+                    done += 1
+                    progress()
+                    if a.stop_after and len(mismatches) >= a.stop_after:
+                        print(f"\n⛔ 已累積 {len(mismatches)} 個不符,提前停止(--stop-after)")
+                        for pending in futs:
+                            pending.cancel()
+                        break
+    finally:
+        if ckpt_fh:
+            ckpt_fh.close()
 
     el = time.time() - t_start
     print(f"\n{'=' * 62}")
     print(f"比對 {done}/{total} 組合,耗時 {el:.0f}s")
     print(f"不符:{len(mismatches)}    錯誤:{len(errors)}    "
           f"僅 float 尾差(容忍內):{len(tolerated)}    "
+          f"checkpoint 略過:{skipped}    "
           f"已知不可重建:{len(known_hits)}")
     if known_hits:
         for sd in sorted({(k["symbol"], k["date"]) for k in known_hits}):
@@ -308,6 +451,7 @@ def main():
                        "elapsed_s": round(el, 1), "symbols": symbols, "tfs": tfs,
                        "mismatches": mismatches, "errors": errors,
                        "tolerated_float_only": tolerated, "rel_tol": a.rel_tol,
+                       "skipped_unchanged": skipped,
                        "known_unrebuildable_hits": known_hits,
                        "archive_root": ARCHIVE_ROOT, "cache_root": CACHE_ROOT,
                        "generated": dt.datetime.now().isoformat(timespec="seconds")},
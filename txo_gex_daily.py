@@ -14,9 +14,10 @@
 資料未公布時安靜跳過(仿 main_etl 幻影守衛精神)、不碰 Shioaji / .env。
 符號問題未實證:報告永遠並列「美股慣例」與「台灣證據版」兩條線。
 """
-import sys, io, csv, json, math, time, glob, argparse, urllib.request, urllib.parse
+import sys, io, csv, json, math, time, glob, hashlib, pickle, argparse, urllib.request, urllib.parse
 from datetime import date, datetime, timedelta
 from pathlib import Path
+from string import Template
 
 if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8")  # 排程/非TTY 下防 cp950
@@ -26,7 +27,8 @@ import polars as pl
 
 # 2026-08-17:本檔原本**繞過自家 config/settings** 自己寫死一份路徑 ——
 # 兩處分歧的話沒有任何東西會警告。改走 vendored 正典。
-from config.lake_paths import ARCHIVE_ROOT, CACHE_ROOT
+from config.lake_paths import ARCHIVE_ROOT, CACHE_ROOT, kbar_paths
+from core.summary_stats import STATS_WINDOW, with_stats
 
 DATA_ROOT = Path(ARCHIVE_ROOT)
 # kbars 屬 **cache**(可能在別的磁碟),不在 ARCHIVE_ROOT 底下。
@@ -134,52 +136,162 @@ def nth_wed(y, m, n):
     return nth_weekday(y, m, n, 2)
 
 
-_TRADING_DAYS = None
+# ── 交易日 / 到期索引(2026-10)──────────────────────────────────────
+# 為什麼要:原本 expiry_of 第一次被呼叫時,trading_days() 會把 TXF 1d **每個年檔**整個讀進來、
+#   篩日盤、組一個字串 set;之後每個代碼再做字串比較 + 最多 7 天的逐日走。排程每 3 分鐘
+#   一輪、每輪都是新程序 ⇒ 每輪都付一次全史讀取。
+# 做法:索引落地在 TXO_ROOT/cache/calendar/
+#   ‧ trading_days.npy  排序好的 datetime64[D](np.load mmap 開,不整個讀進記憶體)
+#   ‧ index.json        月選代碼 → 到期日(settlement_calendar.csv)+ 各來源檔的 (size, mtime_ns)
+#   增量:只重讀 stat 有變的年檔(平常只有當年那一檔);一年一檔 ⇒ 以年為單位整段替換。
+#   查詢:expiry_dates(codes) 一次處理整條鏈 —— 不重複的代碼各解析一次,順延用 searchsorted。
+# 月選以 settlement_calendar 為準(TXF 結算日 = TXO 月選到期日;期交所行事曆涵蓋春節與未來
+#   月份,而「第三個週三 + 湖的順延」在湖覆蓋範圍外無從判斷)。日曆沒有的月份與週選才走演算法。
+CAL_INDEX_DIR = TXO_ROOT / "cache" / "calendar"
+CAL_INDEX_VERSION = 1
+# 同 config.settings.SETTLEMENT_CALENDAR_PATH(本檔不 import settings —— 那會載 .env)
+SETTLEMENT_CALENDAR = DATA_ROOT / "adjustments" / "settlement_calendar.csv"
+_CAL = None
+
+
+def _stat_key(p):
+    st = p.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _day_dates(f):
+    """一個 TXF 1d 年檔 → 日盤日期(datetime64[D],不重複)。"""
+    c = (pl.read_parquet(f, columns=["date", "session"])
+         .filter(pl.col("session") == "Day")["date"])
+    if c.dtype == pl.Utf8:
+        c = c.str.to_date()
+    return np.unique(c.cast(pl.Date).to_numpy().astype("datetime64[D]"))
+
+
+def _refresh_calendar_index():
+    """比對來源檔 stat,有變才重建對應部分並原子落地;回傳 (交易日 mmap, 月選 {代碼: ISO})。"""
+    npy, mp = CAL_INDEX_DIR / "trading_days.npy", CAL_INDEX_DIR / "index.json"
+    meta = {}
+    if mp.exists() and npy.exists():
+        try:
+            meta = json.loads(mp.read_text(encoding="utf-8"))
+        except Exception:  # noqa: BLE001
+            meta = {}
+    if meta.get("v") != CAL_INDEX_VERSION:
+        meta = {}
+    src = dict(meta.get("years", {}))
+    d1 = CACHE_ROOT_P / "1d" / "TXF"
+    files = {f.stem[-4:]: f for f in d1.glob("TXF_1d_*.parquet")} if d1.exists() else {}
+    stale = sorted(y for y, f in files.items() if src.get(y) != _stat_key(f))
+    gone = sorted(y for y in src if y not in files)
+    cal_key = _stat_key(SETTLEMENT_CALENDAR) if SETTLEMENT_CALENDAR.exists() else None
+    monthly = meta.get("monthly", {})
+    if not (stale or gone or meta.get("calendar") != cal_key):
+        return np.load(npy, mmap_mode="r"), monthly
+
+    # ⚠ 先整個讀進來(不用 mmap)再覆寫:Windows 上被 mmap 住的檔不能 replace
+    days = np.load(npy) if (meta and npy.exists()) else np.array([], dtype="datetime64[D]")
+    if stale or gone:
+        yrs = days.astype("datetime64[Y]").astype(int) + 1970
+        parts = [days[~np.isin(yrs, [int(y) for y in stale + gone])]]
+        for y in stale:
+            try:
+                parts.append(_day_dates(files[y]))
+                src[y] = _stat_key(files[y])
+            except Exception as ex:  # noqa: BLE001  —— 不記 stat,下次再試
+                print(f"[CAL-INDEX] 讀 {files[y].name} 失敗:{ex!r}")
+                src.pop(y, None)
+        for y in gone:
+            src.pop(y, None)
+        days = np.unique(np.concatenate(parts).astype("datetime64[D]"))
+    if meta.get("calendar") != cal_key:
+        monthly = {}
+        if cal_key:
+            with SETTLEMENT_CALENDAR.open(encoding="utf-8", newline="") as f:
+                for r in csv.DictReader(f):
+                    if r.get("contract") and r.get("date"):
+                        monthly[r["contract"].strip()] = r["date"].strip()[:10]
+    CAL_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = npy.with_name(npy.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.save(f, days)
+    tmp.replace(npy)
+    _atomic_write_text(mp, json.dumps({"v": CAL_INDEX_VERSION, "years": src, "calendar": cal_key,
+                                       "monthly": monthly}, ensure_ascii=False))
+    return np.load(npy, mmap_mode="r"), monthly
+
+
+def calendar_index():
+    """交易日 / 到期索引(每個程序載入一次):{"days": datetime64[D] 陣列, "monthly": {代碼: ISO}}。"""
+    global _CAL
+    if _CAL is None:
+        days, monthly = _refresh_calendar_index()
+        _CAL = {"days": days, "monthly": monthly}
+    return _CAL
 
 
 def trading_days():
-    """湖裡的 TXF 日盤交易日集合(當台指交易日曆用)。"""
-    global _TRADING_DAYS
-    if _TRADING_DAYS is None:
-        s = set()
-        p = CACHE_ROOT_P / "1d" / "TXF"
-        if p.exists():
-            for f in sorted(p.glob("*.parquet")):
-                try:
-                    df = pl.read_parquet(f).filter(pl.col("session") == "Day")
-                    s |= {str(x) for x in df["date"].to_list()}
-                except Exception:  # noqa: BLE001
-                    pass
-        _TRADING_DAYS = s
-    return _TRADING_DAYS
+    """湖裡的 TXF 日盤交易日集合(ISO 字串;舊介面,新碼請直接用 calendar_index()["days"])。"""
+    return {str(x) for x in calendar_index()["days"]}
 
 
-def expiry_of(code):
-    """由到期碼推到期日(舊 CSV 沒有「契約到期日」欄時的 fallback)。
-    W_n=該月第 n 個星期三、F_n=第 n 個星期五、六碼=月選(第三個星期三)。
-    名目日若非交易日(假日),順延至下一個交易日。"""
-    code = code.strip().replace(" ", "")
+def _nominal_expiry(code):
+    """到期碼 → 名目到期日(未順延)。W_n=該月第 n 個星期三、F_n=第 n 個星期五、六碼=月選(第三個星期三)。"""
     try:
         if "W" in code:
             ym, n = code.split("W")
-            d = nth_weekday(int(ym[:4]), int(ym[4:6]), int(n), 2)
-        elif "F" in code:
+            return nth_weekday(int(ym[:4]), int(ym[4:6]), int(n), 2)
+        if "F" in code:
             ym, n = code.split("F")
-            d = nth_weekday(int(ym[:4]), int(ym[4:6]), int(n), 4)
-        elif len(code) == 6 and code.isdigit():
-            d = nth_weekday(int(code[:4]), int(code[4:6]), 3, 2)
-        else:
-            return None
+            return nth_weekday(int(ym[:4]), int(ym[4:6]), int(n), 4)
+        if len(code) == 6 and code.isdigit():
+            return nth_weekday(int(code[:4]), int(code[4:6]), 3, 2)
     except (ValueError, IndexError):
-        return None
-    td = trading_days()
-    # 假日順延:僅在湖的覆蓋範圍內才做(超出範圍的未來日期無從判斷,順延會把它推歪)
-    if td and min(td) <= str(d) <= max(td):
-        for _ in range(7):
-            if str(d) in td:
-                break
-            d += timedelta(days=1)
-    return d
+        pass
+    return None
+
+
+def expiry_dates(codes):
+    """整條鏈的到期碼 → datetime64[D] 陣列(解析不了 → NaT),與 codes 同序。
+
+    月選先查 settlement_calendar;其餘取名目日,名目日若非交易日(假日)順延至下一個交易日。
+    順延只在湖的覆蓋範圍內做(超出範圍的未來日期無從判斷,順延會把它推歪);
+    7 天內找不到交易日時落在名目日 +7(同舊版逐日走 7 次的結果)。
+    """
+    codes = np.asarray([str(c).strip().replace(" ", "") for c in codes])
+    if not codes.size:
+        return np.array([], dtype="datetime64[D]")
+    uniq, inv = np.unique(codes, return_inverse=True)
+    cal = calendar_index()
+    nom = np.full(len(uniq), np.datetime64("NaT"), dtype="datetime64[D]")
+    fixed = np.zeros(len(uniq), dtype=bool)
+    for i, c in enumerate(uniq):
+        if c in cal["monthly"] and len(c) == 6 and c.isdigit():
+            nom[i], fixed[i] = np.datetime64(cal["monthly"][c], "D"), True
+        else:
+            d = _nominal_expiry(c)
+            if d is not None:
+                nom[i] = np.datetime64(d, "D")
+    td = cal["days"]
+    if len(td):
+        roll = ~fixed & ~np.isnat(nom) & (nom >= td[0]) & (nom <= td[-1])
+        if roll.any():
+            n = nom[roll]
+            nxt = np.asarray(td[np.searchsorted(td, n)])       # n ≤ td[-1] ⇒ 索引不越界
+            nom[roll] = np.where(nxt - n <= np.timedelta64(6, "D"), nxt, n + np.timedelta64(7, "D"))
+    return nom[inv]
+
+
+def expiry_map(codes):
+    """{原始代碼: date | None} —— build_series 對整條鏈查一次。"""
+    codes = list(dict.fromkeys(codes))
+    out = expiry_dates(codes)
+    return {c: (None if np.isnat(e) else e.astype(object)) for c, e in zip(codes, out)}
+
+
+def expiry_of(code):
+    """由到期碼推到期日(舊 CSV 沒有「契約到期日」欄時的 fallback)。單一代碼版的 expiry_map。"""
+    return expiry_map([code])[code]
 
 
 def npdf(x):
@@ -217,6 +329,47 @@ def gamma_of(F, K, T, iv):
     return npdf(d1) / (F * sq)
 
 
+# ── 逐到期微笑(2026-10)──────────────────────────────────────────────
+# iv ≈ c0 + c1·k + c2·k²,k = ln(K/F)(log-moneyness)。用途兩個:
+#   ① build_series:IV 反推失敗的序列用**同到期的微笑**在該 k 補值(原本補整個到期的中位數,
+#      深價外的 put 因此拿到價平的 IV,skew 被抹平)
+#   ② gex_surface 的 sticky-moneyness 模式:現價移動時 IV 沿微笑重新標價
+# 外插一律**平的**(k 夾在擬合範圍內)—— 二次式往外會爆。
+SMILE_MIN_PTS = 5                # 少於這麼多個已解 IV 的到期不擬合(退回中位數 / 平微笑)
+
+
+def fit_smiles(k, iv, exp_idx, n_exp, ok=None):
+    """逐到期最小平方擬合二次微笑。全部是 numpy 陣列(長度 = 序列數)。
+
+    `ok`:參與擬合的遮罩(預設全部)。回 (coef[E, 3], klo[E], khi[E], fitted[E]);
+    點數不足的到期 coef = (中位數, 0, 0)、fitted=False —— 即平微笑。
+    """
+    ok = np.ones(len(k), dtype=bool) if ok is None else ok
+    coef = np.zeros((n_exp, 3))
+    klo, khi = np.zeros(n_exp), np.zeros(n_exp)
+    fitted = np.zeros(n_exp, dtype=bool)
+    for e in range(n_exp):
+        m = ok & (exp_idx == e)
+        if not m.any():
+            coef[e, 0] = 0.2
+            continue
+        ke, ve = k[m], iv[m]
+        klo[e], khi[e] = ke.min(), ke.max()
+        coef[e, 0] = np.median(ve)
+        if m.sum() >= SMILE_MIN_PTS and khi[e] > klo[e]:
+            X = np.stack([np.ones_like(ke), ke, ke * ke], axis=1)
+            coef[e] = np.linalg.lstsq(X, ve, rcond=None)[0]
+            fitted[e] = True
+    return coef, klo, khi, fitted
+
+
+def smile_iv(k, exp_idx, coef, klo, khi):
+    """在 log-moneyness `k` 上取微笑 IV(k 可比 exp_idx 多前導維度;外插為平)。"""
+    kc = np.clip(k, klo[exp_idx], khi[exp_idx])
+    c = coef[exp_idx]
+    return c[..., 0] + c[..., 1] * kc + c[..., 2] * kc * kc
+
+
 # ---------------- 主流程 ----------------
 
 def num(s):
@@ -321,8 +474,9 @@ def build_series(d):
     if not spot:                       # 湖裡沒有現貨 → 退回舊行為並在報告標示
         spot, spot_src = fut_front, "TXF近月(現貨缺,降級)"
     fut_pts = []
+    fexp = expiry_map([code for code, _ in futs])
     for code, px in futs:
-        e = expiry_of(code)
+        e = fexp[code]
         if e and (e - d).days > 0:
             fut_pts.append(((e - d).days / 365.0, px))
     fwd = build_forward_curve(spot, fut_pts)
@@ -332,6 +486,8 @@ def build_series(d):
     ost, ooi = col(hdr_o, "結算價"), col(hdr_o, "未沖銷")
     osess, odue = col(hdr_o, "交易時段"), col(hdr_o, "契約到期日")
     series = []
+    # 官方到期日欄壞掉時的 fallback:整條鏈的到期碼一次查完(不重複的才解析)
+    oexp = expiry_map(r[oe] for r in rows_o if r[oc].strip() == "TXO")
     for r in rows_o:
         if r[oc].strip() != "TXO" or "一般" not in r[osess]:
             continue
@@ -342,7 +498,7 @@ def build_series(d):
             if len(due) == 8 and due.isdigit():
                 exp = date(int(due[:4]), int(due[4:6]), int(due[6:8]))
         if exp is None:
-            exp = expiry_of(r[oe])
+            exp = oexp[r[oe]]
         if exp is None:
             continue
         Td = (exp - d).days
@@ -370,27 +526,127 @@ def build_series(d):
         # 現貨若有誤差,ratio 的分子分母同時受影響會抵銷,不會汙染 flip 位置。
         s["ratio"] = F / fut_front
         s["carry"] = math.log(F / spot) / s["T"] if s["T"] > 0 else 0.0
-    # IV:用該到期的遠期價反推(逐 strike,天然含 skew);失敗用該到期中位數補
+    # IV:用該到期的遠期價反推(逐 strike,天然含 skew);失敗者以同到期的微笑在該 k 補值,
+    # 到期已解點數不足(擬合不了)才退回該到期中位數(2026-10 前一律中位數)
     by_exp = {}
     for s in series:
         s["iv"] = iv_solve(s["fwd"], s["K"], s["T"], s["settle"], s["cp"])
         if s["iv"]:
             by_exp.setdefault(s["exp_code"], []).append(s["iv"])
     med = {e: sorted(v)[len(v) // 2] for e, v in by_exp.items() if v}
-    n_fb = 0
-    for s in series:
+    codes = sorted({s["exp_code"] for s in series})
+    eidx = np.array([codes.index(s["exp_code"]) for s in series])
+    kk = np.array([math.log(s["K"] / s["fwd"]) for s in series])
+    solved = np.array([bool(s["iv"]) for s in series])
+    coef, klo, khi, fitted = fit_smiles(kk, np.array([s["iv"] or 0.0 for s in series]),
+                                        eidx, len(codes), solved)
+    fill = smile_iv(kk, eidx, coef, klo, khi)
+    n_fb = n_smile = 0
+    for i, s in enumerate(series):
         if not s["iv"]:
-            s["iv"] = med.get(s["exp_code"], 0.2)
             n_fb += 1
+            if fitted[eidx[i]] and 0.01 <= fill[i] <= 3.0:
+                s["iv"] = float(fill[i])
+                n_smile += 1
+            else:
+                s["iv"] = med.get(s["exp_code"], 0.2)
     return series, {"S": spot, "spot": spot, "spot_src": spot_src, "fut_front": fut_front,
-                    "basis": fut_front - spot, "n_iv_fallback": n_fb, "n_series": len(series),
+                    "basis": fut_front - spot, "n_iv_fallback": n_fb, "n_iv_smile": n_smile,
+                    "n_series": len(series),
                     "n_parity": n_par, "n_expiry_parity": len(par)}
 
 
-def compute_gex(series, S, beta=1.0):
+# ── 曝險曲面(2026-10)────────────────────────────────────────────────
+# 為什麼要:compute_gex 原本在純 Python 迴圈裡逐價位 × 逐序列算 profile,β 掃描寫死四個值、
+# IV 永遠不動。想看「vol 衝擊下 flip 怎麼搬」就得把 compute_gex 叫幾十次。
+# gex_surface 用 numpy 一次算完 (IV 平移 × β × 現價格點);compute_gex 的 profile、β 掃描
+# 與報告的 vol 衝擊面板全部取自**同一個**曲面。數學與原 legs() 逐項相同。
+BETA_SCAN = (0.5, 1.0, 1.5, 2.0)
+VOL_SHOCKS = (-0.05, -0.025, 0.0, 0.025, 0.05)   # IV 平行平移(小數;0.05 = +5 vol 點)
+_IV_FLOOR = 0.01                                 # 平移後下限 1 vol 點(負 IV 沒有意義)
+#: 現價沿格點移動時 IV 怎麼跟(gex_surface 的 vol_mode):
+#:   sticky_strike     每個序列的 IV 固定(2026-10 前的唯一行為;預設,與歷史報告可比)
+#:   sticky_moneyness  IV 沿該到期的微笑、以新的 k = ln(K/F) 重新標價;各序列相對微笑的殘差保留
+#:                     ⇒ 在目前現價處兩種模式逐值相同,只有離開現價後才分歧
+VOL_MODES = ("sticky_strike", "sticky_moneyness")
+
+
+def series_arrays(series):
+    """series(每筆一個 dict)→ numpy 欄陣列 {K, T, iv, oi, sgn, ratio, exp, n_exp}。"""
+    codes = sorted({s["exp_code"] for s in series})
+    return {"K": np.array([s["K"] for s in series], dtype=float),
+            "exp": np.array([codes.index(s["exp_code"]) for s in series], dtype=int),
+            "n_exp": len(codes),
+            "T": np.array([s["T"] for s in series], dtype=float),
+            "iv": np.array([s["iv"] for s in series], dtype=float),
+            "oi": np.array([s["oi"] for s in series], dtype=float),
+            "sgn": np.array([1.0 if s["cp"] == "C" else -1.0 for s in series]),
+            # 同 legs():座標=近月期貨價;各到期遠期依 parity 比例縮放
+            "ratio": np.array([s.get("ratio", math.exp(s.get("carry", 0.0) * s["T"]))
+                               for s in series], dtype=float)}
+
+
+def _zero_cross(xs, vals):
+    """沿 xs 的第一個變號點(線性內插、取整);沒有 → None。"""
+    for pa, pb, va, vb in zip(xs, xs[1:], vals, vals[1:]):
+        if (va < 0 <= vb) or (va > 0 >= vb):
+            return round(pa + (pb - pa) * (0 - va) / (vb - va))
+    return None
+
+
+def gex_surface(series, spots, betas=BETA_SCAN, iv_shifts=(0.0,), vol_mode="sticky_strike",
+                ref_spot=None):
+    """(IV 平移 × β × 現價)曝險曲面,一次向量化求值。
+
+    `series` 可為 series list 或 `series_arrays` 的結果;`spots` 為 TXF 座標的價位格點。
+    `vol_mode` 見 VOL_MODES;sticky_moneyness 需要 `ref_spot`(微笑擬合時的現價 = compute_gex 的 S)。
+    回 dict(numpy 陣列;v = IV 平移、b = β、s = 現價):
+      spot / beta / iv_shift  三軸
+      gex_us [v, s]   Σ sgn·Γ(億/1%,美股慣例)      gex_tw [v, s]  Σ Γ(毛 gamma)
+      vanna  [v, s]   Σ sgn·vanna 腿的「每單位 β」值
+      gp_us  [v, b, s] = gex_us − β·vanna(GEX+)
+      flip_us [v] / flip_gp [v][b]   沿現價軸的零交叉(list;無 → None)
+    """
+    a = series if isinstance(series, dict) else series_arrays(series)
+    xs = [float(x) for x in spots]
+    px = np.asarray(xs)[None, :, None]                                   # [1, s, 1]
+    iv0 = a["iv"][None, None, :]
+    if vol_mode == "sticky_moneyness":
+        k0 = np.log(a["K"] / (float(ref_spot) * a["ratio"]))
+        coef, klo, khi, _ = fit_smiles(k0, a["iv"], a["exp"], a["n_exp"])
+        # 新 k 的微笑值 − 原 k 的微笑值 = 現價移動帶來的 IV 變化;殘差(序列相對微笑)原樣保留
+        kn = np.log(a["K"] / (np.asarray(xs)[:, None] * a["ratio"]))            # [s, n]
+        iv0 = iv0 + (smile_iv(kn, a["exp"], coef, klo, khi)
+                     - smile_iv(k0, a["exp"], coef, klo, khi))[None, :, :]          # [1, s, n]
+    elif vol_mode != "sticky_strike":
+        raise ValueError(f"未知的 vol_mode {vol_mode!r};可用 {VOL_MODES}")
+    # 平移後下限 _IV_FLOOR;原值已低於下限者(解出來就很低)不動 —— 平移 0 必須逐值等於原 IV
+    iv = np.maximum(iv0 + np.asarray(iv_shifts, dtype=float)[:, None, None],
+                    np.minimum(iv0, _IV_FLOOR))                           # [v, 1 或 s, n]
+    T, K, w = a["T"], a["K"], a["oi"] * MULT
+    F = px * a["ratio"]                                                  # [1, s, n]
+    sq = iv * np.sqrt(T)
+    d1 = (np.log(F / K) + 0.5 * iv * iv * T) / sq
+    d2 = d1 - sq
+    pdf = np.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi)
+    g = pdf / (F * sq) * w * F * F * 0.01 / 1e8                          # 億/1%
+    vn1 = (-pdf * d2 / iv / 100.0) * w * F / 1e8                         # vanna 腿 / 每單位 β
+    gex_us = (g * a["sgn"]).sum(axis=-1)
+    gex_tw = g.sum(axis=-1)
+    vanna = (vn1 * a["sgn"]).sum(axis=-1)
+    b = np.asarray(betas, dtype=float)
+    gp_us = gex_us[:, None, :] - b[None, :, None] * vanna[:, None, :]
+    return {"spot": np.asarray(xs), "beta": b, "iv_shift": np.asarray(iv_shifts, dtype=float),
+            "gex_us": gex_us, "gex_tw": gex_tw, "vanna": vanna, "gp_us": gp_us,
+            "flip_us": [_zero_cross(xs, row.tolist()) for row in gex_us],
+            "flip_gp": [[_zero_cross(xs, row.tolist()) for row in rows] for rows in gp_us]}
+
+
+def compute_gex(series, S, beta=1.0, vol_mode="sticky_strike"):
     """GEX(億/1%)、VEX(百萬/vol點)、GEX+(億/1%,含 vanna×spot-vol β 修正)。
     GEX+ 假設:現貨 +1% 時 IV 下跌 beta 個 vol 點(台指典型負相關),
-    dealer 每 1% 的避險量 = gamma 腿 + vanna 腿 —— 即羊叔面板的 GEX+ 曲線。"""
+    dealer 每 1% 的避險量 = gamma 腿 + vanna 腿 —— 即羊叔面板的 GEX+ 曲線。
+    `vol_mode` 只影響沿現價格點的曲線(profile / flip / β 與 vol 掃描);現價處的逐履約價值不變。"""
     def legs(px, s):
         # 座標=近月期貨價 px;各到期遠期依 parity 求得的比例同步縮放
         F = px * s.get("ratio", math.exp(s.get("carry", 0.0) * s["T"]))
@@ -421,27 +677,17 @@ def compute_gex(series, S, beta=1.0):
         vex_vn[s["K"]] = vex_vn.get(s["K"], 0.0) - sgn * (
             -npdf(d1_) * d2_ / s["iv"] / 100.0) * s["oi"] * MULT * F_ / 1e8
         gp_us[s["K"]] = gp_us.get(s["K"], 0.0) + sgn * (g + vn)
+    # profile / β 掃描 / vol 衝擊:同一個曲面(見 gex_surface)
     lo_s, hi_s = int(S * 0.94), int(S * 1.06)
-    prof, vanna_leg = [], []
-    for Sh in range(lo_s, hi_s, 50):
-        tu = tw = tp = tv1 = 0.0
-        for s in series:
-            g, v, vn, d1u, d2u, Fu = legs(float(Sh), s)
-            sgn = 1.0 if s["cp"] == "C" else -1.0
-            tu += sgn * g
-            tw += g
-            tp += sgn * (g + vn)
-            # vanna 腿的「每單位 β」值 → 供 β 敏感度掃描(vn 已含 −beta,故除回來)
-            tv1 += sgn * (-npdf(d1u) * d2u / s["iv"] / 100.0) * s["oi"] * MULT * Fu / 1e8
-        prof.append((Sh, tu, tw, tp))
-        vanna_leg.append(tv1)
+    grid = list(range(lo_s, hi_s, 50))
+    betas = (beta,) + tuple(bb for bb in BETA_SCAN if bb != beta)
+    surf = gex_surface(series, grid, betas, VOL_SHOCKS, vol_mode=vol_mode, ref_spot=S)
+    v0 = VOL_SHOCKS.index(0.0)
+    prof = list(zip(grid, surf["gex_us"][v0].tolist(), surf["gex_tw"][v0].tolist(),
+                    surf["gp_us"][v0, 0].tolist()))
 
     def zero_cross(idx):
-        for pa, pb in zip(prof, prof[1:]):
-            ua, ub = pa[idx], pb[idx]
-            if (ua < 0 <= ub) or (ua > 0 >= ub):
-                return round(pa[0] + (pb[0] - pa[0]) * (0 - ua) / (ub - ua))
-        return None
+        return _zero_cross([p[0] for p in prof], [p[idx] for p in prof])
 
     # 毛 gamma 峰值:符號無關的主讀值。
     #   gamma 對 Call 與 Put 皆為正 → prof 的第 2 欄(原標「台灣證據版」)Σg 恆正,
@@ -453,19 +699,19 @@ def compute_gex(series, S, beta=1.0):
     # ── β 敏感度:GEX+ Flip 隨 β 的移動範圍 ────────────────────────────
     # 外部專業者(gooptions.cc 2026-07-11)自承 β 是 GEX+ 最弱的假設,但固定 β=1.0。
     # 我們把它掃開:若 flip 隨 β 大幅移動,今天的 GEX+ 讀數就是被假設決定的,不該讀。
-    def _cross(vals):
-        for (pa, va), (pb, vb) in zip(zip([p[0] for p in prof], vals),
-                                      zip([p[0] for p in prof][1:], vals[1:])):
-            if (va < 0 <= vb) or (va > 0 >= vb):
-                return round(pa + (pb - pa) * (0 - va) / (vb - va))
-        return None
-
-    beta_scan = {}
-    for bb in (0.5, 1.0, 1.5, 2.0):
-        beta_scan[bb] = _cross([p[1] + vl * (-bb) for p, vl in zip(prof, vanna_leg)])
+    beta_scan = {bb: surf["flip_gp"][v0][betas.index(bb)] for bb in BETA_SCAN}
     _bv = [v for v in beta_scan.values() if v]
     beta_span = (max(_bv) - min(_bv)) if len(_bv) >= 2 else None
 
+    # ── vol 衝擊:IV 整條平移時 flip 與現價處的場強怎麼動 ───────────────
+    #   β 掃描問「vanna 的假設可不可信」;這裡問「IV 一變,地圖還在不在原地」。
+    vol_shock = []
+    for i, sh in enumerate(VOL_SHOCKS):
+        vol_shock.append({"shift": sh, "flip_us": surf["flip_us"][i],
+                          "flip_gp": surf["flip_gp"][i][0],
+                          "tot_us": float(np.interp(S, grid, surf["gex_us"][i])) if grid else None,
+                          "gross": float(np.interp(S, grid, surf["gex_tw"][i])) if grid else None})
+
     # ── VEX 最深履約價(vanna 去穩定最集中處)────────────────────────
     vex_deep = min(vex_vn.items(), key=lambda kv: kv[1]) if vex_vn else (None, 0.0)
 
@@ -536,7 +782,7 @@ def compute_gex(series, S, beta=1.0):
             "gp_us": gp_us, "vex_sh": vex_sh, "tot_vex_sh": sum(vex_sh.values()),
             "vex_vn": vex_vn, "tot_vex_vn": sum(vex_vn.values()),
             "gross_peak": gross_peak, "gross_tot": gross_tot,
-            "beta_scan": beta_scan, "beta_span": beta_span,
+            "beta_scan": beta_scan, "beta_span": beta_span, "vol_shock": vol_shock,
             "vex_deep_k": vex_deep[0], "vex_deep_v": vex_deep[1],
             "term": ts_rows, "front_iv": front_iv, "day_move": day_move,
             "conc": conc, "settle": settle, "settles": settles,
@@ -546,11 +792,61 @@ def compute_gex(series, S, beta=1.0):
                             max((x.get("ratio", 1.0) for x in series), default=1.0)),
             "tot_us": sum(gex_us.values()), "tot_tw": sum(gex_tw.values()),
             "tot_vex_us": sum(vex_us.values()), "tot_vex_tw": sum(vex_tw.values()),
-            "tot_gp_us": sum(gp_us.values()), "beta": beta,
+            "tot_gp_us": sum(gp_us.values()), "beta": beta, "vol_mode": vol_mode,
             "top_pos": sorted(gex_us.items(), key=lambda kv: -kv[1])[:5],
             "top_neg": sorted(gex_us.items(), key=lambda kv: kv[1])[:5]}
 
 
+# ── compute_gex 結果快取(2026-10)──────────────────────────────────────
+# 為什麼要:`--report-only` 重出一年的報告(例如只改了 render_html 的版面)原本每天都要把
+# compute_gex 整套數值重跑一次(逐序列 × 全價格格點)。結果只取決於三件事:
+#   ① 那天的 quotes 檔內容  ② beta  ③ 模型本身
+# ⇒ 以 (quotes 檔雜湊, beta, S, vol_mode, GEX_MODEL_VERSION) 為鍵 pickle 到 TXO_ROOT/cache/。
+# ⚠️ **改了 compute_gex(或它用到的 legs / 期限結構 / 結算區間)的數學就把版本 +1**,
+#    否則會讀到舊模型的結果。快取是衍生品,整個 cache/ 刪掉也只是下次慢一點。
+#    版本也寫進報告 / 儀表板 JSON 的檔頭標記 ⇒ +1 後 `--render-only` 會把舊模型的輸出全部重出。
+GEX_MODEL_VERSION = "2026-10.3"
+
+
+def _gex_cache_key(qpath, S, beta, vol_mode):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(Path(qpath).read_bytes())
+    h.update(f"|beta={beta!r}|S={float(S)!r}|vol={vol_mode}|model={GEX_MODEL_VERSION}".encode())
+    return h.hexdigest()
+
+
+def cached_gex(d, qpath, series, S, beta=1.0, vol_mode="sticky_strike"):
+    """compute_gex 的快取版。回 (gex, hit)。快取讀寫出錯一律當 miss —— 絕不擋報告。"""
+    cdir = TXO_ROOT / "cache"
+    try:
+        key = _gex_cache_key(qpath, S, beta, vol_mode)
+    except OSError:
+        return compute_gex(series, S, beta, vol_mode), False
+    ds = d.strftime('%Y%m%d')
+    p = cdir / f"gex_{ds}_{vol_mode}_{key}.pkl"    # 檔名帶 vol_mode:換模式重算不會清掉另一個模式的鍵
+    if p.exists():
+        try:
+            with p.open("rb") as f:
+                return pickle.load(f), True
+        except Exception as ex:  # noqa: BLE001
+            print(f"[GEX-CACHE] {p.name} 讀取失敗({ex!r}),重算")
+    gex = compute_gex(series, S, beta, vol_mode)
+    try:
+        cdir.mkdir(parents=True, exist_ok=True)
+        for old in cdir.glob(f"gex_{ds}_*.pkl"):   # 同日同模式的舊鍵(quotes 重建 / 改版)
+            rest = old.stem[len(f"gex_{ds}_"):]
+            # 2026-10 前的檔名沒有模式(gex_<日>_<鍵>)—— 新檔名下永遠讀不到,一併清掉
+            if "_" not in rest or rest.rsplit("_", 1)[0] == vol_mode:
+                old.unlink()
+        tmp = p.with_name(p.name + ".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump(gex, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(p)
+    except Exception as ex:  # noqa: BLE001
+        print(f"[GEX-CACHE] 寫入失敗(不影響報告):{ex!r}")
+    return gex, False
+
+
 # ---------------- 落地 ----------------
 
 def store_quotes(d, series, force=False):
@@ -706,23 +1002,98 @@ def store_summary(d, meta, gex):
     if p.exists():
         df = pl.concat([pl.read_parquet(p), df], how="diagonal").unique(
             subset=["date"], keep="last").sort("date")
-    df.write_parquet(p)
+    # 滾動百分位 / z / 體制欄整張重算一起寫回(core/summary_stats;幾百列,毫秒級)
+    with_stats(df).write_parquet(p)
     return row
 
 
-def percentiles(d, gex, lookback=60):
-    """今日場強在近 N 日的百分位(B2)——沒有歷史座標,厚薄兩字沒有意義。"""
-    p = TXO_ROOT / "daily_summary.parquet"
-    if not p.exists():
+# ── 逐履約價歷史面板(2026-10)─────────────────────────────────────────
+# 為什麼要:summary 一天一列、quotes 一天一檔。「23000 的 GEX 近 60 天怎麼變」這種
+# 逐履約價的問題原本得把 60 天的鏈各讀一次、各跑一次 compute_gex。
+# 面板 = 一個 (date, K) 一列、一年一檔,存的是 compute_gex **已經算好**的逐履約價值,
+# 多月熱圖只讀一個檔。run_one 每天 upsert 當天(同 store_institutional 的年檔慣例);
+# 歷史回補 = `--backfill 起 迄 --report-only`(從已存 quotes 重算,不打 TAIFEX)。
+PANEL_COLS = {"gex_us": "strikes_us", "gex_tw": "strikes_tw", "vex_us": "vex_us",
+              "vex_tw": "vex_tw", "vanna": "vex_vn", "gp_us": "gp_us"}
+
+
+def panel_path(year):
+    return TXO_ROOT / "panel" / f"gex_panel_{year}.parquet"
+
+
+def store_panel(d, series, gex):
+    """當天的逐履約價 GEX/VEX/vanna(+ 買賣權 OI)→ 年檔面板(同日重跑覆蓋)。"""
+    oi = {}
+    for s in series:
+        o = oi.setdefault(s["K"], [0, 0])
+        o[0 if s["cp"] == "C" else 1] += s["oi"]
+    ks = sorted(gex["strikes_us"])
+    rows = {"date": [str(d)] * len(ks), "K": [float(k) for k in ks]}
+    for col, key in PANEL_COLS.items():
+        rows[col] = [gex[key].get(k) for k in ks]
+    rows["oi_call"] = [oi.get(k, (0, 0))[0] for k in ks]
+    rows["oi_put"] = [oi.get(k, (0, 0))[1] for k in ks]
+    df = pl.DataFrame(rows, schema={"date": pl.Utf8, "K": pl.Float64,
+                                    **{c: pl.Float64 for c in PANEL_COLS},
+                                    "oi_call": pl.Int64, "oi_put": pl.Int64})
+    p = panel_path(d.year)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    if p.exists():
+        df = pl.concat([pl.read_parquet(p).filter(pl.col("date") != str(d)), df],
+                       how="diagonal")
+    tmp = p.with_name(p.name + ".tmp")
+    df.sort(["date", "K"]).write_parquet(tmp)
+    tmp.replace(p)
+    return p
+
+
+def panel_scan(start, end):
+    """[start, end] 的面板(長表,lazy)。跨年自動串多個年檔;沒有任何年檔 → None。"""
+    files = [panel_path(y) for y in range(start.year, end.year + 1)]
+    files = [str(f) for f in files if f.exists()]
+    if not files:
+        return None
+    return pl.scan_parquet(files).filter(
+        pl.col("date").is_between(pl.lit(str(start)), pl.lit(str(end))))
+
+
+def panel_matrix(start, end, field="gex_us", strikes=None):
+    """履約價 × 日期 矩陣(lazy):一列一個 K、一欄一天(欄名 = 日期字串),缺值 null。
+
+    只先 collect 日期清單(一欄);矩陣本身留給呼叫端 collect —— 要 filter / 只取幾欄都還來得及。
+    `strikes`:(lo, hi) 履約價範圍。
+    """
+    lf = panel_scan(start, end)
+    if lf is None:
+        return None
+    if strikes:
+        lf = lf.filter(pl.col("K").is_between(*strikes))
+    days = lf.select(pl.col("date").unique().sort()).collect()["date"].to_list()
+    return (lf.group_by("K")
+            .agg([pl.col(field).filter(pl.col("date") == dd).first().alias(dd) for dd in days])
+            .sort("K"))
+
+
+def percentiles(d, summary=None):
+    """今日場強在近 STATS_WINDOW 日的百分位(B2)——沒有歷史座標,厚薄兩字沒有意義。
+    讀 daily_summary 裡 store_summary 預先算好的 pct_* 欄;舊檔沒有就當場補算(不寫回)。
+    summary 給了就用它(批次重出報告時共用一份)。"""
+    if summary is None:
+        p = TXO_ROOT / "daily_summary.parquet"
+        if not p.exists():
+            return {}
+        summary = pl.read_parquet(p)
+    if "pct_tot_us" not in summary.columns:
+        summary = with_stats(summary)
+    upto = summary.filter(pl.col("date") <= str(d))
+    row = upto.filter(pl.col("date") == str(d))
+    if not row.height:
         return {}
-    df = pl.read_parquet(p).filter(pl.col("date") <= str(d)).sort("date").tail(lookback)
-    out = {"n": df.height}
+    row = row.row(0, named=True)
+    out = {"n": min(upto.height, STATS_WINDOW)}
     for key, col in (("us", "tot_us"), ("tw", "tot_tw"), ("vex", "tot_vex_us")):
-        vals = [v for v in df[col].to_list() if v is not None]
-        if len(vals) >= 5:
-            cur = gex["tot_us"] if key == "us" else (
-                gex["tot_tw"] if key == "tw" else gex["tot_vex_us"])
-            out[key] = round(sum(1 for v in vals if v <= cur) / len(vals) * 100)
+        if row.get(f"pct_{col}") is not None:
+            out[key] = round(row[f"pct_{col}"])
     return out
 
 
@@ -747,28 +1118,69 @@ def atr_txf(d, n=14):
     return sum(trs) / len(trs) if trs else None
 
 
-def map_window_bars(m_date, eval_date):
-    """地圖(m_date 收盤產出)的正確適用視窗 = m_date 夜盤 + eval_date 日盤。
-    ⚠ 湖的夜盤以「起始日」標記(date=7/23 Night 的 ts 是 7/23 15:00 → 7/24 04:55),
-    所以視窗要跨兩個 date 標籤取,不能用單一 date 的 Day+Night(那會漏掉前一晚、多算後一晚)。"""
-    def rows(dt, sess):
-        p = CACHE_ROOT_P / "1d" / "TXF" / f"TXF_1d_{dt.year}.parquet"
-        if not p.exists():
-            return None
-        try:
-            df = pl.read_parquet(p).filter(
-                (pl.col("date").cast(pl.Utf8) == str(dt)) & (pl.col("session") == sess))
-        except Exception:  # noqa: BLE001
-            return None
-        return df.to_dicts()[0] if df.height else None
-
-    night, day = rows(m_date, "Night"), rows(eval_date, "Day")
-    if not day:
+# ── 對賬:一個 polars 查詢(2026-10)──────────────────────────────────
+# 原本 reconcile(d) 一次只對一張地圖:讀整個 summary、把 TXF 1d 年檔讀兩次
+# (夜盤一次、日盤一次)、再整檔重寫 reconcile.parquet。改了任何一個對賬指標就得逐日重播。
+# 現在地圖 → 視窗 → 指標全部是同一個 lazy 查詢(_recon_frame):
+#   ‧ reconcile(d)      live:summary 裡 d 之前最後一列 × 兩個年檔,upsert 一列(行為同舊版)
+#   ‧ reconcile_all()   全史:每張地圖配「summary 的下一個日期」當適用日(= live 當天跑 run_one
+#                       時會配到的那天),整張 reconcile.parquet 一次重生
+# 視窗(_recon_frame):地圖(map_date 收盤產出)的適用視窗 = map_date 夜盤 + eval_date 日盤;
+#   沒有日盤 → 不對賬,沒有夜盤 → 只用日盤。
+#   ⚠ 湖的夜盤以「起始日」標記(date=7/23 Night 的 ts 是 7/23 15:00 → 7/24 04:55),
+#   所以視窗要跨兩個 date 標籤取,不能用單一 date 的 Day+Night(那會漏掉前一晚、多算後一晚)。
+RECON_COLS = ["map_date", "eval_date", "tot_us", "tot_tw", "flip_fut", "above_flip", "broke_flip",
+              "open", "close", "high", "low", "move", "range", "has_night", "range_pct",
+              "hit_wall", "hit_mine"]
+
+
+def _txf_1d_scan(years=None):
+    """TXF 1d 年檔 → LazyFrame(date 轉字串;同 (date, session) 多列時取第一列,同舊的 to_dicts()[0])。"""
+    d1 = CACHE_ROOT_P / "1d" / "TXF"
+    paths = (sorted(d1.glob("TXF_1d_*.parquet")) if years is None else
+             [p for p in (d1 / f"TXF_1d_{y}.parquet" for y in sorted(years)) if p.exists()])
+    if not paths:
         return None
-    parts = [x for x in (night, day) if x]
-    return {"open": parts[0]["open"], "close": day["close"],
-            "high": max(x["high"] for x in parts), "low": min(x["low"] for x in parts),
-            "has_night": night is not None}
+    return (pl.scan_parquet(paths)
+            .select([pl.col("date").cast(pl.Utf8), "session", "open", "high", "low", "close"])
+            .unique(subset=["date", "session"], keep="first", maintain_order=True))
+
+
+def _recon_frame(maps, bars):
+    """maps(summary 列 + eval_date 欄)× bars(_txf_1d_scan)→ 對賬列(RECON_COLS)。"""
+    ohlc = ["open", "high", "low", "close"]
+    night = (bars.filter(pl.col("session") == "Night")
+             .select(["date"] + [pl.col(c).alias(f"n_{c}") for c in ohlc]))
+    day = (bars.filter(pl.col("session") == "Day")
+           .select([pl.col("date").alias("eval_date")] + [pl.col(c).alias(f"d_{c}") for c in ohlc]))
+    flip = pl.col("flip_us")
+    rr = pl.when(pl.col("ratio_eff").fill_null(0) != 0).then(pl.col("ratio_eff")).otherwise(1.0)
+    return (maps.filter(flip.is_not_null() & (flip != 0))
+            .join(day, on="eval_date", how="inner")
+            .join(night, on="date", how="left")
+            .with_columns([
+                pl.col("date").alias("map_date"),
+                flip.alias("flip_fut"),                      # flip 已是 TXF 座標(近月期貨軸)
+                (pl.col("fut_front") > flip).alias("above_flip"),
+                pl.coalesce("n_open", "d_open").alias("open"),
+                pl.col("d_close").alias("close"),
+                pl.max_horizontal("n_high", "d_high").alias("high"),
+                pl.min_horizontal("n_low", "d_low").alias("low"),
+                pl.col("n_open").is_not_null().alias("has_night"),
+            ])
+            .with_columns([
+                pl.when(pl.col("above_flip")).then(pl.col("low") < flip)
+                  .otherwise(pl.col("high") > flip).alias("broke_flip"),
+                (pl.col("close") - pl.col("open")).alias("move"),
+                (pl.col("high") - pl.col("low")).alias("range"),
+                ((pl.col("high") - pl.col("low")) / pl.col("open") * 100).alias("range_pct"),
+                pl.when(pl.col("wall_lo").fill_null(0) != 0)
+                  .then(pl.col("high") >= pl.col("wall_lo") / rr).alias("hit_wall"),
+                pl.when(pl.col("mine_hi").fill_null(0) != 0)
+                  .then(pl.col("low") <= pl.col("mine_hi") / rr).alias("hit_mine"),
+            ])
+            .select(RECON_COLS)
+            .sort("map_date"))
 
 
 def reconcile(d):
@@ -779,38 +1191,118 @@ def reconcile(d):
     hist = pl.read_parquet(p).filter(pl.col("date") < str(d)).sort("date")
     if not hist.height:
         return None
-    m = hist.tail(1).to_dicts()[0]
-    bars = map_window_bars(datetime.strptime(m["date"], "%Y-%m-%d").date(), d)
-    if not bars or not m.get("flip_us"):
+    m = hist.tail(1).with_columns(pl.lit(str(d)).alias("eval_date"))
+    m_date = datetime.strptime(m["date"][0], "%Y-%m-%d").date()
+    bars = _txf_1d_scan({m_date.year, d.year})
+    if bars is None:
         return None
-    flip_f = m["flip_us"]                # flip 已是 TXF 座標(近月期貨軸)
-    basis = 0.0
-    above = m["fut_front"] > flip_f
-    broke = (bars["low"] < flip_f) if above else (bars["high"] > flip_f)
-    rng = bars["high"] - bars["low"]
-    row = {"map_date": m["date"], "eval_date": str(d),
-           "tot_us": m["tot_us"], "tot_tw": m["tot_tw"],
-           "flip_fut": flip_f, "above_flip": above, "broke_flip": broke,
-           "open": bars["open"], "close": bars["close"],
-           "high": bars["high"], "low": bars["low"],
-           "move": bars["close"] - bars["open"], "range": rng,
-           "has_night": bars.get("has_night"),
-           "range_pct": rng / bars["open"] * 100,
-           "hit_wall": (bars["high"] >= m["wall_lo"] / (m.get("ratio_eff") or 1.0))
-                       if m.get("wall_lo") else None,
-           "hit_mine": (bars["low"] <= m["mine_hi"] / (m.get("ratio_eff") or 1.0))
-                       if m.get("mine_hi") else None}
+    df = _recon_frame(m.lazy(), bars).collect()
+    if not df.height:
+        return None
+    row = df.row(0, named=True)
     rp = TXO_ROOT / "reconcile.parquet"
-    df = pl.DataFrame([row])
     if rp.exists():
         df = pl.concat([pl.read_parquet(rp), df], how="diagonal").unique(
             subset=["map_date"], keep="last").sort("map_date")
-    df.write_parquet(rp)
-    print(f"[RECON] 地圖{m['date']} → {d}:{'破' if broke else '守'}flip"
-          f"{flip_f:,.0f} 幅度{rng:.0f}點({row['range_pct']:.2f}%)")
+    tmp = rp.with_name(rp.name + ".tmp")       # 同 reconcile_all:tmp + replace,中途被砍不留半截檔
+    df.write_parquet(tmp)
+    tmp.replace(rp)
+    print(f"[RECON] 地圖{row['map_date']} → {d}:{'破' if row['broke_flip'] else '守'}flip"
+          f"{row['flip_fut']:,.0f} 幅度{row['range']:.0f}點({row['range_pct']:.2f}%)")
     return row
 
 
+def reconcile_all(write=True):
+    """全史對賬一次重生(`--reconcile-all`):summary 全表 × TXF 1d 全部年檔,一個查詢。
+
+    每張地圖的適用日 = summary 裡的下一個日期(最後一張地圖還沒有適用日 → 不出列)。
+    write=True 時原子覆寫 reconcile.parquet(整檔重生,不與舊檔合併 —— 舊檔的指標可能是舊定義)。
+    """
+    p = TXO_ROOT / "daily_summary.parquet"
+    bars = _txf_1d_scan()
+    if not p.exists() or bars is None:
+        return None
+    maps = (pl.scan_parquet(p).sort("date")
+            .with_columns(pl.col("date").shift(-1).alias("eval_date"))
+            .filter(pl.col("eval_date").is_not_null()))
+    df = _recon_frame(maps, bars).collect()
+    if write:
+        rp = TXO_ROOT / "reconcile.parquet"
+        tmp = rp.with_name(rp.name + ".tmp")
+        df.write_parquet(tmp)
+        tmp.replace(rp)
+    n_broke = df.filter(pl.col("broke_flip")).height
+    print(f"[RECON-ALL] {df.height} 張地圖對賬(破 flip {n_broke}、守 {df.height - n_broke})")
+    return df
+
+
+# ── 盤中 GEX(2026-10)────────────────────────────────────────────────
+# reconcile 只拿地圖對「隔日 1d 的高低點」;這裡把**同一張已存的鏈**在適用視窗
+# (map_date 夜盤 + eval_date 日盤,同 _recon_frame)的每根 TXF 5m 收盤價上重新求值,
+# 得到逐棒的 GEX / 毛 gamma / GEX+ —— 「價格一路上相對 gamma 體制在哪」的資料集。
+# 一張鏈 × 兩百多根棒 = gex_surface 一次呼叫。
+# ⚠ 鏈是收盤那一刻的(OI、IV、剩餘天數都不動):這是「收盤地圖在盤中的讀數」,不是即時 GEX。
+def intraday_gex(m_date, eval_date, beta=1.0, vol_mode="sticky_strike"):
+    """map_date 的已存鏈 × 適用視窗的 TXF 5m → TXO_ROOT/intraday/<年>/gex_intraday_<map>.parquet。
+
+    缺 quotes(或舊格式)/ 缺 5m → None。回寫出的 DataFrame。
+    """
+    qp = TXO_ROOT / "quotes" / f"{m_date.year}" / f"TXO_quotes_{m_date.strftime('%Y%m%d')}.parquet"
+    if not qp.exists():
+        return None
+    series = pl.read_parquet(qp).to_dicts()
+    if not series or "spot" not in series[0]:
+        return None
+    try:
+        paths = kbar_paths("5m", "TXF", m_date, eval_date)
+        bars = (pl.read_parquet(paths, columns=["date", "ts", "session", "close"])
+                .filter(((pl.col("date") == m_date) & (pl.col("session") == "Night"))
+                        | ((pl.col("date") == eval_date) & (pl.col("session") == "Day")))
+                .sort("ts")) if paths else None
+    except Exception as ex:  # noqa: BLE001
+        print(f"[INTRADAY] {m_date}→{eval_date} 讀 5m 失敗:{ex!r}")
+        return None
+    if bars is None or not bars.height:
+        return None
+    S0 = series[0].get("fut_front", series[0]["spot"])
+    surf = gex_surface(series, bars["close"].to_list(), (beta,), (0.0,),
+                       vol_mode=vol_mode, ref_spot=S0)
+    summ = TXO_ROOT / "daily_summary.parquet"
+    flip = None
+    if summ.exists():
+        r = pl.read_parquet(summ).filter(pl.col("date") == str(m_date))
+        flip = r["flip_us"][0] if r.height else None
+    df = bars.with_columns([
+        pl.lit(str(m_date)).alias("map_date"),
+        pl.Series("gex_us", surf["gex_us"][0]),
+        pl.Series("gex_tw", surf["gex_tw"][0]),
+        pl.Series("gp_us", surf["gp_us"][0, 0]),
+        pl.lit(flip, dtype=pl.Float64).alias("flip_us"),
+    ]).with_columns([
+        (pl.col("close") - pl.col("flip_us")).alias("px_vs_flip"),
+        (pl.col("gex_us") >= 0).alias("regime_pos"),
+    ]).select(["map_date", "date", "session", "ts", "close", "gex_us", "gex_tw", "gp_us",
+               "flip_us", "px_vs_flip", "regime_pos"])
+    out = TXO_ROOT / "intraday" / f"{m_date.year}" / f"gex_intraday_{m_date.strftime('%Y%m%d')}.parquet"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    df.write_parquet(tmp)
+    tmp.replace(out)
+    n_neg = df.filter(~pl.col("regime_pos")).height
+    print(f"[INTRADAY] 地圖{m_date} → {eval_date}:{df.height} 根 5m,負 GEX 區 {n_neg} 根")
+    return df
+
+
+def _prev_map_date(d):
+    """d 之前最近一個有已存 quotes 的日子(= 今天要拿來對照的那張地圖)。"""
+    prev = None
+    for f in sorted(TXO_ROOT.glob("quotes/*/TXO_quotes_*.parquet")):
+        fd = datetime.strptime(f.stem[-8:], "%Y%m%d").date()
+        if fd < d:
+            prev = fd
+    return prev
+
+
 def _plain_map(gex, fut_front, atr=None, w=880, h=250):
     """白話版地圖 —— 一律 TXF 座標(你看盤下單的尺、夜盤也有、免受現貨資料品質影響)。
     flip 本來就在 TXF 軸上;履約價則以 gamma 加權有效遠期比例換算,原始履約價留在 tooltip。"""
@@ -895,22 +1387,18 @@ def _plain_map(gex, fut_front, atr=None, w=880, h=250):
     return svg, sent
 
 
-def _recent_table(d, n=10):
+def _recent_table(summary, d, n=10):
     """近 N 個交易日:實際變動 vs 當時定價的 1σ。
 
     這是報表唯一**檢查自己準不準**的區塊 ——
       · 「實際/1σ」持續 <1 → 市場定價偏寬(賣方相對有利)
       · 持續 >1           → 定價偏窄(買方相對有利)
     比任何靜態統計都即時,因為它用的就是每天當下的定價。
+    summary 由 report_context 預先載入(本函式不讀檔);IV 百分位 = 預算好的 pctall_front_iv 欄。
     """
-    p = TXO_ROOT / "daily_summary.parquet"
-    if not p.exists():
+    if summary is None or "front_iv" not in summary.columns:
         return "", None
-    s = pl.read_parquet(p).sort("date")
-    if "front_iv" not in s.columns:
-        return "", None
-    hist = s.filter(pl.col("front_iv").is_not_null())["front_iv"].to_numpy()
-    s = s.filter(pl.col("date") <= str(d)).tail(n + 1)
+    s = summary.filter(pl.col("date") <= str(d)).tail(n + 1)
     r = s.to_dicts()
     if len(r) < 3:
         return "", None
@@ -923,7 +1411,7 @@ def _recent_table(d, n=10):
         z = abs(ch) / a["day_move_pts"]
         zs.append(z)
         iv = b.get("front_iv")
-        pc = float((hist < iv).mean() * 100) if iv is not None and len(hist) >= 30 else None
+        pc = b.get("pctall_front_iv") if iv is not None else None
         hot = " style='color:#ef5350;font-weight:bold'" if (pc is not None and pc >= 90) else ""
         big = " style='color:#f5d90a;font-weight:bold'" if z >= 2 else ""
         _rows.append(f"<tr><td>{b['date'][5:]}</td>"
@@ -950,38 +1438,25 @@ def _recent_table(d, n=10):
     return html, med
 
 
-def _scale_panel(gex, meta):
+def _scale_panel(gex, meta, iv_pct=None, tse_close=None):
     """今日尺度:把 IV 換成「各視窗的 1σ 移動」與「小台/大台的金額」。
     這是報表裡唯一四題全過的東西(改變決策 / 贏對照組 / 獨立 / 適用):
       · 部位規模:一天的正常波動值多少錢
       · 停損寬度:停在噪音帶之內就是純洗
       · 目標可行性:超出區間的目標機率很低
     ⚠ 用 IV 而非 ATR:實測與實際位移的相關 IV 0.714 > 20 日歷史波動 0.604 > 5 日 0.556。
+    iv_pct(當日 IV 的全歷史百分位,summary 的 pctall_front_iv)/ tse_close(TSE 日盤近 21 收)
+    由 report_context 預先載入。
     """
     iv = gex.get("front_iv")
     F = meta.get("fut_front") or 0
     if not (iv and iv > 0 and F):
         return "<p class='mut'>(近月 IV 不足,無法估尺度)</p>", None
-    # IV 的歷史百分位(用 daily_summary 累積的 front_iv,零成本)
-    pct = hv = None
-    try:
-        s = pl.read_parquet(TXO_ROOT / "daily_summary.parquet")
-        if "front_iv" in s.columns:
-            h = s.filter(pl.col("front_iv").is_not_null())["front_iv"].to_numpy()
-            if len(h) >= 30:
-                pct = float((h < iv).mean() * 100)
-    except Exception:
-        pass
-    try:
-        tse = (pl.read_parquet(sorted(glob.glob(str(CACHE_ROOT_P / "1d" / "TSE" / "*.parquet"))))
-               .filter(pl.col("session") == "Day").select(["date", "close"])
-               .unique(subset=["date"]).sort("date").tail(21))
-        c = tse["close"].to_numpy()
-        if len(c) >= 21:
-            r = np.diff(np.log(c))
-            hv = float(r.std() * math.sqrt(252))
-    except Exception:
-        pass
+    # IV 的歷史百分位(store_summary 已算好,零成本)
+    pct, hv = iv_pct, None
+    if tse_close is not None and len(tse_close) >= 21:
+        r = np.diff(np.log(tse_close))
+        hv = float(r.std() * math.sqrt(252))
     # 停損寬度對照:單邊最大不利偏移 ÷ 定價 1σ 的實測分布
     #   (632 天 × 多空兩邊 = 1,264 個觀測;用前一日定價的 σ)
     #   ⚠ 1σ 量的是**收盤到收盤**;停損被掃到看的是**盤中單邊偏移**,兩者不同。
@@ -1083,13 +1558,13 @@ def _svg_settle_bands(settles, fut_now, w=880, row_h=76):
     return f'<svg viewBox="0 0 {w} {h}" xmlns="http://www.w3.org/2000/svg">{"".join(P)}</svg>'
 
 
-def _svg_signlog(d, days=45, w=880, h=230):
+def _svg_signlog(inst_hist, days=45, w=880, h=230):
     """回傳 (svg, 說明文字)。"""
-    """B4:自營商 call/put 淨部位時間序列 —— 「符號會不會翻面」的證據鏈。"""
-    p = TXO_ROOT / "institutional" / f"pc_{d.year}.parquet"
-    if not p.exists():
+    """B4:自營商 call/put 淨部位時間序列 —— 「符號會不會翻面」的證據鏈。
+    inst_hist = 當年 institutional/pc_<年>.parquet 的內容(report_context 預先載入)。"""
+    if inst_hist is None:
         return "<p class='mut'>(尚無符號日誌)</p>", ""
-    df = (pl.read_parquet(p).filter(pl.col("actor") == "自營商")
+    df = (inst_hist.filter(pl.col("actor") == "自營商")
           .with_columns((pl.col("long_oi") - pl.col("short_oi")).alias("net"))
           .pivot(values="net", index="date", on="cp").sort("date").tail(days))
     if df.height < 3 or "C" not in df.columns or "P" not in df.columns:
@@ -1130,12 +1605,11 @@ def _svg_signlog(d, days=45, w=880, h=230):
     return f'<svg viewBox="0 0 {w} {h}" xmlns="http://www.w3.org/2000/svg">{"".join(P)}</svg>', note
 
 
-def _html_recon(d, n=6):
-    """B3 面板:近幾日「地圖 vs 實際」對賬 + 依體制分組的已實現波動。"""
-    p = TXO_ROOT / "reconcile.parquet"
-    if not p.exists():
+def _html_recon(recon, n=6):
+    """B3 面板:近幾日「地圖 vs 實際」對賬 + 依體制分組的已實現波動。recon = reconcile.parquet 內容。"""
+    if recon is None:
         return "<p class='mut'>(對賬資料累積中,需至少兩個交易日)</p>"
-    df = pl.read_parquet(p).sort("map_date")
+    df = recon.sort("map_date")
     rec = df.tail(n).reverse().to_dicts()
     tr = "".join(
         f"<tr><td>{r['map_date']}→{r['eval_date'][5:]}</td>"
@@ -1156,13 +1630,203 @@ def _html_recon(d, n=6):
             f"<th>實際振幅</th><th>漲跌</th></tr>{tr}</table>{agg}")
 
 
-def render_html(d, S, meta, gex, inst, expiries, pct=None):
+# ── 報表模板與 context(2026-10)──────────────────────────────────────
+# 為什麼要:render_html 原本是一個 ~340 行的 f-string,而且 `_recent_table` / `_scale_panel` /
+#   `_svg_signlog` 各自在渲染途中讀 parquet(daily_summary 一份報告讀兩次)。`--render-only`
+#   批次重出幾百天時,大半時間花在重複讀同樣的檔。
+# 做法:① 檔案只在 load_report_tables 讀一次(批次共用)② report_context 把單日要用的東西
+#   全部切好放進一個 dict ③ render_report 只做字串組裝,文件骨架是 import 時就編好的 Template
+#   ④ write_report 以 tmp + rename 落地 —— 中途被砍也不會留下半截的 latest.html。
+# ⚠ 模板用 `$name` 佔位(CSS 的大括號不必再寫成兩個);模板裡要出現字面 `$` 請寫 `$$`。
+REPORT_VERSION = "2026-10.1"     # 版面 / 模板改了就升 → --render-only 會重出所有舊版報告
+#: 報告檔頭的版本標記(`_report_current` 讀的就是它):版面與 GEX 模型任一改版,舊報告都算過期
+REPORT_MARK = f"{REPORT_VERSION}+{GEX_MODEL_VERSION}"
+
+_REPORT_TMPL = Template("""<!doctype html><html lang="zh-Hant"><head><meta charset="utf-8">
+<meta name="gex-report" content="$report_ver">
+<title>TXO GEX $d</title><style>
+body{margin:0;background:#0e1116;color:#e6e8eb;font-family:"Microsoft JhengHei","Noto Sans TC",sans-serif;line-height:1.8;font-size:17px}
+.wrap{max-width:1060px;margin:0 auto;padding:24px 18px 60px} h1{font-size:27px;margin:0}
+h2{font-size:21px;margin:28px 0 10px;border-left:4px solid #f5d90a;padding-left:10px}
+.mut{color:#9aa3ad;font-size:15px} .cards{display:flex;gap:12px;flex-wrap:wrap;margin:16px 0}
+.card{background:#161b22;border:1px solid #2a313c;border-radius:10px;padding:12px 18px;min-width:170px}
+.card .n{font-size:14px;color:#9aa3ad} .card .v{font-size:26px}
+.pos{color:#26a69a} .neg{color:#ef5350} .warn{color:#f5d90a}
+svg{width:100%;height:auto;background:#0b0e13;border:1px solid #2a313c;border-radius:8px}
+.panel{background:#161b22;border:1px solid #2a313c;border-radius:10px;padding:12px 18px;margin:12px 0;font-size:17px}
+table{border-collapse:collapse;width:100%;margin:10px 0;font-size:16px}
+th{text-align:left;padding:9px 14px;border-bottom:1px solid #3a4553;color:#9aa3ad;
+   font-weight:600;font-size:14px;white-space:nowrap}
+td{padding:9px 14px;border-bottom:1px solid #1c222b;white-space:nowrap}
+tr:last-child td{border-bottom:0} tbody tr:hover{background:#161b22}
+.panel table{margin:6px 0 0}
+.grid{display:grid;grid-template-columns:1fr 1fr;gap:14px;margin:16px 0}
+@media(max-width:900px){.grid{grid-template-columns:1fr}}
+.cell{background:#0f1620;border:1px solid #2a313c;border-radius:10px;padding:10px 12px}
+.cell h3{margin:0 0 6px;font-size:16px;color:#e6e8eb;text-align:center}
+.cell .sub{font-size:13px;color:#9aa3ad;text-align:center;margin:0 0 6px}
+.cell svg{border:0;background:transparent}
+</style></head><body><div class="wrap">
+<h1>TXO 做市商曝險地圖 <span class="mut">$d(收盤)</span></h1>
+<p class="mut">產生 $generated | 序列 $n_series 條 | 到期:$exp_str |
+IV 反推失敗:$n_iv_fallback 條(微笑補 $n_iv_smile、其餘補中位)| 波動動態:$vol_mode | 遠期價來源:put-call parity $n_parity 個到期
+(其餘退回期貨結算價曲線)| GEX+ β=$beta</p>
+<div class="panel" style="border-color:#3a4553">
+<span class="$play_cls" style="font-size:22px"><b>今日盤性:$play_t</b></span>
+<span class="mut" style="font-size:14px"> — 美股慣例假設(dealer long call / short put)下的讀法</span>
+<div style="margin-top:6px;font-size:17px">$play_b</div>
+</div>
+<div class="cards">
+<div class="card"><div class="n">TXF 近月(結算價)</div><div class="v">$fut_disp</div>
+<div class="n">TAIEX 現貨 $spot_disp(基差 $basis_disp)</div></div>
+
+<div class="card"><div class="n">今日波動水位</div><div class="v $iv_cls">$iv_v</div>
+<div class="n">$iv_sub</div></div>
+
+<div class="card"><div class="n">一日 1&sigma;(微台 1 口)</div><div class="v">$d1_v</div>
+<div class="n">$d1_sub</div></div>
+
+<div class="card"><div class="n">近期定價準不準</div><div class="v $rm_cls">$rm_v</div>
+<div class="n">$rm_sub</div></div>
+</div>
+<div class="panel" style="border-color:#3a4553">
+<b style="font-size:18px">怎麼看(三步,依可靠度排序)</b>
+<div style="margin-top:8px;font-size:16px;line-height:1.9">
+<b>1. 波動水位</b> &rarr; 決定<b>部位大小</b>與<b>停損寬度</b>。P90 以上就縮手,不要猜方向。<br>
+<b>2. 結算區間</b> &rarr; 決定<b>目標可行性</b>;要賣選擇權就賣在區間外。<br>
+<b>3. 結構觀察</b> &rarr; <span class="mut">只當背景。符號約 3/4 的日子是錯的、牆在價格空間不存在,
+別拿它決定進出場。</span>
+</div></div>
+<h2>① 今日尺度 <span class="mut">— 部位規模 / 停損寬度 / 目標可行性</span></h2>
+<p class="mut">用近月 IV 換算各視窗的 1&sigma; 移動。<b>選這個尺而不是 ATR</b>:實測與實際位移的相關
+IV <b>0.714</b> &gt; 20 日歷史波動 0.604 &gt; 5 日 0.556。<br>
+<b>停損若設在 1&sigma; 之內,等於停在噪音帶裡</b>;目標若設在區間之外,達成機率很低。</p>
+$scale_html
+
+<h3>近 10 日:實際波動 vs 當時的定價</h3>
+<p class="mut">這是報表<b>唯一會檢查自己準不準</b>的區塊。「實際/1&sigma;」持續 &lt;1 代表市場定價偏寬、
+&gt;1 代表偏窄 —— 比任何靜態統計都即時,因為它用的就是每天當下的定價。</p>
+$recent_html
+
+<h2>② 結算價會落在哪 <span class="mut">(最近三個到期)</span></h2>
+<p class="mut">深色帶 = <b>±0.8&sigma;,約 67% 的結算落在裡面</b>;淺色帶 = ±1.0&sigma;,約 82%。
+黃線 = 中心(選擇權推算的遠期價)。<br>
+校準自 2024-01~2026-08 共 173 個「剩 1 日」的週選實測(剩 3 日 79%、剩 5 日 75%)。
+⚠️ 這是<b>現貨指數</b>點位(結算以現貨計算),不是 TXF 點位。
+⚠️ <b>別用固定點數</b>:同一個「±200 點」2025 上半年命中 76.8%、2025-07 後掉到 42.3%,因為波動水位會變。</p>
+$settle_svg
+$settle_html
+
+<h2>③ 結構觀察 <span class="mut">— 以下皆為參考,不是決策輸入</span></h2>
+<div class="cards">
+<div class="card"><div class="n">Gamma Flip</div><div class="v warn">$flip_disp</div>
+<div class="n">現價 $dist_txt · $dist_sub</div></div>
+
+<div class="card"><div class="n">GEX+ Flip 與 β 敏感度</div><div class="v $beta_cls">$gp_disp</div>
+<div class="n">$beta_sub</div></div>
+
+<div class="card"><div class="n">VEX 最深履約價</div><div class="v">$vex_deep_v</div>
+<div class="n">$vex_deep_sub</div></div>
+
+<div class="card"><div class="n">flip 距離(以一日隱含波動為尺)</div>
+<div class="v $read_cls">$read_v</div><div class="n">$read_sub</div></div>
+</div>
+$plain_svg
+<div class="panel">$plain_sent</div>
+$pct_line
+<h3>GEX(S) 曲線</h3>$curve_svg
+<p class="mut">X 軸=假設的 TXF 價位,Y 軸=在該價位時的總曝險(<b>不是時間序列</b>)· <span style="color:#5e9bd0">■ GEX</span> <span style="color:#f0997b">■ GEX+</span> <span style="color:#b3a4ff">■ 毛 gamma</span> · <span style="color:#f5d90a">┃</span> Gamma Flip · <span style="color:#f0997b">○</span> GEX+ Flip · <span style="color:#9aa3ad">┋</span> 現價</p>
+<h3>vol 衝擊 <span class="mut">— IV 整條平移時 flip 搬多遠</span></h3>
+<p class="mut">IV 平行加減、OI 不變,重算整條曲線(與上方 β 掃描同一次計算)。
+flip 隨 IV 大幅移動 = 今天的 flip 是「IV 剛好在這裡」決定的,事件前後別拿來當支撐壓力。
+括號內 = 相對不平移的位移;單位同上(億/1%)。</p>
+$vs_html
+<h3>逐履約價分布</h3>
+<div class="grid">
+  <div class="cell"><h3>GEX 各履約價</h3>
+    <p class="sub">綠=正(壓抑) 紅=負(放大)· 美股慣例</p>
+    $gex_bars_svg</div>
+  <div class="cell"><h3>VEX 各履約價</h3>
+    <p class="sub">vanna 曝險 · 負=去穩定 · 最深 $vex_deep_v</p>
+    $vex_bars_svg</div>
+</div>
+<p class="mut">全報表 <b>TXF 座標</b>(履約價 ×$conv_mult,$conv_note)</p>
+
+<h3>IV 期限結構 <span class="mut">(不依賴符號)</span></h3>
+<p class="mut">逐到期價平 IV。<b>不依賴符號慣例</b> —— 純粹是定價。
+「遠期 IV / 區間隱含移動」由相鄰到期的變異數差反推 &radic;(&sigma;₂²T₂ &minus; &sigma;₁²T₁),
+即市場替<b>那一段時間</b>單獨定的價。曲線平 = 市場不預期特別的事;近端單獨墊高 = 有事件被標價。</p>
+$term_html
+
+<h3>OI 集中價位</h3>
+<div class="panel">最集中三檔(以 |GEX| 佔全場比重,<span class="mut">不依賴符號</span>):$conc_html
+<br><span class="pos">正 GEX 集中:</span>$pos<br><span class="neg">負 GEX 集中:</span>$neg</div></p>
+<h3>符號日誌(自營商淨部位走勢)</h3>
+<p class="mut">期交所公布的實際持倉(自營商為做市商最接近的代理)<br>$signlog_note</p>
+$signlog_svg
+$inst_html
+<p class="mut" style="margin-top:20px">最近到期 $exp0_code ·
+距結算 $exp0_days 天(結算後地圖重繪)</p>
+</div></body></html>""")
+
+
+def _read_opt(p):
+    """讀 parquet;缺檔或讀壞 → None(報告少一塊,不擋整份)。"""
+    try:
+        return pl.read_parquet(p) if p.exists() else None
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def load_report_tables(years):
+    """報告用到的衍生表一次讀進來:{summary, recon, tse_close, inst: {年: df}}(缺檔 → None)。"""
+    summary = _read_opt(TXO_ROOT / "daily_summary.parquet")
+    tse_close = None
+    try:
+        tse = (pl.read_parquet(sorted(glob.glob(str(CACHE_ROOT_P / "1d" / "TSE" / "*.parquet"))))
+               .filter(pl.col("session") == "Day").select(["date", "close"])
+               .unique(subset=["date"]).sort("date").tail(21))
+        tse_close = tse["close"].to_numpy()
+    except Exception:  # noqa: BLE001
+        pass
+    if summary is not None and "pct_tot_us" not in summary.columns:
+        summary = with_stats(summary)            # store_summary 之前寫的舊檔:當場補算
+    return {"summary": summary.sort("date") if summary is not None else None,
+            "recon": _read_opt(TXO_ROOT / "reconcile.parquet"),
+            "tse_close": tse_close,
+            "inst": {y: _read_opt(TXO_ROOT / "institutional" / f"pc_{y}.parquet") for y in set(years)}}
+
+
+def report_context(d, S, meta, gex, inst, expiries, pct=None, tables=None):
+    """單日報告的全部輸入 → 一個 dict(render_report 唯一的資料來源)。
+
+    tables = load_report_tables 的結果;批次時傳同一份,單日省略則當場讀一次。
+    """
+    if tables is None:
+        tables = load_report_tables((d.year,))
+    summ = tables["summary"]
+    iv_pct = None
+    if summ is not None and "pctall_front_iv" in summ.columns:
+        r = summ.filter(pl.col("date") == str(d))
+        iv_pct = r["pctall_front_iv"][0] if r.height else None
+    if d.year not in tables["inst"]:             # 批次跨到沒預載的年份:補讀那一年
+        tables["inst"][d.year] = _read_opt(TXO_ROOT / "institutional" / f"pc_{d.year}.parquet")
+    inst_hist = tables["inst"][d.year]
+    return {"d": d, "S": S, "meta": meta, "gex": gex, "inst": inst, "expiries": expiries,
+            "pct": pct or {}, "summary": summ, "iv_pct": iv_pct, "tse_close": tables["tse_close"],
+            "inst_hist": inst_hist, "recon": tables["recon"],
+            "generated": datetime.now().strftime("%Y-%m-%d %H:%M")}
+
+
+def render_report(ctx):
+    """context → 完整 HTML 字串。純 CPU:不讀檔、不寫檔(資料全在 ctx,見 report_context)。"""
+    d, S, meta, gex = ctx["d"], ctx["S"], ctx["meta"], ctx["gex"]
+    inst, expiries, pct = ctx["inst"], ctx["expiries"], ctx["pct"]
     flip = gex["flip_us"]
     basis = meta.get("basis", 0.0)
     rr = gex.get("ratio_eff", 1.0) or 1.0
     regime = ("現價在 flip 之上 → 美股慣例讀為 +γ 壓抑區" if flip and S > flip else
               "現價在 flip 之下 → 美股慣例讀為 -γ 放大區" if flip else "無 flip(全域同號)")
-    pct = pct or {}
     pct_line = ""
     if pct.get("us") is not None:
         pct_line = (f"<div class='panel'>場強座標(近 {pct['n']} 個交易日):總 GEX 在第 "
@@ -1234,6 +1898,26 @@ def render_html(d, S, meta, gex, inst, expiries, pct=None):
                     " / ".join(f"{v:,.0f}" if v else "—" for v in _bs.values()) +
                     (f" · 門檻 0.25ATR={_thr:,.0f}" if _atr_v else ""))
 
+    # ── vol 衝擊面板:IV 整條平移 ±2.5 / ±5 vol 點時地圖怎麼搬(與 β 掃描同一個曲面)──
+    _vs = gex.get("vol_shock") or []
+    if _vs:
+        def _flip_cell(v, base):
+            if not v:
+                return "—"
+            return f"{v:,.0f}" + (f" <span class='mut'>({v-base:+,.0f})</span>"
+                                  if (base and v != base) else "")
+        _b0 = next((r for r in _vs if r["shift"] == 0.0), {})
+        vs_html = ("<table><tr><th>IV 平移</th><th>Gamma Flip</th><th>GEX+ Flip</th>"
+                   "<th>現價處 GEX</th><th>現價處毛 gamma</th></tr>" + "".join(
+                       f"<tr><td>{r['shift']*100:+.1f} vol 點</td>"
+                       f"<td style='text-align:right'>{_flip_cell(r['flip_us'], _b0.get('flip_us'))}</td>"
+                       f"<td style='text-align:right'>{_flip_cell(r['flip_gp'], _b0.get('flip_gp'))}</td>"
+                       f"<td style='text-align:right'>{r['tot_us']:+.1f}</td>"
+                       f"<td style='text-align:right'>{r['gross']:.1f}</td></tr>"
+                       for r in _vs if r["tot_us"] is not None) + "</table>")
+    else:
+        vs_html = "<p class='mut'>(舊快取 / 舊版結果,無 vol 衝擊資料)</p>"
+
     # ── 灰色地帶:Gamma Flip 與 GEX+ Flip 之間 ─────────────────────────
     # vanna 位移 = GEX+ Flip − Gamma Flip。
     # ⚠ 不用「現價在不在兩條 flip 之間」:實測 22/23 天都成立 = 零鑑別力,已棄用。
@@ -1273,8 +1957,8 @@ def render_html(d, S, meta, gex, inst, expiries, pct=None):
                     f" · 現價到 flip {_terr:.2f}%")
 
     # ── 結算區間 ─────────────────────────────────────────────────────
-    scale_html, _si = _scale_panel(gex, meta)
-    recent_html, _rmed = _recent_table(d)
+    scale_html, _si = _scale_panel(gex, meta, ctx["iv_pct"], ctx["tse_close"])
+    recent_html, _rmed = _recent_table(ctx["summary"], d)
     # ── 三張決策卡的值 ────────────────────────────────────────────
     if _si:
         _iv, _pc, _d1 = _si["iv"], _si.get("pct"), _si["d1"]
@@ -1367,133 +2051,320 @@ def render_html(d, S, meta, gex, inst, expiries, pct=None):
                         "<br>平常沒感覺;IV 噴發時 vanna 從這裡回來")
     else:
         vex_deep_v, vex_deep_sub = "N/A", ""
-    signlog_svg, signlog_note = _svg_signlog(d)
-    html = f"""<!doctype html><html lang="zh-Hant"><head><meta charset="utf-8">
-<title>TXO GEX {d}</title><style>
-body{{margin:0;background:#0e1116;color:#e6e8eb;font-family:"Microsoft JhengHei","Noto Sans TC",sans-serif;line-height:1.8;font-size:17px}}
-.wrap{{max-width:1060px;margin:0 auto;padding:24px 18px 60px}} h1{{font-size:27px;margin:0}}
-h2{{font-size:21px;margin:28px 0 10px;border-left:4px solid #f5d90a;padding-left:10px}}
-.mut{{color:#9aa3ad;font-size:15px}} .cards{{display:flex;gap:12px;flex-wrap:wrap;margin:16px 0}}
-.card{{background:#161b22;border:1px solid #2a313c;border-radius:10px;padding:12px 18px;min-width:170px}}
-.card .n{{font-size:14px;color:#9aa3ad}} .card .v{{font-size:26px}}
-.pos{{color:#26a69a}} .neg{{color:#ef5350}} .warn{{color:#f5d90a}}
-svg{{width:100%;height:auto;background:#0b0e13;border:1px solid #2a313c;border-radius:8px}}
-.panel{{background:#161b22;border:1px solid #2a313c;border-radius:10px;padding:12px 18px;margin:12px 0;font-size:17px}}
-table{{border-collapse:collapse;width:100%;margin:10px 0;font-size:16px}}
-th{{text-align:left;padding:9px 14px;border-bottom:1px solid #3a4553;color:#9aa3ad;
-   font-weight:600;font-size:14px;white-space:nowrap}}
-td{{padding:9px 14px;border-bottom:1px solid #1c222b;white-space:nowrap}}
-tr:last-child td{{border-bottom:0}} tbody tr:hover{{background:#161b22}}
-.panel table{{margin:6px 0 0}}
-.grid{{display:grid;grid-template-columns:1fr 1fr;gap:14px;margin:16px 0}}
-@media(max-width:900px){{.grid{{grid-template-columns:1fr}}}}
-.cell{{background:#0f1620;border:1px solid #2a313c;border-radius:10px;padding:10px 12px}}
-.cell h3{{margin:0 0 6px;font-size:16px;color:#e6e8eb;text-align:center}}
-.cell .sub{{font-size:13px;color:#9aa3ad;text-align:center;margin:0 0 6px}}
-.cell svg{{border:0;background:transparent}}
-</style></head><body><div class="wrap">
-<h1>TXO 做市商曝險地圖 <span class="mut">{d}(收盤)</span></h1>
-<p class="mut">產生 {datetime.now().strftime('%Y-%m-%d %H:%M')} | 序列 {meta['n_series']} 條 | 到期:{exp_str} |
-IV 反推失敗補中位:{meta['n_iv_fallback']} 條 | 遠期價來源:put-call parity {meta.get('n_expiry_parity','?')} 個到期
-(其餘退回期貨結算價曲線)| GEX+ β={gex['beta']:.1f}</p>
-<div class="panel" style="border-color:#3a4553">
-<span class="{play_cls}" style="font-size:22px"><b>今日盤性:{play_t}</b></span>
-<span class="mut" style="font-size:14px"> — 美股慣例假設(dealer long call / short put)下的讀法</span>
-<div style="margin-top:6px;font-size:17px">{play_b}</div>
-</div>
-<div class="cards">
-<div class="card"><div class="n">TXF 近月(結算價)</div><div class="v">{meta.get('fut_front',0):,.0f}</div>
-<div class="n">TAIEX 現貨 {S:,.0f}(基差 {basis:+.0f})</div></div>
-
-<div class="card"><div class="n">今日波動水位</div><div class="v {iv_cls}">{iv_v}</div>
-<div class="n">{iv_sub}</div></div>
+    signlog_svg, signlog_note = _svg_signlog(ctx["inst_hist"])
+    return _REPORT_TMPL.substitute(
+        d=d, generated=ctx["generated"], report_ver=REPORT_MARK,
+        n_series=meta["n_series"], n_iv_fallback=meta["n_iv_fallback"],
+        n_iv_smile=meta.get("n_iv_smile", 0), vol_mode=gex.get("vol_mode", "sticky_strike"),
+        n_parity=meta.get("n_expiry_parity", "?"), beta=f"{gex['beta']:.1f}", exp_str=exp_str,
+        play_cls=play_cls, play_t=play_t, play_b=play_b,
+        fut_disp=f"{meta.get('fut_front', 0):,.0f}", spot_disp=f"{S:,.0f}", basis_disp=f"{basis:+.0f}",
+        iv_cls=iv_cls, iv_v=iv_v, iv_sub=iv_sub, d1_v=d1_v, d1_sub=d1_sub,
+        rm_cls=rm_cls, rm_v=rm_v, rm_sub=rm_sub,
+        scale_html=scale_html, recent_html=recent_html, settle_svg=settle_svg, settle_html=settle_html,
+        flip_disp=flip_disp, dist_txt=dist_txt, dist_sub=dist_sub,
+        beta_cls=beta_cls, gp_disp=gp_disp, beta_sub=beta_sub,
+        vex_deep_v=vex_deep_v, vex_deep_sub=vex_deep_sub,
+        read_cls=read_cls, read_v=read_v, read_sub=read_sub,
+        plain_svg=plain_svg, plain_sent=plain_sent, pct_line=pct_line,
+        curve_svg=_svg_curve(gex["profile"], meta["fut_front"], flip, gex["flip_gp"]),
+        vs_html=vs_html,
+        gex_bars_svg=_svg_bars(gex["strikes_us"], meta["fut_front"], flip, w=700, h=340, conv=1/rr),
+        vex_bars_svg=_svg_bars(gex["vex_vn"], meta["fut_front"], None, thr=0.02, unit="億/vol點",
+                               w=700, h=340, conv=1/rr),
+        conv_mult=f"{1/rr:.4f}", conv_note=conv_note, term_html=term_html,
+        conc_html=conc_html, pos=pos, neg=neg,
+        signlog_note=signlog_note, signlog_svg=signlog_svg, inst_html=inst_html,
+        exp0_code=expiries[0]["code"] if expiries else "?",
+        exp0_days=f"{expiries[0]['days']:.0f}" if expiries else "?")
+
+
+def report_path(d, vol_mode=VOL_MODES[0]):
+    """預設模式 → gex_<日>.html;其他 vol_mode 另存 gex_<日>_<模式>.html,不蓋掉歷史日報。"""
+    sfx = "" if vol_mode == VOL_MODES[0] else f"_{vol_mode}"
+    return TXO_ROOT / "reports" / f"gex_{d.strftime('%Y%m%d')}{sfx}.html"
+
+
+def _atomic_write_text(path, text):
+    """tmp + rename:讀者(瀏覽器、同步軟體)永遠只看得到舊檔或完整的新檔,不會是半截。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def write_report(d, html, latest=True, vol_mode=VOL_MODES[0]):
+    """落地 report_path(d, vol_mode);latest=True 且是預設模式時同一份內容也原子換上 latest.html。"""
+    out = report_path(d, vol_mode)
+    _atomic_write_text(out, html)
+    if latest and vol_mode == VOL_MODES[0]:
+        _atomic_write_text(out.parent / "latest.html", html)
+    return out
 
-<div class="card"><div class="n">一日 1&sigma;(微台 1 口)</div><div class="v">{d1_v}</div>
-<div class="n">{d1_sub}</div></div>
 
-<div class="card"><div class="n">近期定價準不準</div><div class="v {rm_cls}">{rm_v}</div>
-<div class="n">{rm_sub}</div></div>
-</div>
-<div class="panel" style="border-color:#3a4553">
-<b style="font-size:18px">怎麼看(三步,依可靠度排序)</b>
-<div style="margin-top:8px;font-size:16px;line-height:1.9">
-<b>1. 波動水位</b> &rarr; 決定<b>部位大小</b>與<b>停損寬度</b>。P90 以上就縮手,不要猜方向。<br>
-<b>2. 結算區間</b> &rarr; 決定<b>目標可行性</b>;要賣選擇權就賣在區間外。<br>
-<b>3. 結構觀察</b> &rarr; <span class="mut">只當背景。符號約 3/4 的日子是錯的、牆在價格空間不存在,
-別拿它決定進出場。</span>
-</div></div>
-<h2>① 今日尺度 <span class="mut">— 部位規模 / 停損寬度 / 目標可行性</span></h2>
-<p class="mut">用近月 IV 換算各視窗的 1&sigma; 移動。<b>選這個尺而不是 ATR</b>:實測與實際位移的相關
-IV <b>0.714</b> &gt; 20 日歷史波動 0.604 &gt; 5 日 0.556。<br>
-<b>停損若設在 1&sigma; 之內,等於停在噪音帶裡</b>;目標若設在區間之外,達成機率很低。</p>
-{scale_html}
+def render_html(d, S, meta, gex, inst, expiries, pct=None, vol_mode=VOL_MODES[0]):
+    """單日入口(run_one 用):組 context → 套模板 → 原子寫入日報、latest.html 與儀表板資料。
 
-<h3>近 10 日:實際波動 vs 當時的定價</h3>
-<p class="mut">這是報表<b>唯一會檢查自己準不準</b>的區塊。「實際/1&sigma;」持續 &lt;1 代表市場定價偏寬、
-&gt;1 代表偏窄 —— 比任何靜態統計都即時,因為它用的就是每天當下的定價。</p>
-{recent_html}
-
-<h2>② 結算價會落在哪 <span class="mut">(最近三個到期)</span></h2>
-<p class="mut">深色帶 = <b>±0.8&sigma;,約 67% 的結算落在裡面</b>;淺色帶 = ±1.0&sigma;,約 82%。
-黃線 = 中心(選擇權推算的遠期價)。<br>
-校準自 2024-01~2026-08 共 173 個「剩 1 日」的週選實測(剩 3 日 79%、剩 5 日 75%)。
-⚠️ 這是<b>現貨指數</b>點位(結算以現貨計算),不是 TXF 點位。
-⚠️ <b>別用固定點數</b>:同一個「±200 點」2025 上半年命中 76.8%、2025-07 後掉到 42.3%,因為波動水位會變。</p>
-{settle_svg}
-{settle_html}
+    非預設 vol_mode 只寫 gex_<日>_<模式>.html(見 report_path);latest.html 與儀表板只收預設模式。
+    """
+    ctx = report_context(d, S, meta, gex, inst, expiries, pct)
+    out = write_report(d, render_report(ctx), vol_mode=vol_mode)
+    if vol_mode == VOL_MODES[0]:
+        update_dash_index([write_day_json(ctx)])
+    return out
 
-<h2>③ 結構觀察 <span class="mut">— 以下皆為參考,不是決策輸入</span></h2>
-<div class="cards">
-<div class="card"><div class="n">Gamma Flip</div><div class="v warn">{f'{flip:,.0f}' if flip else 'N/A'}</div>
-<div class="n">現價 {dist_txt} · {dist_sub}</div></div>
 
-<div class="card"><div class="n">GEX+ Flip 與 β 敏感度</div><div class="v {beta_cls}">{gp_disp}</div>
-<div class="n">{beta_sub}</div></div>
+# ── 多日儀表板(2026-10)──────────────────────────────────────────────
+# 為什麼要:每天一份 100+ KB 的獨立 HTML,翻歷史 = 一份一份開檔。儀表板把「畫圖要的數字」
+#   存成每日一個精簡 JSON(reports/data/gex_<日>.json,幾 KB),SVG 在瀏覽器端畫;
+#   reports/index.html 是一個靜態殼 + data/index.json(每天一列的摘要),切換日子只多抓一個小檔。
+# 資料來源與 render_report 同一個 context(report_json)—— 兩邊的數字不會對不上。
+# ⚠ 瀏覽器對 file:// 的 fetch 多半擋掉(Chrome 一定擋):要在 reports/ 底下開
+#   `python -m http.server`(或任何靜態伺服器)再看 http://localhost:8000/。
+# ⚠ 頁面裡的 JS 不用 `${}` 樣板字串 —— 整頁同樣過 string.Template,`$` 有特殊意義。
+DASH_VERSION = "2026-10.1"       # JSON 欄位 / 頁面改了就升(index.html 會在下次寫入時換新)
 
-<div class="card"><div class="n">VEX 最深履約價</div><div class="v">{vex_deep_v}</div>
-<div class="n">{vex_deep_sub}</div></div>
 
-<div class="card"><div class="n">flip 距離(以一日隱含波動為尺)</div>
-<div class="v {read_cls}">{read_v}</div><div class="n">{read_sub}</div></div>
-</div>
-{plain_svg}
-<div class="panel">{plain_sent}</div>
-{pct_line}
-<h3>GEX(S) 曲線</h3>{_svg_curve(gex['profile'], meta['fut_front'], flip, gex['flip_gp'])}
-<p class="mut">X 軸=假設的 TXF 價位,Y 軸=在該價位時的總曝險(<b>不是時間序列</b>)· <span style="color:#5e9bd0">■ GEX</span> <span style="color:#f0997b">■ GEX+</span> <span style="color:#b3a4ff">■ 毛 gamma</span> · <span style="color:#f5d90a">┃</span> Gamma Flip · <span style="color:#f0997b">○</span> GEX+ Flip · <span style="color:#9aa3ad">┋</span> 現價</p>
-<h3>逐履約價分布</h3>
-<div class="grid">
-  <div class="cell"><h3>GEX 各履約價</h3>
-    <p class="sub">綠=正(壓抑) 紅=負(放大)· 美股慣例</p>
-    {_svg_bars(gex['strikes_us'], meta['fut_front'], flip, w=700, h=340, conv=1/rr)}</div>
-  <div class="cell"><h3>VEX 各履約價</h3>
-    <p class="sub">vanna 曝險 · 負=去穩定 · 最深 {vex_deep_v}</p>
-    {_svg_bars(gex['vex_vn'], meta['fut_front'], None, thr=0.02, unit="億/vol點", w=700, h=340, conv=1/rr)}</div>
-</div>
-<p class="mut">全報表 <b>TXF 座標</b>(履約價 ×{1/rr:.4f},{conv_note})</p>
+def _r(v, nd=2):
+    """JSON 用的四捨五入;None / NaN → null(json 的 NaN 瀏覽器讀不了)。"""
+    if v is None:
+        return None
+    v = float(v)
+    return None if v != v else round(v, nd)
+
+
+def dash_json_path(d):
+    return TXO_ROOT / "reports" / "data" / f"gex_{d.strftime('%Y%m%d')}.json"
+
+
+def report_json(ctx):
+    """context → 單日精簡 dict(儀表板客戶端畫圖的全部輸入)。履約價維持原座標,頁面用 ratio 換 TXF。"""
+    gex, meta = ctx["gex"], ctx["meta"]
+    prof = gex["profile"]
+    ks = sorted(gex["strikes_us"])
+    return {
+        "v": DASH_VERSION, "model": GEX_MODEL_VERSION, "date": str(ctx["d"]),   # 前兩欄 = 跳過判準
+        "spot": _r(ctx["S"], 1), "fut": _r(meta.get("fut_front"), 1), "atr": _r(meta.get("atr"), 1),
+        "ratio": _r(gex.get("ratio_eff") or 1.0, 6), "beta": gex["beta"],
+        "vol_mode": gex.get("vol_mode", "sticky_strike"),
+        "flip_us": _r(gex["flip_us"], 1), "flip_gp": _r(gex["flip_gp"], 1),
+        "gross_peak": _r(gex.get("gross_peak"), 1),
+        "tot_us": _r(gex["tot_us"]), "tot_tw": _r(gex["tot_tw"]),
+        "tot_vex_us": _r(gex["tot_vex_us"]), "tot_gp_us": _r(gex.get("tot_gp_us")),
+        "front_iv": _r(gex.get("front_iv"), 4), "day_move": _r(gex.get("day_move"), 3),
+        "pct": ctx["pct"],
+        "profile": {"x": [p[0] for p in prof], "us": [_r(p[1]) for p in prof],
+                    "gross": [_r(p[2]) for p in prof], "gp": [_r(p[3]) for p in prof]},
+        "strikes": {"K": ks, "gex_us": [_r(gex["strikes_us"][k], 3) for k in ks],
+                    "gex_tw": [_r(gex["strikes_tw"].get(k), 3) for k in ks],
+                    "vex_vn": [_r(gex["vex_vn"].get(k), 4) for k in ks]},
+        "settles": [{"code": s["code"], "date": s["date"], "fwd": _r(s["fwd"], 1),
+                     "b08": [_r(s["b08"][0], 1), _r(s["b08"][1], 1)],
+                     "b10": [_r(s["b10"][0], 1), _r(s["b10"][1], 1)]}
+                    for s in gex.get("settles") or []],
+        "term": [{"code": t["code"], "Td": t["Td"], "iv": _r(t["iv"], 4)} for t in gex.get("term") or []],
+        "exp": [{"code": e["code"], "days": e["days"]} for e in ctx["expiries"][:4]],
+    }
+
+
+def write_day_json(ctx):
+    """原子寫入 data/gex_<日>.json;回傳該日在 data/index.json 裡的那一列。"""
+    data = report_json(ctx)
+    _atomic_write_text(dash_json_path(ctx["d"]),
+                       json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return {k: data[k] for k in _DASH_INDEX_KEYS}
+
+
+_DASH_INDEX_KEYS = ("date", "fut", "flip_us", "tot_us", "tot_tw", "front_iv")
+
+
+def _rebuild_dash_index():
+    """index.json 壞掉時的重建:逐一讀 data/gex_<日>.json 取出索引列。讀不了的單日檔跳過並列出。"""
+    cur, bad = {}, []
+    for f in sorted((TXO_ROOT / "reports" / "data").glob("gex_*.json")):
+        try:
+            data = json.loads(f.read_text(encoding="utf-8"))
+            cur[data["date"]] = {k: data.get(k) for k in _DASH_INDEX_KEYS}
+        except Exception:  # noqa: BLE001
+            bad.append(f.name)
+    print(f"[DASH] index.json 無法讀取,由 {len(cur)} 份單日 JSON 重建"
+          + (f"(跳過 {len(bad)} 份:{', '.join(bad)})" if bad else ""))
+    return cur
 
-<h3>IV 期限結構 <span class="mut">(不依賴符號)</span></h3>
-<p class="mut">逐到期價平 IV。<b>不依賴符號慣例</b> —— 純粹是定價。
-「遠期 IV / 區間隱含移動」由相鄰到期的變異數差反推 &radic;(&sigma;₂²T₂ &minus; &sigma;₁²T₁),
-即市場替<b>那一段時間</b>單獨定的價。曲線平 = 市場不預期特別的事;近端單獨墊高 = 有事件被標價。</p>
-{term_html}
 
-<h3>OI 集中價位</h3>
-<div class="panel">最集中三檔(以 |GEX| 佔全場比重,<span class="mut">不依賴符號</span>):{conc_html}
-<br><span class="pos">正 GEX 集中:</span>{pos}<br><span class="neg">負 GEX 集中:</span>{neg}</div></p>
-<h3>符號日誌(自營商淨部位走勢)</h3>
-<p class="mut">期交所公布的實際持倉(自營商為做市商最接近的代理)<br>{signlog_note}</p>
-{signlog_svg}
-{inst_html}
-<p class="mut" style="margin-top:20px">最近到期 {expiries[0]['code'] if expiries else '?'} ·
-距結算 {f"{expiries[0]['days']:.0f}" if expiries else '?'} 天(結算後地圖重繪)</p>
-</div></body></html>"""
-    rpt_dir = TXO_ROOT / "reports"
-    rpt_dir.mkdir(parents=True, exist_ok=True)
-    out = rpt_dir / f"gex_{d.strftime('%Y%m%d')}.html"
-    out.write_text(html, encoding="utf-8")
-    (rpt_dir / "latest.html").write_text(html, encoding="utf-8")
-    return out
+def update_dash_index(rows):
+    """把 rows 依日期 upsert 進 data/index.json;index.html 缺或內容不同才重寫。"""
+    ip = TXO_ROOT / "reports" / "data" / "index.json"
+    cur = {}
+    if ip.exists():
+        try:
+            cur = {r["date"]: r for r in json.loads(ip.read_text(encoding="utf-8"))["days"]}
+        except Exception:  # noqa: BLE001  —— 壞了不能只留這批(儀表板會掉光歷史):從單日 JSON 重建
+            cur = _rebuild_dash_index()
+    for r in rows:
+        cur[r["date"]] = r
+    _atomic_write_text(ip, json.dumps({"v": DASH_VERSION, "days": [cur[k] for k in sorted(cur)]},
+                                      ensure_ascii=False, separators=(",", ":")))
+    hp = TXO_ROOT / "reports" / "index.html"
+    page = _DASH_TMPL.substitute(dash_ver=DASH_VERSION)
+    if not hp.exists() or hp.read_text(encoding="utf-8") != page:
+        _atomic_write_text(hp, page)
+    return len(cur)
+
+
+_DASH_TMPL = Template("""<!doctype html><html lang="zh-Hant"><head><meta charset="utf-8">
+<meta name="gex-dash" content="$dash_ver">
+<title>TXO GEX 儀表板</title><style>
+body{margin:0;background:#0e1116;color:#e6e8eb;font-family:"Microsoft JhengHei","Noto Sans TC",sans-serif;line-height:1.7;font-size:16px}
+.wrap{max-width:1060px;margin:0 auto;padding:20px 18px 60px} h1{font-size:24px;margin:0 0 8px}
+h2{font-size:19px;margin:22px 0 8px;border-left:4px solid #f5d90a;padding-left:10px}
+.mut{color:#9aa3ad;font-size:14px} .pos{color:#26a69a} .neg{color:#ef5350} .warn{color:#f5d90a}
+.bar{display:flex;gap:8px;align-items:center;flex-wrap:wrap}
+select,button{background:#161b22;color:#e6e8eb;border:1px solid #2a313c;border-radius:6px;padding:5px 10px;font-size:15px}
+.cards{display:flex;gap:10px;flex-wrap:wrap;margin:14px 0}
+.card{background:#161b22;border:1px solid #2a313c;border-radius:10px;padding:10px 16px;min-width:150px}
+.card .n{font-size:13px;color:#9aa3ad} .card .v{font-size:23px}
+svg{width:100%;height:auto;background:#0b0e13;border:1px solid #2a313c;border-radius:8px}
+a{color:#5e9bd0}
+</style></head><body><div class="wrap">
+<h1>TXO 做市商曝險地圖 · 多日儀表板</h1>
+<div class="bar"><button id="prev">&larr; 前一日</button><select id="day"></select>
+<button id="next">後一日 &rarr;</button><a id="full" href="#">完整報告</a>
+<span class="mut">(&larr; / &rarr; 鍵切換)</span></div>
+<h2>總 GEX 走勢 <span class="mut">(點一下跳到那天)</span></h2><div id="hist"></div>
+<div class="cards" id="cards"></div>
+<h2>GEX(S) 曲線</h2><div id="curve"></div>
+<p class="mut">X 軸=假設的 TXF 價位 · <span style="color:#5e9bd0">■ GEX</span> <span style="color:#f0997b">■ GEX+</span>
+<span style="color:#b3a4ff">■ 毛 gamma</span> · <span style="color:#f5d90a">┃</span> Gamma Flip · <span style="color:#9aa3ad">┋</span> 現價</p>
+<h2>GEX 各履約價 <span class="mut">(TXF 座標)</span></h2><div id="gexbars"></div>
+<h2>VEX 各履約價</h2><div id="vexbars"></div>
+<p class="mut" id="foot"></p>
+</div><script>
+"use strict";
+var DAYS = [], CACHE = {}, CUR = -1;
+function f0(v) { return v == null ? "N/A" : Math.round(v).toLocaleString(); }
+function sg(v, n) { return v == null ? "N/A" : (v >= 0 ? "+" : "") + v.toFixed(n); }
+function svg(w, h, parts) {
+  return '<svg viewBox="0 0 ' + w + ' ' + h + '" xmlns="http://www.w3.org/2000/svg">' + parts.join("") + "</svg>";
+}
+function ln(x1, y1, x2, y2, c, dash) {
+  return '<line x1="' + x1.toFixed(0) + '" y1="' + y1.toFixed(0) + '" x2="' + x2.toFixed(0) + '" y2="' + y2.toFixed(0) +
+    '" stroke="' + c + '"' + (dash ? ' stroke-dasharray="' + dash + '"' : "") + "/>";
+}
+function tx(x, y, s, c, anc, size) {
+  return '<text x="' + x.toFixed(0) + '" y="' + y.toFixed(0) + '" fill="' + c + '" font-size="' + (size || 12) +
+    '" text-anchor="' + (anc || "middle") + '">' + s + "</text>";
+}
+function load(i) {
+  var d = DAYS[i].date, key = d.replace(/-/g, "");
+  if (!CACHE[d]) CACHE[d] = fetch("data/gex_" + key + ".json").then(function (r) { return r.json(); });
+  return CACHE[d];
+}
+function histSvg() {
+  var w = 1000, h = 120, n = DAYS.length, vals = DAYS.map(function (r) { return r.tot_us || 0; });
+  var lo = Math.min(0, Math.min.apply(null, vals)), hi = Math.max(0, Math.max.apply(null, vals)) || 1;
+  var X = function (i) { return 40 + i / Math.max(n - 1, 1) * (w - 60); };
+  var Y = function (v) { return 10 + (hi - v) / (hi - lo || 1) * (h - 30); };
+  var P = [ln(40, Y(0), w - 20, Y(0), "#3a424e")], bw = Math.max(1, (w - 60) / Math.max(n, 1) - 1);
+  for (var i = 0; i < n; i++) {
+    var v = vals[i], y = Math.min(Y(v), Y(0)), hh = Math.max(Math.abs(Y(v) - Y(0)), 1);
+    P.push('<rect data-i="' + i + '" x="' + (X(i) - bw / 2).toFixed(1) + '" y="' + y.toFixed(1) + '" width="' + bw.toFixed(1) +
+      '" height="' + hh.toFixed(1) + '" fill="' + (i === CUR ? "#f5d90a" : (v >= 0 ? "#26a69a" : "#ef5350")) +
+      '" style="cursor:pointer"><title>' + DAYS[i].date + " " + sg(v, 1) + "</title></rect>");
+  }
+  if (n) { P.push(tx(40, h - 4, DAYS[0].date, "#5a6470", "start")); P.push(tx(w - 20, h - 4, DAYS[n - 1].date, "#5a6470", "end")); }
+  return svg(w, h, P);
+}
+function curveSvg(g) {
+  var w = 880, h = 300, p = g.profile, xs = p.x;
+  if (xs.length < 2) return "<p class='mut'>(無曲線)</p>";
+  var ys = p.us.concat(p.gross, p.gp).filter(function (v) { return v != null; });
+  var lo = Math.min(0, Math.min.apply(null, ys)), hi = Math.max.apply(null, ys), x0 = xs[0], x1 = xs[xs.length - 1];
+  var X = function (x) { return 50 + (x - x0) / (x1 - x0) * (w - 70); };
+  var Y = function (v) { return 20 + (hi - v) / (hi - lo || 1) * (h - 60); };
+  var P = [ln(50, Y(0), w - 20, Y(0), "#2a313c"), tx(44, Y(0) + 5, "0", "#5a6470", "end")];
+  [["us", "#5e9bd0", ""], ["gross", "#b3a4ff", "6 4"], ["gp", "#f0997b", ""]].forEach(function (s) {
+    var pts = xs.map(function (x, i) { return p[s[0]][i] == null ? "" : X(x).toFixed(0) + "," + Y(p[s[0]][i]).toFixed(0); }).join(" ");
+    P.push('<polyline fill="none" stroke="' + s[1] + '" stroke-width="2.2"' + (s[2] ? ' stroke-dasharray="' + s[2] + '"' : "") + ' points="' + pts + '"/>');
+  });
+  if (g.fut) P.push(ln(X(g.fut), 14, X(g.fut), h - 20, "#9aa3ad", "5 4"));
+  if (g.flip_us) P.push(ln(X(g.flip_us), 14, X(g.flip_us), h - 20, "#f5d90a", "3 3"));
+  for (var k = Math.ceil(x0 / 1000) * 1000; k < x1; k += 1000) P.push(tx(X(k), h - 4, k, "#5a6470", "middle", 13));
+  return svg(w, h, P);
+}
+function barsSvg(g, field, thr, unit) {
+  var w = 880, h = 300, S = g.fut, rr = g.ratio || 1, st = g.strikes, pts = [];
+  for (var i = 0; i < st.K.length; i++) {
+    var k = st.K[i] / rr, v = st[field][i];
+    if (v != null && Math.abs(v) > thr && k > S * 0.94 && k < S * 1.06) pts.push([k, v, st.K[i]]);
+  }
+  if (!pts.length) return "<p class='mut'>(無顯著 strike)</p>";
+  var vmax = Math.max.apply(null, pts.map(function (q) { return Math.abs(q[1]); })) || 1;
+  var x0 = pts[0][0] - 100, x1 = pts[pts.length - 1][0] + 100;
+  var X = function (k) { return 56 + (k - x0) / (x1 - x0) * (w - 76); };
+  var Y = function (v) { return h / 2 - v / vmax * (h / 2 - 30); };
+  var P = [ln(56, h / 2, w - 20, h / 2, "#2a313c")];
+  [1, 0.5, -0.5, -1].forEach(function (f) { P.push(ln(56, Y(vmax * f), w - 20, Y(vmax * f), "#1c222b", "2 4"), tx(50, Y(vmax * f) + 5, sg(vmax * f, 1), "#5a6470", "end")); });
+  pts.forEach(function (q) {
+    var y = Math.min(Y(q[1]), h / 2), hh = Math.max(Math.abs(Y(q[1]) - h / 2), 2);
+    P.push('<rect x="' + (X(q[0]) - 3.5).toFixed(0) + '" y="' + y.toFixed(0) + '" width="7" height="' + hh.toFixed(0) + '" fill="' +
+      (q[1] >= 0 ? "#26a69a" : "#ef5350") + '"><title>TXF ' + f0(q[0]) + "(履約價 " + f0(q[2]) + "): " + sg(q[1], 2) + " " + unit + "</title></rect>");
+  });
+  P.push(ln(X(S), 20, X(S), h - 20, "#9aa3ad", "5 4"), tx(X(S) + 4, 16, "現價 " + f0(S), "#9aa3ad", "start", 15));
+  if (field === "gex_us" && g.flip_us && g.flip_us > x0 && g.flip_us < x1) P.push(ln(X(g.flip_us), 20, X(g.flip_us), h - 20, "#f5d90a", "3 3"));
+  for (var t = Math.ceil(x0 / 500) * 500; t < x1; t += 500) P.push(tx(X(t), h - 4, t, "#5a6470", "middle", 13));
+  return svg(w, h, P);
+}
+function card(n, v, cls, sub) {
+  return '<div class="card"><div class="n">' + n + '</div><div class="v ' + (cls || "") + '">' + v + "</div>" +
+    (sub ? '<div class="n">' + sub + "</div>" : "") + "</div>";
+}
+function show(i) {
+  if (i < 0 || i >= DAYS.length) return;
+  CUR = i;
+  document.getElementById("day").value = String(i);
+  document.getElementById("hist").innerHTML = histSvg();
+  load(i).then(function (g) {
+    if (CUR !== i) return;
+    var pc = g.pct || {}, dp = g.flip_us ? (g.fut / g.flip_us - 1) * 100 : null;
+    document.getElementById("cards").innerHTML =
+      card("TXF 近月", f0(g.fut), "", "現貨 " + f0(g.spot)) +
+      card("Gamma Flip", f0(g.flip_us), "warn", dp == null ? "無翻轉點" : "現價 " + sg(dp, 2) + "%") +
+      card("GEX+ Flip", f0(g.flip_gp), "", "β=" + g.beta + " · " + g.vol_mode) +
+      card("總 GEX", sg(g.tot_us, 1), g.tot_us >= 0 ? "pos" : "neg", pc.us != null ? "近 " + pc.n + " 日第 " + pc.us + " 百分位" : "億/1%") +
+      card("近月 ATM IV", g.front_iv == null ? "N/A" : (g.front_iv * 100).toFixed(1) + "%", "",
+        g.day_move == null ? "" : "一日 &plusmn;" + g.day_move.toFixed(2) + "%");
+    document.getElementById("curve").innerHTML = curveSvg(g);
+    document.getElementById("gexbars").innerHTML = barsSvg(g, "gex_us", 0.4, "億/1%");
+    document.getElementById("vexbars").innerHTML = barsSvg(g, "vex_vn", 0.02, "億/vol點");
+    document.getElementById("full").href = "gex_" + g.date.replace(/-/g, "") + ".html";
+    document.getElementById("foot").textContent = "到期:" + g.exp.map(function (e) { return e.code + "(" + e.days + "d)"; }).join(" · ") +
+      " | 履約價 ×" + (1 / g.ratio).toFixed(4) + " = TXF 座標";
+    if (i > 0) load(i - 1);
+    if (i < DAYS.length - 1) load(i + 1);
+  }).catch(function (e) {
+    document.getElementById("cards").innerHTML = "<p class='neg'>讀不到 " + DAYS[i].date + " 的資料(" + e + ")</p>";
+  });
+}
+fetch("data/index.json").then(function (r) { return r.json(); }).then(function (idx) {
+  DAYS = idx.days;
+  document.getElementById("day").innerHTML = DAYS.map(function (r, i) {
+    return '<option value="' + i + '">' + r.date + "  " + sg(r.tot_us, 1) + "</option>";
+  }).join("");
+  show(DAYS.length - 1);
+}).catch(function (e) {
+  document.getElementById("cards").innerHTML = "<p class='neg'>讀不到 data/index.json(" + e +
+    ")。file:// 會被瀏覽器擋:請在 reports/ 目錄執行 python -m http.server 後開 http://localhost:8000/</p>";
+});
+document.getElementById("day").onchange = function () { show(+this.value); };
+document.getElementById("prev").onclick = function () { show(CUR - 1); };
+document.getElementById("next").onclick = function () { show(CUR + 1); };
+document.getElementById("hist").onclick = function (ev) { var i = ev.target.getAttribute("data-i"); if (i != null) show(+i); };
+document.addEventListener("keydown", function (ev) {
+  if (ev.key === "ArrowLeft") show(CUR - 1);
+  if (ev.key === "ArrowRight") show(CUR + 1);
+});
+</script></body></html>""")
 
 
 def log_event(rec):
@@ -1579,14 +2450,14 @@ def backfill_institutional(d, days=7):
     return done
 
 
-def run_with_wait(d, deadline_hhmm="16:30", poll_sec=180, force=False):
+def run_with_wait(d, deadline_hhmm="16:30", poll_sec=180, force=False, vol_mode="sticky_strike"):
     """輪詢等待資料公布:一拿到就出圖收工;逾時放棄並記錄(假日會走到這條)。"""
     hh, mm = (int(x) for x in deadline_hhmm.split(":"))
     deadline = datetime.now().replace(hour=hh, minute=mm, second=0, microsecond=0)
     attempt = 0
     while True:
         attempt += 1
-        if run_one(d, force=force):
+        if run_one(d, force=force, vol_mode=vol_mode):
             print(f"[WAIT] 第 {attempt} 次嘗試取得資料")
             log_event({"date": str(d), "attempt": attempt, "ok": True, "mode": "wait"})
             write_gex_state(d, True, attempt)
@@ -1631,7 +2502,77 @@ def verify_previous(d):
 
 # ---------------- 入口 ----------------
 
-def run_one(d, force=False, report_only=False):
+def _stored_meta(series):
+    """已存 quotes 重算時的 meta(build_series 的那些統計已不可得,只留報告要用的)。"""
+    S = series[0]["spot"]
+    return {"n_series": len(series), "n_iv_fallback": 0, "S": S, "spot": S,
+            "spot_src": "已存 quotes", "fut_front": series[0].get("fut_front", S),
+            "basis": series[0].get("fut_front", S) - S}
+
+
+def _report_current(out, qpath, marker):
+    """既有輸出是否已是最新:檔頭帶著當前版本標記,且比 quotes 新(讀檔頭幾百 bytes 就知道)。"""
+    if not out.exists() or out.stat().st_mtime < qpath.stat().st_mtime:
+        return False
+    with out.open("r", encoding="utf-8", errors="replace") as f:
+        head = f.read(400)
+    return marker in head
+
+
+def render_reports(d0, d1, force=False, vol_mode="sticky_strike", html=True):
+    """批次只重出報告(`--render-only`):不重寫摘要 / 面板 / 對賬,也不抓網路。
+
+    衍生表讀一次共用、GEX 走 cached_gex(命中就不重算)、已是最新版的輸出跳過(force 例外)。
+    latest.html 只在重出「最新一天」時更新 —— 重出舊報告不該把首頁換成舊地圖。
+    html=False(`--dash-only`)只寫儀表板 JSON,不組整份 HTML。
+    非預設 vol_mode 只寫(也只比對)gex_<日>_<模式>.html;latest.html 與儀表板不動(同 render_html)。
+    """
+    dash = vol_mode == VOL_MODES[0]
+    if not (html or dash):
+        raise ValueError(f"儀表板只收預設 vol_mode({VOL_MODES[0]});{vol_mode} 沒有東西可寫")
+    qfiles = {datetime.strptime(f.stem[-8:], "%Y%m%d").date(): f
+              for f in TXO_ROOT.glob("quotes/*/TXO_quotes_*.parquet")}
+    days = sorted(x for x in qfiles if d0 <= x <= d1)
+    if not days:
+        print(f"[RENDER] {d0}~{d1} 無已存 quotes")
+        return 0
+    newest = max(qfiles)
+    tables = load_report_tables({x.year for x in days})
+    t0, done, skipped, rows = time.time(), 0, 0, []
+    for x in days:
+        qp = qfiles[x]
+        if not force and (not html or _report_current(report_path(x, vol_mode), qp,
+                                                      f'content="{REPORT_MARK}"')) \
+                and (not dash or _report_current(dash_json_path(x), qp,
+                                                 f'"v":"{DASH_VERSION}","model":"{GEX_MODEL_VERSION}"')):
+            skipped += 1
+            continue
+        series = pl.read_parquet(qp).to_dicts()
+        if not series or "spot" not in series[0]:
+            print(f"[RENDER-SKIP] {x} 已存 quotes 是舊格式")
+            continue
+        meta = _stored_meta(series)
+        meta["atr"] = atr_txf(x)
+        gex, _ = cached_gex(x, qp, series, meta["fut_front"], vol_mode=vol_mode)
+        ih = tables["inst"].get(x.year)
+        inst = (ih.filter(pl.col("date") == str(x)).to_dicts() if ih is not None else None) or None
+        expiries = sorted({(s["exp_code"], s["Td"]) for s in series}, key=lambda e: e[1])
+        expiries = [{"code": c, "days": t} for c, t in expiries]
+        pct = percentiles(x, summary=tables["summary"]) if tables["summary"] is not None else {}
+        ctx = report_context(x, meta["S"], meta, gex, inst, expiries, pct, tables=tables)
+        if html:
+            write_report(x, render_report(ctx), latest=(x == newest), vol_mode=vol_mode)
+        if dash:
+            rows.append(write_day_json(ctx))
+        done += 1
+    n_dash = update_dash_index(rows) if dash else 0
+    print(f"[RENDER] {d0}~{d1}:重出 {done} 份、已是最新 {skipped} 份;"
+          + (f"儀表板共 {n_dash} 天" if dash else f"{vol_mode} 不進儀表板")
+          + f"({time.time() - t0:.1f}s)")
+    return done
+
+
+def run_one(d, force=False, report_only=False, vol_mode="sticky_strike"):
     qpath = TXO_ROOT / "quotes" / f"{d.year}" / f"TXO_quotes_{d.strftime('%Y%m%d')}.parquet"
     if report_only or (qpath.exists() and not force):
         if not qpath.exists():
@@ -1642,9 +2583,7 @@ def run_one(d, force=False, report_only=False):
             print(f"[SKIP] {d} 已存 quotes 是舊格式(無遠期欄位),請用 --force 重建")
             return False
         S = series[0]["spot"]
-        meta = {"n_series": len(series), "n_iv_fallback": 0, "S": S, "spot": S,
-                "spot_src": "已存 quotes", "fut_front": series[0].get("fut_front", S),
-                "basis": series[0].get("fut_front", S) - S}
+        meta = _stored_meta(series)
         stored = False
     else:
         series, meta = build_series(d)
@@ -1656,7 +2595,7 @@ def run_one(d, force=False, report_only=False):
             s["fut_front"] = meta["fut_front"]
         _, stored = store_quotes(d, series, force=force)
     meta['atr'] = atr_txf(d)
-    gex = compute_gex(series, meta['fut_front'])
+    gex, cache_hit = cached_gex(d, qpath, series, meta['fut_front'], vol_mode=vol_mode)
     if report_only:                      # 純重生報告:法人資料讀已存的,不重抓
         ip = TXO_ROOT / "institutional" / f"pc_{d.year}.parquet"
         inst = (pl.read_parquet(ip).filter(pl.col("date") == str(d)).to_dicts()
@@ -1665,16 +2604,31 @@ def run_one(d, force=False, report_only=False):
         inst = fetch_institutional(d)
         if inst:
             store_institutional(d, inst)
-    store_summary(d, meta, gex)              # B2:落地每日摘要
-    pct = percentiles(d, gex)                # B2:場強百分位
-    reconcile(d)                             # B3:前一日地圖 vs 今日實際
+    # ⚠️ 歷史(摘要 / 面板 / 對賬 / 盤中讀數)只收預設 vol_mode:這些表沒有模式欄,
+    #    混進 sticky_moneyness 的 flip 會讓百分位、z 分數與對賬跨模式比較。其他模式只出報告。
+    history = vol_mode == VOL_MODES[0]
+    if history:
+        store_summary(d, meta, gex)          # B2:落地每日摘要
+        store_panel(d, series, gex)          # 逐履約價歷史面板
+    else:
+        print(f"[VOL-MODE] {vol_mode}:不寫摘要 / 面板 / 對賬 / 盤中讀數,只出 {report_path(d, vol_mode).name}")
+    pct = percentiles(d)                     # B2:場強百分位(store_summary 已算好)
+    if history:
+        reconcile(d)                         # B3:前一日地圖 vs 今日實際
+    _pm = _prev_map_date(d) if history else None
+    if _pm:
+        try:                                 # 前一日地圖在今日 5m 路徑上的逐棒讀數(衍生品,不擋報告)
+            intraday_gex(_pm, d, vol_mode=vol_mode)
+        except Exception as ex:  # noqa: BLE001
+            print(f"[INTRADAY] {_pm}→{d} 失敗(不影響報告):{ex!r}")
     expiries = sorted({(s["exp_code"], s["Td"]) for s in series}, key=lambda x: x[1])
     expiries = [{"code": c, "days": t} for c, t in expiries]
-    rpt = render_html(d, S, meta, gex, inst, expiries, pct)
+    rpt = render_html(d, S, meta, gex, inst, expiries, pct, vol_mode=vol_mode)
     print(f"[OK] {d} spot={S:,.0f}(基差{meta['basis']:+.0f}) flip={gex['flip_us']} "
           f"totGEX_us={gex['tot_us']:+.1f}(P{pct.get('us','-')}) "
           f"totGEX_tw={gex['tot_tw']:+.1f} inst={'Y' if inst else 'N'} "
-          f"quotes={'wrote' if stored else 'cached'} report={rpt.name}")
+          f"quotes={'wrote' if stored else 'cached'} gex={'cached' if cache_hit else 'computed'} "
+          f"report={rpt.name}")
     return True
 
 
@@ -1700,23 +2654,42 @@ def main():
     ap.add_argument("--backfill", nargs=2, metavar=("START", "END"))
     ap.add_argument("--force", action="store_true")
     ap.add_argument("--report-only", action="store_true")
+    ap.add_argument("--render-only", action="store_true",
+                    help="只重出 HTML(不寫摘要/對賬、不抓網路);已是最新版的報告跳過,--force 全部重出")
+    ap.add_argument("--reconcile-all", action="store_true",
+                    help="以 daily_summary × TXF 1d 一次重生整個 reconcile.parquet(改了對賬指標後用)")
+    ap.add_argument("--dash-only", action="store_true",
+                    help="同 --render-only 但只寫儀表板 JSON(reports/data/),不組整份 HTML")
     ap.add_argument("--wait", action="store_true", help="輪詢等待資料公布(排程用)")
     ap.add_argument("--wait-until", default="16:30", help="輪詢截止時刻 HH:MM")
     ap.add_argument("--poll-sec", type=int, default=180, help="輪詢間隔秒數")
+    ap.add_argument("--vol-mode", choices=VOL_MODES, default="sticky_strike",
+                    help="現價移動時 IV 的動態(只影響 GEX(S) 曲線與 flip;預設與歷史報告一致。"
+                         "非預設模式只另存 gex_<日>_<模式>.html,不寫摘要 / 面板 / 對賬 / 儀表板)")
     a = ap.parse_args()
     if a.wait:  # 排程模式:輸出另存日誌
         lp = TXO_ROOT / "logs" / f"run-{date.today()}.log"
         lp.parent.mkdir(parents=True, exist_ok=True)
         sys.stdout = _Tee(sys.stdout, lp)
         print(f"\n===== {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 排程啟動 =====")
-    if a.backfill:
+    if a.reconcile_all:
+        reconcile_all()
+    elif a.render_only or a.dash_only:
+        if a.dash_only and a.vol_mode != VOL_MODES[0]:
+            ap.error(f"--dash-only 只收預設 --vol-mode({VOL_MODES[0]}):儀表板不混模式")
+        if a.backfill:
+            d0, d1 = (datetime.strptime(x, "%Y-%m-%d").date() for x in a.backfill)
+        else:
+            d0 = d1 = datetime.strptime(a.date, "%Y-%m-%d").date() if a.date else date.today()
+        render_reports(d0, d1, force=a.force, vol_mode=a.vol_mode, html=not a.dash_only)
+    elif a.backfill:
         d0 = datetime.strptime(a.backfill[0], "%Y-%m-%d").date()
         d1 = datetime.strptime(a.backfill[1], "%Y-%m-%d").date()
         ok = 0
         d = d0
         while d <= d1:
             if d.weekday() < 5:
-                if run_one(d, force=a.force, report_only=a.report_only):
+                if run_one(d, force=a.force, report_only=a.report_only, vol_mode=a.vol_mode):
                     ok += 1
                 time.sleep(2)  # 對 TAIFEX 客氣
             d += timedelta(days=1)
@@ -1724,8 +2697,8 @@ def main():
     else:
         d = datetime.strptime(a.date, "%Y-%m-%d").date() if a.date else date.today()
         if a.wait:
-            run_with_wait(d, a.wait_until, a.poll_sec, force=a.force)
-        elif run_one(d, force=a.force, report_only=a.report_only):
+            run_with_wait(d, a.wait_until, a.poll_sec, force=a.force, vol_mode=a.vol_mode)
+        elif run_one(d, force=a.force, report_only=a.report_only, vol_mode=a.vol_mode):
             log_event({"date": str(d), "attempt": 1, "ok": True, "mode": "manual"})
             if not a.report_only:
                 # 手動補跑要能**解除警報**,否則 consecutive_failures 會卡在高點誤報。
@@ -5,14 +5,18 @@
   - sync 跑完接著跑 `python validate_lake.py`(預設驗「今天」寫入的檔),
     通過印 ✅ PASS;有問題印 ❌ 並逐檔列出原因,當下就攔下髒資料,
     不會像「週末測試盤/週日幻影」那樣累積數年才發現。
-  - 一次性全庫體檢:`python validate_lake.py --all`。
+  - 一次性全庫體檢:`python validate_lake.py --all`(process pool 平行)。
+    加 `--incremental` 只驗自上次 PASS 後有變動(mtime/大小)的檔。
 
 檢查項目(對每個 kbar 檔):
   ① schema:必含 [symbol, date, ts, session, open, high, low, close, volume]
   ② 交易日:date 欄不得為週末(週六/週日)—— 真實交易日永遠是週一~五
   ③ 盤別:session 標記需與 ts 時間一致(Day ⇔ 08:30 ≤ t < 13:45:05)
   ④ 量:volume 必須 > 0
-  ⑤ 排序:ts 嚴格遞增、無重複
+  ⑤ 排序:ts 嚴格遞增、無重複;同 (tf, 商品) 相鄰日檔的 ts 區間不得重疊
+
+能由 parquet footer 統計定案的(schema / 列數 / null / 日檔週末 / volume min / 跨檔區間)
+只讀 footer;其餘才升級成「只拉需要欄位」的解碼(見 `_footer_tier`)。
 """
 
 import os
@@ -31,63 +35,236 @@ import polars as pl
 
 from config.settings import CACHE_ROOT, DATA_ROOT, TIMEFRAMES
 from config.calendar_rules import DAY_START, DAY_END
+from core.pool import spawn_pool
 
 TARGET_SYMBOLS = ["TXF", "TSE", "TXFR2"]
 REQUIRED_COLS = ["symbol", "date", "ts", "session", "open", "high", "low", "close", "volume"]
 
+#: `--incremental` 的結果簿:上次 PASS 時各檔的 (mtime_ns, size)。
+#: 放在 CACHE_ROOT 底下 —— 它描述的是 cache 檔,cache 整個砍掉重建時它也該一起消失。
+#: (`_all_kbar_files` 的 glob 深度碰不到 `_meta/*.parquet`,不會被當成 kbar 驗。)
+STATE_PATH = os.path.join(CACHE_ROOT, "_meta", "validate_state.parquet")
+
+
+def _footer_tier(path: str):
+    """統計層:**只讀 parquet footer**(`pyarrow.parquet.read_metadata`),不解碼任何資料頁。
+
+    回傳 `(issues, escalate, ts_range, schema)`:
+      - `issues`      footer 就能定案的問題(①、空檔、null)
+      - `escalate`    footer 判不了、必須解碼的檢查代號集合(⊂ {"wknd","session","vol","order"})
+      - `ts_range`    (min_ts, max_ts) —— 跨檔排序檢查用;統計缺漏時為 None
+      - `schema`      polars schema(給解碼層決定型別分支);定案失敗時為 None
+
+    footer 能回答什麼、不能回答什麼(誠實的邊界):
+      ② 週末  —— 每個 row group 的 date [min, max] 若落在**同一週的週一~五**之內即定案 PASS;
+               週二~五的日檔(前一夜盤 + 當日)成立;週一日檔含上週五夜盤、
+               1d 年檔跨週 ⇒ 升級解碼(只拉 date 一欄)
+      ④ 量    —— 每個 row group 的 volume min > 0 即定案 PASS;min ≤ 0 要精確列數 ⇒ 升級
+      ③ 盤別 / ⑤ 排序唯一 —— **逐列性質,統計量證明不了** ⇒ 一律升級,但只解碼 ts(+session)
+    """
+    import pyarrow.parquet as pq          # footer 專用;polars 已隱含依賴 pyarrow(requirements.txt)
 
-def validate_file(path: str) -> list[str]:
-    """驗證單一 parquet 檔,回傳問題訊息清單(空 = 通過)。"""
-    issues = []
     try:
-        df = pl.read_parquet(path)
+        md = pq.read_metadata(path)
+        arrow_schema = md.schema.to_arrow_schema()
     except Exception as e:
-        return [f"讀檔失敗:{e}"]
+        return [f"讀檔失敗:{e}"], set(), None, None
 
-    if df.is_empty():
-        return ["空檔(0 列)"]
+    if md.num_rows == 0:
+        return ["空檔(0 列)"], set(), None, None
 
     # ① schema
-    missing = [c for c in REQUIRED_COLS if c not in df.columns]
+    missing = [c for c in REQUIRED_COLS if c not in arrow_schema.names]
     if missing:
-        issues.append(f"缺欄位 {missing}")
-        return issues  # 缺核心欄位,後續檢查無意義
+        return [f"缺欄位 {missing}"], set(), None, None  # 缺核心欄位,後續檢查無意義
+    schema = pl.Schema(pl.from_arrow(arrow_schema.empty_table()).schema)
 
-    # ② 交易日不得為週末(polars weekday: 一=1 … 六=6, 日=7)
-    if df["date"].dtype in (pl.Datetime, pl.Date):
-        n_wknd = int(df["date"].dt.weekday().is_in([6, 7]).sum())
-        if n_wknd:
-            bad = df.filter(pl.col("date").dt.weekday().is_in([6, 7]))["date"].unique().to_list()
-            issues.append(f"date=週末 {n_wknd} 列(日期:{[str(d)[:10] for d in bad]})")
+    col_idx = {md.schema.column(i).path: i for i in range(md.num_columns)}
+    # 每個必要欄位在各 row group 的 Statistics(缺統計的 row group 記 None)
+    stats = {c: [md.row_group(g).column(col_idx[c]).statistics for g in range(md.num_row_groups)]
+             for c in REQUIRED_COLS}
+
+    issues = []
+    nulls = {c: sum(st.null_count for st in sts if st is not None and st.has_null_count)
+             for c, sts in stats.items()}
+    if any(nulls.values()):
+        issues.append("必要欄含 null:" + ", ".join(f"{c}={n}" for c, n in nulls.items() if n))
+
+    def all_minmax(c):
+        sts = stats[c]
+        return all(st is not None and st.has_min_max for st in sts)
+
+    escalate = {"order"}
+    if schema["ts"] == pl.Datetime:
+        escalate.add("session")
+
+    if schema["date"] in (pl.Datetime, pl.Date):
+        ok = all_minmax("date") and all(
+            (mn := _as_date(st.min)).weekday() < 5 and (mx := _as_date(st.max)).weekday() < 5
+            and 0 <= (mx - mn).days == mx.weekday() - mn.weekday()
+            for st in stats["date"])
+        if not ok:
+            escalate.add("wknd")
     else:
-        issues.append(f"date 欄型別非日期:{df['date'].dtype}")
+        issues.append(f"date 欄型別非日期:{schema['date']}")
 
-    # ③ session 與 ts 時間一致性
-    if df["ts"].dtype == pl.Datetime:
+    if not (all_minmax("volume") and all(st.min > 0 for st in stats["volume"])):
+        escalate.add("vol")
+
+    ts_range = None
+    if all_minmax("ts"):
+        ts_range = (min(st.min for st in stats["ts"]), max(st.max for st in stats["ts"]))
+    return issues, escalate, ts_range, schema
+
+
+def _as_date(v):
+    return v.date() if isinstance(v, datetime) else v
+
+
+def _decode_tier(path: str, escalate: set, schema) -> list[str]:
+    """解碼層:只為 `escalate` 裡的檢查拉**需要的欄**,單一 lazy 聚合 select 算完。
+
+    訊息字串與判準與舊版**逐字不變**(daily_sync 的 SUMMARY 靠它們)。
+    """
+    aggs, cols = [], {"ts"}
+    if "vol" in escalate:                                                   # ④
+        aggs.append((pl.col("volume") <= 0).sum().alias("n_zero"))
+        cols.add("volume")
+    if "order" in escalate:                                                 # ⑤
+        aggs += [(pl.len() - pl.col("ts").n_unique()).alias("n_dup"),
+                 (pl.col("ts") >= pl.col("ts").shift(1)).all().alias("sorted")]  # 首列 null 不計
+    if "wknd" in escalate:                                                  # ②
+        wknd = pl.col("date").dt.weekday().is_in([6, 7])
+        aggs += [wknd.sum().alias("n_wknd"),
+                 pl.col("date").filter(wknd).unique().sort().implode().alias("wknd_dates")]
+        cols.add("date")
+    if "session" in escalate:                                               # ③
         t = pl.col("ts").dt.time()
         is_day_time = (t >= DAY_START) & (t < DAY_END)
-        mism = df.filter(
-            ((pl.col("session") == "Day") & ~is_day_time)
-            | ((pl.col("session") == "Night") & is_day_time)
-        )
-        if len(mism):
-            issues.append(f"session 與 ts 時間不一致 {len(mism)} 列")
+        aggs.append((((pl.col("session") == "Day") & ~is_day_time)
+                     | ((pl.col("session") == "Night") & is_day_time)).sum().alias("n_mism"))
+        cols.add("session")
+    if not aggs:
+        return []
+    try:
+        r = (pl.scan_parquet(path).select(sorted(cols)).select(aggs)
+             .collect().row(0, named=True))
+    except Exception as e:
+        return [f"讀檔失敗:{e}"]
 
+    issues = []
+    # ② 交易日不得為週末(polars weekday: 一=1 … 六=6, 日=7)
+    if r.get("n_wknd"):
+        issues.append(f"date=週末 {r['n_wknd']} 列(日期:{[str(d)[:10] for d in r['wknd_dates']]})")
+    # ③ session 與 ts 時間一致性
+    if r.get("n_mism"):
+        issues.append(f"session 與 ts 時間不一致 {r['n_mism']} 列")
     # ④ volume
-    n_zero = int((df["volume"] <= 0).sum())
-    if n_zero:
-        issues.append(f"volume<=0 {n_zero} 列")
-
+    if r.get("n_zero"):
+        issues.append(f"volume<=0 {r['n_zero']} 列")
     # ⑤ ts 嚴格遞增、無重複
-    n_dup = len(df) - df["ts"].n_unique()
-    if n_dup:
-        issues.append(f"ts 重複 {n_dup} 列")
-    if not df["ts"].is_sorted():
+    if r.get("n_dup"):
+        issues.append(f"ts 重複 {r['n_dup']} 列")
+    if "sorted" in r and not r["sorted"]:
         issues.append("ts 未排序")
-
     return issues
 
 
+def _validate_entry(path: str):
+    """(issues, ts_range) —— 統計層先判,判不了的才升級解碼。process pool 的工作單位。"""
+    issues, escalate, ts_range, schema = _footer_tier(path)
+    if schema is None:
+        return issues, None
+    return _order_issues(issues + _decode_tier(path, escalate, schema)), ts_range
+
+
+_ISSUE_ORDER = ("讀檔", "空檔", "缺欄位", "必要欄含 null", "date", "session", "volume", "ts")
+
+
+def _order_issues(issues: list[str]) -> list[str]:
+    """兩層各自產生的訊息依 ①→⑤ 排回固定順序(報告 diff 才穩定)。"""
+    def rank(msg):
+        return next((i for i, k in enumerate(_ISSUE_ORDER) if msg.startswith(k)), len(_ISSUE_ORDER))
+    return sorted(issues, key=rank)
+
+
+def validate_file(path: str) -> list[str]:
+    """驗證單一 parquet 檔,回傳問題訊息清單(空 = 通過)。
+
+    兩層(2026-10):
+      ① **統計層** `_footer_tier` —— 只讀 footer:schema、列數、null、週末(日檔)、volume min
+      ② **解碼層** `_decode_tier` —— 只對統計判不了的檢查,lazy 拉**需要的欄**、單一聚合 select
+    原本是 `read_parquet` 整檔進來、五項檢查各自掃一遍;現在日檔的 OHLC 與累加欄
+    根本不解碼,②④ 多半在 footer 就定案。
+    """
+    return _validate_entry(path)[0]
+
+
+def _footer_ts_range(path: str):
+    """只讀 footer 的 (min_ts, max_ts);讀不到或統計缺漏 → None。鄰檔比對用(不驗該檔)。"""
+    import pyarrow.parquet as pq
+    try:
+        md = pq.read_metadata(path)
+        i = md.schema.names.index("ts")
+        sts = [md.row_group(g).column(i).statistics for g in range(md.num_row_groups)]
+    except Exception:
+        return None
+    if not sts or not all(st is not None and st.has_min_max for st in sts):
+        return None
+    return min(st.min for st in sts), max(st.max for st in sts)
+
+
+def _siblings(tf_sym: str) -> list[str]:
+    """同一 (tf, 商品) 的所有日檔,依檔名(= 日期)排序。"""
+    found = [os.path.normpath(p) for p in glob.glob(os.path.join(tf_sym, "*", "*.parquet"))
+             if "_backup" not in p]
+    return sorted(found, key=os.path.basename)
+
+
+def _cross_file_order(ranges: dict[str, tuple], range_of=_footer_ts_range) -> dict[str, list[str]]:
+    """跨檔排序(純 footer 統計):同一 (tf, 商品) 的**日檔**依檔名日期排,
+    前一檔的 max ts 必須 < 後一檔的 min ts —— 重疊 = 同一根棒落在兩個檔裡。
+
+    `ranges` 是本次驗過的檔;每個檔與它在**磁碟上**的前一檔、後一檔比 ——
+    鄰檔不必在本次範圍內(`--date` 只驗一天、`--incremental` 只驗變動的檔,
+    只比範圍內的檔就永遠湊不成對)。範圍外鄰檔的 ts 範圍由 `range_of(path)` 給
+    (呼叫端先查結果簿快取,沒有才讀 footer)。問題一律記在本次驗的那個檔上。
+
+    1d 年檔以 (date, session) 為鍵、不在此列。統計缺漏(ts 範圍為 None)的那一對跳過。
+    """
+    groups = {}
+    for p, rng in ranges.items():
+        if rng is None or os.path.basename(os.path.dirname(os.path.dirname(p))) == "1d":
+            continue
+        groups.setdefault(os.path.dirname(os.path.dirname(p)), []).append(p)   # .../<tf>/<sym>
+    out = {}
+
+    def rng_of(q):
+        return ranges[q] if q in ranges else range_of(q)
+
+    for tf_sym, mine in groups.items():
+        sib = _siblings(tf_sym)
+        pos = {q: i for i, q in enumerate(sib)}
+        for p in mine:
+            i = pos.get(os.path.normpath(p))
+            if i is None:
+                continue
+            r1 = ranges[p]
+            if i > 0:
+                p0 = sib[i - 1]
+                r0 = rng_of(p0)
+                if r0 is not None and r0[1] >= r1[0]:
+                    out.setdefault(p, []).append(
+                        f"ts 與前一檔重疊({os.path.basename(p0)} max {r0[1]} ≥ 本檔 min {r1[0]})")
+            if i + 1 < len(sib) and sib[i + 1] not in ranges:   # 後一檔也有驗 → 由它那邊報
+                p2 = sib[i + 1]
+                r2 = range_of(p2)
+                if r2 is not None and r1[1] >= r2[0]:
+                    out.setdefault(p, []).append(
+                        f"ts 與後一檔重疊(本檔 max {r1[1]} ≥ {os.path.basename(p2)} min {r2[0]})")
+    return out
+
+
 def _files_for_date(date_str: str) -> list[str]:
     """某交易日當天 sync 會寫入/更新的 kbar 檔(分時日檔 + 1d 年檔)。"""
     year = date_str[:4]
@@ -112,6 +289,52 @@ def _all_kbar_files() -> list[str]:
     ]
 
 
+def _stat_key(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _load_state() -> dict[str, tuple]:
+    """{相對 CACHE_ROOT 的路徑: (mtime_ns, size, ts_min, ts_max)} —— 只記上次 PASS 的檔。讀不到 = 空簿。
+
+    ts_min / ts_max 是該檔 footer 的 ts 範圍快取(跨檔排序比鄰檔用;舊簿沒有這兩欄 → None)。
+    """
+    if not os.path.exists(STATE_PATH):
+        return {}
+    try:
+        df = pl.read_parquet(STATE_PATH)
+    except Exception as e:
+        print(f"⚠️  結果簿讀取失敗({e}),本次全部重驗")
+        return {}
+    for c in ("ts_min", "ts_max"):
+        if c not in df.columns:
+            df = df.with_columns(pl.lit(None, dtype=pl.Datetime("us")).alias(c))
+    return {r[0]: tuple(r[1:]) for r in
+            df.select(["path", "mtime_ns", "size", "ts_min", "ts_max"]).iter_rows()}
+
+
+def _save_state(state: dict[str, tuple]) -> None:
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    df = pl.DataFrame(
+        {"path": list(state), "mtime_ns": [v[0] for v in state.values()],
+         "size": [v[1] for v in state.values()],
+         "ts_min": [v[2] for v in state.values()], "ts_max": [v[3] for v in state.values()]},
+        schema={"path": pl.Utf8, "mtime_ns": pl.Int64, "size": pl.Int64,
+                "ts_min": pl.Datetime("us"), "ts_max": pl.Datetime("us")},
+    ).sort("path")
+    tmp = f"{STATE_PATH}.tmp{os.getpid()}"
+    df.write_parquet(tmp)
+    os.replace(tmp, STATE_PATH)
+
+
+def _validate_many(files: list[str], workers: int) -> dict[str, tuple]:
+    """逐檔驗證 → {path: (issues, ts_range)};`workers > 1` 時以 process pool 平行。"""
+    if workers <= 1 or len(files) < 2:
+        return {p: _validate_entry(p) for p in files}
+    with spawn_pool(workers) as ex:
+        return dict(zip(files, ex.map(_validate_entry, files, chunksize=32)))
+
+
 def _check_completeness(date_str: str) -> list[str]:
     """當日**商品完整性**檢查(2026-07-22 事故補漏)。
 
@@ -152,6 +375,10 @@ def main():
     parser.add_argument("--date", type=str, default=datetime.now().strftime("%Y-%m-%d"),
                         help="驗證此交易日寫入的檔(預設今天)。格式 YYYY-MM-DD")
     parser.add_argument("--all", action="store_true", help="改為全庫體檢(忽略 --date)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="跳過自上次 PASS 後 mtime/大小都沒變的檔(結果簿:CACHE_ROOT/_meta)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="平行 process 數(預設:--all 用 CPU 數-1,單日用 1)")
     args = parser.parse_args()
 
     if args.all:
@@ -176,9 +403,45 @@ def main():
         print("⚠️  找不到檔案(該日可能無盤/未 sync)。")
         return 0
 
+    # 結果簿永遠載入(非增量的 run 也要**更新**它,不能覆寫成只剩本次那幾檔)
+    state = _load_state()
+    keys = {}
+    for p in files:
+        try:
+            keys[p] = _stat_key(p)
+        except OSError:
+            keys[p] = None                      # 讀不到 stat:照驗,讓 validate_file 報原因
+    rel_of = {p: os.path.relpath(p, CACHE_ROOT) for p in files}
+    todo = [p for p in sorted(files)
+            if not args.incremental or keys[p] is None
+            or state.get(rel_of[p], ())[:2] != keys[p]]
+    if args.incremental:
+        print(f"   ⏩ 增量:{len(files) - len(todo)} 檔自上次 PASS 後未變,略過;待驗 {len(todo)} 檔")
+
+    workers = args.workers or (max(1, (os.cpu_count() or 2) - 1) if args.all else 1)
+    results = _validate_many(todo, workers)
+    def neighbour_range(q):
+        """範圍外鄰檔的 ts 範圍:結果簿有、且 stat 沒變 → 快取;否則讀 footer。"""
+        hit = state.get(os.path.relpath(q, CACHE_ROOT))
+        try:
+            if hit and hit[2] is not None and hit[:2] == _stat_key(q):
+                return hit[2], hit[3]
+        except OSError:
+            return None
+        return _footer_ts_range(q)
+
+    # 跨檔排序:本次驗的檔 × 它在磁碟上的前後鄰檔(鄰檔不必在本次範圍內)
+    cross = _cross_file_order({p: rng for p, (_, rng) in results.items()}, neighbour_range)
+
     failed = 0
-    for p in sorted(files):
-        issues = validate_file(p)
+    for p in todo:
+        issues = results[p][0] + cross.get(p, [])
+        if not issues and keys[p] is not None:
+            rng = results[p][1]
+            cacheable = rng is not None and all(isinstance(x, datetime) for x in rng)
+            state[rel_of[p]] = keys[p] + (tuple(rng) if cacheable else (None, None))
+        else:
+            state.pop(rel_of[p], None)          # FAIL 的檔不能留在簿上,下次一定重驗
         if issues:
             failed += 1
             rel = os.path.relpath(p, DATA_ROOT)
@@ -186,6 +449,12 @@ def main():
             for it in issues:
                 print(f"      - {it}")
 
+    if args.incremental or os.path.exists(STATE_PATH):
+        try:
+            _save_state(state)
+        except Exception as e:
+            print(f"⚠️  結果簿寫入失敗({e}),不影響本次結論")
+
     print("-" * 60)
     if failed == 0 and not incomplete:
         print(f"✅ PASS:{len(files)} 檔全數符合格式與內容約束。")